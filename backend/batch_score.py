@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import pandas as pd
+
+# Run from the repo root (python -m backend.batch_score) so the ml package resolves
+from .inference import ARTIFACT_PATH, load_model_artifacts, set_model_threads, build_explainers, preprocess_batch, score_features, explain_batch, compute_roi, top_features
+
+# Offline bulk scorer for whole catalogs / upcoming slates.
+#
+#   python -m backend.batch_score my_slate.csv -o scored.csv --workers 4
+#
+# Input is read in chunks (CSV or Parquet), chunks are scored on a process pool with the
+# same encoding and models as the API, and results are appended to the output CSV as they
+# finish. A small checkpoint next to the output lets an interrupted run continue with --resume.
+
+MOVIE_FIELDS = ['title', 'budget', 'release_date', 'genres', 'crew', 'score']
+
+# Column mapping for the box office catalog shipped in the repo
+CATALOG_COLUMNS = {
+    'title': 'Release Group',
+    'release_date': 'Year',
+    'genres': 'Genres',
+    'score': 'Rating',
+}
+
+# Inputs the models can't do without: a missing budget silently scores every row with
+# log_budget=0, so run() refuses unless allow_missing is set
+REQUIRED_FIELDS = ['budget', 'release_date']
+
+# Worker process state (models are loaded once per process by the pool initializer)
+_worker = {}
+
+def _init_worker(artifact_path, n_threads, with_shap):
+    models, artifacts = load_model_artifacts(artifact_path)
+    set_model_threads(models, n_threads)
+    _worker['models'] = models
+    _worker['artifacts'] = artifacts
+    if with_shap:
+        _worker['explainer'] = build_explainers(models)['revenue']
+
+def parse_column_map(pairs):
+    mapping = {}
+    for pair in pairs or []:
+        field, _, column = pair.partition('=')
+        if field not in MOVIE_FIELDS or not column:
+            raise ValueError(f"Invalid column mapping '{pair}', expected FIELD=COLUMN with FIELD in {MOVIE_FIELDS}")
+        mapping[field] = column
+    return mapping
+
+def input_columns(path):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0, encoding='latin-1').columns)
+
+def detect_column_map(path):
+    # The repo's box office catalog has its own column names; anything else is expected to use the field names
+    return dict(CATALOG_COLUMNS) if CATALOG_COLUMNS['title'] in input_columns(path) else {}
+
+def check_columns(columns, column_map, allow_missing=False):
+    # Fields with no input column are filled with defaults by normalize_chunk; say so up front
+    missing = [f for f in MOVIE_FIELDS if column_map.get(f, f) not in columns]
+    required = [f for f in missing if f in REQUIRED_FIELDS]
+    if required and not allow_missing:
+        raise ValueError(f"Input has no column for {', '.join(required)} (map one with --map FIELD=COLUMN, "
+                         f"or pass --allow-missing to score with defaults)")
+    if missing:
+        print(f"Warning: no input column for {', '.join(missing)}; scoring with defaults (0 / empty)")
+    return missing
+
+def normalize_chunk(chunk, column_map):
+    # Bring an input chunk to the MovieFeatures field layout (one column per field)
+    movies = pd.DataFrame(index=chunk.index)
+    for field in MOVIE_FIELDS:
+        column = column_map.get(field, field)
+        movies[field] = chunk[column] if column in chunk.columns else None
+
+    movies['title'] = movies['title'].fillna('Unknown').astype(str)
+    movies['budget'] = pd.to_numeric(movies['budget'], errors='coerce').fillna(0.0)
+    movies['genres'] = movies['genres'].fillna('').astype(str)
+    movies['crew'] = movies['crew'].fillna('').astype(str)
+
+    # Catalog ratings look like "6.126/10"; the models were trained on a 0-100 score
+    score = movies['score']
+    if not pd.api.types.is_numeric_dtype(score):
+        rating = score.astype(str).str.extract(r'^\s*([\d.]+)\s*/\s*10\s*$')[0]
+        score = pd.to_numeric(rating, errors='coerce').mul(10).fillna(pd.to_numeric(score, errors='coerce'))
+    movies['score'] = pd.to_numeric(score, errors='coerce').fillna(0.0)
+
+    # A bare year is treated as January 1st of that year
+    dates = movies['release_date'].astype(str).str.replace(r'\.0$', '', regex=True)
+    movies['release_date'] = dates.where(~dates.str.fullmatch(r'\d{4}'), dates + '-01-01')
+    return movies
+
+def score_chunk(chunk_id, movies, with_shap):
+    models = _worker['models']
+    artifacts = _worker['artifacts']
+
+    # itertuples gives attribute access (movie.crew, movie.budget ...) without building a Pydantic model per row
+    rows = list(movies.itertuples(index=False))
+    X = preprocess_batch(rows, artifacts)
+    scores = score_features(X, models, artifacts)
+
+    out = pd.DataFrame({
+        'title': movies['title'].to_numpy(),
+        'release_date': movies['release_date'].to_numpy(),
+        'opening_weekend': scores['opening_weekend'],
+        'opening_weekend_ci_lower': scores['opening_weekend_ci'][:, 0],
+        'opening_weekend_ci_upper': scores['opening_weekend_ci'][:, 1],
+        'total_gross': scores['total_gross'],
+        'total_gross_ci_lower': scores['total_gross_ci'][:, 0],
+        'total_gross_ci_upper': scores['total_gross_ci'][:, 1],
+        'roi': compute_roi(scores['total_gross'], movies['budget'].to_numpy()),
+        'star_power': scores['star_power'],
+    })
+    for key in ['opening_weekend', 'total_gross']:
+        if f'{key}_quantiles' in scores:
+            keys, q = scores[f'{key}_quantiles']
+            for j, name in enumerate(keys):
+                out[f'{key}_{name}'] = q[:, j]
+
+    if with_shap:
+        vals = explain_batch(_worker['explainer'], X)
+        if vals is None:
+            out['shap_values'] = '{}'
+        else:
+            names = list(X.columns)
+            out['shap_values'] = [json.dumps(top_features(names, row)) for row in vals]
+
+    return chunk_id, out
+
+def read_chunks(path, chunksize):
+    if path.endswith('.parquet'):
+        # pyarrow is only needed for Parquet input
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        try:
+            reader = pd.read_csv(path, chunksize=chunksize, encoding='utf-8')
+            first = next(reader, None)
+        except UnicodeDecodeError:
+            reader = pd.read_csv(path, chunksize=chunksize, encoding='latin-1')
+            first = next(reader, None)
+        if first is None:
+            return
+        yield first
+        yield from reader
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return None
+
+def save_checkpoint(path, state):
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def run(input_path, output_path, chunksize=2000, workers=None, with_shap=False, column_map=None,
+        resume=False, artifact_path=ARTIFACT_PATH, allow_missing=False):
+    workers = workers or os.cpu_count() or 1
+    if column_map is None:
+        column_map = {}
+    # Before touching the output, so a bad mapping doesn't cost the previous results
+    check_columns(input_columns(input_path), column_map, allow_missing)
+    checkpoint_path = f'{output_path}.checkpoint.json'
+    state = {'input': os.path.abspath(input_path), 'chunksize': chunksize, 'chunks_done': 0,
+             'rows_done': 0, 'bytes_written': 0}
+
+    previous = load_checkpoint(checkpoint_path) if resume else None
+    if previous:
+        if previous['input'] != state['input'] or previous['chunksize'] != chunksize:
+            raise ValueError("Checkpoint was written for a different input or chunk size; rerun without --resume")
+        state = previous
+        # A missing, replaced or shortened output can't be continued: truncate() would pad it with NULs
+        size = os.path.getsize(output_path) if os.path.exists(output_path) else None
+        if size is None or size < state['bytes_written']:
+            raise ValueError(f"{output_path} is missing or shorter than its checkpoint ({state['bytes_written']} bytes); "
+                             f"rerun without --resume")
+        # Drop anything appended after the last checkpoint (a chunk that was cut off mid-write)
+        with open(output_path, 'a+') as f:
+            f.truncate(state['bytes_written'])
+        print(f"Resuming after {state['chunks_done']} chunks ({state['rows_done']} rows)")
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    start = time.perf_counter()
+    rows_this_run = 0
+    pending = {}
+    next_to_write = state['chunks_done']
+
+    def write_ready():
+        nonlocal next_to_write, rows_this_run
+        while next_to_write in pending and pending[next_to_write].done():
+            out = pending.pop(next_to_write).result()[1]
+            with open(output_path, 'a', newline='') as f:
+                out.to_csv(f, header=state['bytes_written'] == 0, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+                state['bytes_written'] = f.tell()
+            next_to_write += 1
+            rows_this_run += len(out)
+            state['chunks_done'] = next_to_write
+            state['rows_done'] += len(out)
+            save_checkpoint(checkpoint_path, state)
+            elapsed = time.perf_counter() - start
+            print(f"Chunk {next_to_write}: {state['rows_done']} rows scored ({rows_this_run / elapsed:,.0f} rows/sec)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(artifact_path, n_threads, with_shap)) as pool:
+        for chunk_id, chunk in enumerate(read_chunks(input_path, chunksize)):
+            if chunk_id < state['chunks_done']:
+                continue
+            movies = normalize_chunk(chunk, column_map)
+            pending[chunk_id] = pool.submit(score_chunk, chunk_id, movies, with_shap)
+            # Bound the number of chunks in flight so memory stays flat on large inputs
+            if len(pending) >= workers * 2:
+                pending[min(pending)].result()
+            write_ready()
+        wait(list(pending.values()))
+        write_ready()
+
+    elapsed = time.perf_counter() - start
+    rate = rows_this_run / elapsed if elapsed > 0 else 0
+    print(f"Scored {rows_this_run} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec). Output: {output_path}")
+    # No checkpoint is written when the input has no rows
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return state['rows_done']
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet catalog with the box office models")
+    parser.add_argument('input', help="CSV or .parquet file with one movie per row")
+    parser.add_argument('-o', '--output', required=True, help="Output CSV path")
+    parser.add_argument('--chunksize', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--shap', action='store_true', help="Add top-5 SHAP features per row (slower)")
+    parser.add_argument('--map', nargs='*', default=None, metavar='FIELD=COLUMN',
+                        help="Map input columns to movie fields, e.g. title='Release Group'")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted run from its checkpoint")
+    parser.add_argument('--artifacts', default=ARTIFACT_PATH)
+    parser.add_argument('--allow-missing', action='store_true',
+                        help="Score even when budget or release date has no input column (defaults to 0 / 2023)")
+    args = parser.parse_args()
+
+    column_map = parse_column_map(args.map) if args.map is not None else detect_column_map(args.input)
+
+    run(args.input, args.output, chunksize=args.chunksize, workers=args.workers, with_shap=args.shap,
+        column_map=column_map, resume=args.resume, artifact_path=args.artifacts, allow_missing=args.allow_missing)
+
+if __name__ == "__main__":
+    main()
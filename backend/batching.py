@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+# In-process micro-batching for the model/SHAP stage of /predict.
+#
+# Concurrent requests submit their encoded feature rows; a single consumer task collects
+# whatever arrives within max_wait_ms (or until max_batch_size rows), runs one batched
+# score call in a worker thread and hands each request back its own slice of the result.
+
+class MicroBatcher:
+    def __init__(self, score_fn, split_fn, max_batch_size=64, max_wait_ms=2.0):
+        # score_fn(X) -> result for all rows of X
+        # split_fn(result, start, stop) -> result for rows [start, stop)
+        self.score_fn = score_fn
+        self.split_fn = split_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+        # Metrics
+        self.batches = 0
+        self.rows = 0
+        self.batch_sizes = {}
+        self.queue_times = deque(maxlen=1000)
+
+    @property
+    def enabled(self):
+        return self.max_wait > 0 and self.max_batch_size > 1
+
+    def _ensure_started(self):
+        # The queue and consumer belong to the running event loop (test clients create their own loops)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._consume())
+
+    async def submit(self, X):
+        if not self.enabled:
+            self._record([0.0], len(X))
+            return self.score_fn(X)
+
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((X, future, time.perf_counter()))
+        return await future
+
+    async def _consume(self):
+        # pandas is only needed once batches start flowing (keeps backend.main imports light)
+        import pandas as pd
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            n_rows = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while n_rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+
+            started = time.perf_counter()
+            X = pd.concat([item[0] for item in batch], ignore_index=True) if len(batch) > 1 else batch[0][0]
+            try:
+                # Off the event loop, so new requests keep queueing while this batch runs
+                result = await loop.run_in_executor(None, self.score_fn, X)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record([started - enqueued for _, _, enqueued in batch], n_rows)
+            offset = 0
+            for X_part, future, _ in batch:
+                if not future.done():
+                    future.set_result(self.split_fn(result, offset, offset + len(X_part)))
+                offset += len(X_part)
+
+    def _record(self, queue_times, n_rows):
+        self.batches += 1
+        self.rows += n_rows
+        self.batch_sizes[n_rows] = self.batch_sizes.get(n_rows, 0) + 1
+        self.queue_times.extend(queue_times)
+
+    def stats(self):
+        queue_ms = np.array(self.queue_times) * 1000 if self.queue_times else np.zeros(1)
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            "queue_time_ms": {
+                "p50": float(np.percentile(queue_ms, 50)),
+                "p95": float(np.percentile(queue_ms, 95)),
+                "max": float(queue_ms.max()),
+            },
+        }
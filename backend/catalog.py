@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from ml.feature_schema import cast_column, column_dtype, frame_from_columns, read_processed
+from ml.search_interest import normalize_tokens
+
+from .inference import ARTIFACT_PATH, MOVIE_FIELDS, load_model_artifacts, encode_fields, preprocess_batch
+from .schemas import MovieFeatures
+
+# Catalog feature store: ready-made model rows for titles we already know.
+#
+#   python -m backend.catalog            (after preprocessing / training)
+#
+# Rows come from the training data (processed_data.csv, with real budgets and star power),
+# movies_dataset.csv (TMDB ids) and the box office catalog, encoded once and indexed by TMDB id
+# and normalized title. /predict/catalog copies the stored row and re-encodes only the fields a
+# request overrides, so known titles are scored without parsing crew, genre or date strings.
+# ml/train.py rebuilds it whenever it saves new models; a store whose fingerprint doesn't match
+# the loaded artifacts is ignored rather than served.
+
+CATALOG_PATH = 'ml/artifacts/catalog_store.npz'
+TMDB_DATASET = 'movies_dataset.csv'
+BOX_OFFICE_CATALOG = 'enhanced_box_office_data(2000-2024)u.csv'
+
+# Per-row metadata kept next to the encoded columns (the raw values the fields came from)
+META_FIELDS = ('titles', 'years', 'ids', 'budgets', 'release_dates', 'genres', 'scores')
+
+def title_key(title):
+    return " ".join(normalize_tokens(title or ""))
+
+def catalog_fingerprint(artifacts):
+    # What the stored rows depend on: the feature schema, the money normalization the budgets
+    # were encoded with and the training run the artifacts came from
+    normalizer = artifacts.get('normalizer')
+    return {
+        'columns': [f"{c}:{column_dtype(c).name}" for c in artifacts['columns']],
+        'normalization': normalizer.to_config() if normalizer is not None else None,
+        'trained_through': artifacts.get('metrics', {}).get('training', {}).get('trained_through'),
+    }
+
+class CatalogStore:
+    def __init__(self, columns, values, titles, years, ids, budgets, release_dates, genres, scores, fingerprint=None):
+        self.columns = list(columns)
+        self.fingerprint = fingerprint # catalog_fingerprint() of the artifacts it was built from
+        self.values = values # column -> array in schema dtype
+        self.titles = np.asarray(titles, dtype=str)
+        self.years = np.asarray(years, dtype=np.int16)
+        self.ids = np.asarray(ids, dtype=np.int64) # TMDB id, -1 if unknown
+        self.budgets = np.asarray(budgets, dtype=float) # release-year dollars, 0 if unknown
+        self.release_dates = np.asarray(release_dates, dtype=str)
+        self.genres = np.asarray(genres, dtype=str)
+        self.scores = np.asarray(scores, dtype=float)
+
+        self.by_id = {int(i): row for row, i in enumerate(self.ids) if i >= 0}
+        self.by_title = {}
+        for row, title in enumerate(self.titles):
+            self.by_title.setdefault(title_key(title), []).append(row)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def save(self, path=CATALOG_PATH):
+        np.savez_compressed(path, columns=np.array(self.columns), fingerprint=np.array(json.dumps(self.fingerprint)),
+                            **{f'col_{c}': v for c, v in self.values.items()},
+                            **{name: getattr(self, name) for name in META_FIELDS})
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        with np.load(path) as data:
+            columns = [str(c) for c in data['columns']]
+            values = {c: data[f'col_{c}'] for c in columns}
+            fingerprint = json.loads(str(data['fingerprint'])) if 'fingerprint' in data.files else None
+            return cls(columns, values, fingerprint=fingerprint, **{name: data[name] for name in META_FIELDS})
+
+    def resolve(self, ref, year=None):
+        # TMDB id (int) or title (str) -> row; titles shared by several releases pick `year`,
+        # otherwise the most recent one. None when unknown.
+        if isinstance(ref, (int, np.integer)):
+            return self.by_id.get(int(ref))
+        rows = self.by_title.get(title_key(ref), [])
+        if year is not None:
+            rows = [r for r in rows if self.years[r] == year]
+        return max(rows, key=lambda r: self.years[r]) if rows else None
+
+    def movie(self, row, overrides=None):
+        # MovieFeatures for a stored row with the overrides applied (no validation; the
+        # overrides were validated with the request)
+        fields = {
+            'title': str(self.titles[row]),
+            'budget': float(self.budgets[row]),
+            'is_estimated_budget': False,
+            'release_date': str(self.release_dates[row]),
+            'genres': str(self.genres[row]),
+            'crew': "",
+            'score': float(self.scores[row]),
+        }
+        fields.update(overrides or {})
+        return MovieFeatures.model_construct(**fields)
+
+    def assemble(self, rows, overrides, artifacts):
+        # rows: resolved catalog rows; overrides: one dict of MovieFeatures fields per row.
+        # -> (movies, X). Raises ValueError when a row still has no budget.
+        movies = [self.movie(row, o) for row, o in zip(rows, overrides)]
+        for movie, row in zip(movies, rows):
+            if movie.budget <= 0:
+                raise ValueError(f"No budget on record for '{self.titles[row]}'; pass overrides.budget")
+
+        idx = np.asarray(rows, dtype=np.int64)
+        values = {c: self.values[c][idx] for c in artifacts['columns'] if c in self.values}
+        # Re-encode only the overridden fields, one pass per distinct set of fields
+        groups = {}
+        for i, o in enumerate(overrides):
+            fields = frozenset(o or {}) & set(MOVIE_FIELDS)
+            if fields:
+                groups.setdefault(fields, []).append(i)
+        for fields, members in groups.items():
+            encoded = encode_fields([movies[i] for i in members], artifacts, fields)
+            for column, column_values in encoded.items():
+                if column in values:
+                    values[column][members] = cast_column(column, column_values)
+        return movies, frame_from_columns(artifacts['columns'], len(rows), values)
+
+def load_catalog(path, artifacts):
+    # None when the store is missing or was built from other artifacts (rebuild it after training)
+    if not os.path.exists(path):
+        return None
+    store = CatalogStore.load(path)
+    if store.fingerprint is None:
+        print(f"Ignoring {path}: no fingerprint (run python -m backend.catalog)")
+        return None
+    current = catalog_fingerprint(artifacts)
+    stale = [key for key in current if store.fingerprint.get(key) != current[key]]
+    if stale or store.columns != list(artifacts['columns']):
+        print(f"Ignoring {path}: built for different {', '.join(stale) or 'columns'} (run python -m backend.catalog)")
+        return None
+    return store
+
+def genre_string(row, genre_cols):
+    # One-hot row -> "action, science_fiction" (vectorizer tokens, accepted back by the encoder)
+    return ", ".join(c for c, v in zip(genre_cols, row) if v)
+
+def build_catalog(artifacts, processed_path=f'{ARTIFACT_PATH}/processed_data.csv',
+                  tmdb_path=TMDB_DATASET, box_office_path=BOX_OFFICE_CATALOG):
+    import pandas as pd
+    columns = list(artifacts['columns'])
+    parts = [] # (values dict, meta dict) per source
+    known = {} # (title key, year) -> row
+
+    # 1. Training rows: already encoded exactly as the models saw them
+    df = read_processed(processed_path, columns).drop_duplicates(subset=['names', 'release_year'])
+    df = df[[c for c in columns if c in df.columns] + ['names']].reset_index(drop=True)
+    genre_cols = [c for c in artifacts.get('genre_columns') or artifacts['vectorizer'].get_feature_names_out() if c in df.columns]
+    years = df['release_year'].to_numpy()
+    budgets = np.expm1(df['log_budget'].to_numpy(dtype=float))
+    normalizer = artifacts.get('normalizer')
+    if normalizer is not None:
+        budgets = normalizer.denormalize(budgets, years)
+    meta = {
+        'titles': df['names'].astype(str).to_numpy(),
+        'years': years,
+        'ids': np.full(len(df), -1),
+        'budgets': budgets,
+        'release_dates': [f"{y}-{m:02d}-01" for y, m in zip(years, df['release_month'].to_numpy())],
+        'genres': [genre_string(row, genre_cols) for row in df[genre_cols].to_numpy()],
+        'scores': df['score'].to_numpy(dtype=float),
+    }
+    parts.append(({c: df[c].to_numpy() for c in columns if c in df.columns}, meta))
+    for row, key in enumerate(zip(map(title_key, meta['titles']), years)):
+        known[key] = row
+    n = len(df)
+
+    def add_encoded(movies, ids, years):
+        nonlocal n
+        X = preprocess_batch(movies, artifacts)
+        meta = {
+            'titles': [m.title for m in movies], 'years': years, 'ids': ids,
+            'budgets': [m.budget for m in movies], 'release_dates': [m.release_date for m in movies],
+            'genres': [m.genres for m in movies], 'scores': [m.score for m in movies],
+        }
+        parts.append(({c: X[c].to_numpy() for c in columns}, meta))
+        for i, m in enumerate(movies):
+            known[(title_key(m.title), years[i])] = n + i
+        n += len(movies)
+
+    # 2. TMDB dataset: ids for training titles, new rows (budget unknown) for the rest
+    ids_for_known = {}
+    if os.path.exists(tmdb_path):
+        tmdb = pd.read_csv(tmdb_path)
+        movies, ids, new_years = [], [], []
+        for movie_id, title, date, genres, vote in zip(tmdb['movie_id'], tmdb['title'], tmdb['release_date'].astype(str),
+                                                       tmdb['genres'].fillna(''), tmdb['vote_average'].fillna(0)):
+            year = int(date[:4]) if date[:4].isdigit() else 2023
+            row = known.get((title_key(title), year))
+            if row is not None:
+                ids_for_known[row] = int(movie_id)
+                continue
+            movies.append(MovieFeatures(title=title, budget=0, release_date=date, genres=genres, crew="", score=float(vote) * 10))
+            ids.append(int(movie_id))
+            new_years.append(year)
+        if movies:
+            add_encoded(movies, ids, new_years)
+
+    # 3. Box office catalog (title, year, genres, rating; no budget)
+    if os.path.exists(box_office_path):
+        try:
+            box = pd.read_csv(box_office_path, encoding='utf-8')
+        except UnicodeDecodeError:
+            box = pd.read_csv(box_office_path, encoding='latin-1')
+        rating = pd.to_numeric(box['Rating'].astype(str).str.extract(r'^\s*([\d.]+)')[0], errors='coerce').fillna(0) * 10
+        movies, new_years = [], []
+        for title, year, genres, score in zip(box['Release Group'].astype(str), box['Year'], box['Genres'].fillna(''), rating):
+            if (title_key(title), int(year)) in known:
+                continue
+            movies.append(MovieFeatures(title=title, budget=0, release_date=f"{int(year)}-01-01", genres=genres, crew="", score=float(score)))
+            new_years.append(int(year))
+            known[(title_key(title), int(year))] = -1 # duplicates within the catalog
+        if movies:
+            add_encoded(movies, [-1] * len(movies), new_years)
+
+    values = {c: np.concatenate([cast_column(c, v[c]) if c in v
+                                 else np.zeros(len(m['titles']), dtype=column_dtype(c)) for v, m in parts])
+              for c in columns}
+    meta = {name: np.concatenate([np.asarray(m[name]) for _, m in parts]) for name in META_FIELDS}
+    for row, movie_id in ids_for_known.items():
+        meta['ids'][row] = movie_id
+    return CatalogStore(columns, values, fingerprint=catalog_fingerprint(artifacts), **meta)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the catalog feature store used by /predict/catalog")
+    parser.add_argument('--artifacts', default=ARTIFACT_PATH)
+    parser.add_argument('--tmdb', default=TMDB_DATASET)
+    parser.add_argument('--box-office', default=BOX_OFFICE_CATALOG)
+    parser.add_argument('-o', '--output', default=CATALOG_PATH)
+    args = parser.parse_args()
+
+    _, artifacts = load_model_artifacts(args.artifacts)
+    store = build_catalog(artifacts, f'{args.artifacts}/processed_data.csv', args.tmdb, args.box_office)
+    store.save(args.output)
+    print(f"Catalog of {len(store)} titles ({len(store.by_id)} with TMDB ids) written to {args.output}")
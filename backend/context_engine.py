@@ -1,42 +1,106 @@
+import numpy as np
+
+from ml.analogs import format_gross
+
+# Comparable titles named in the explanation text (the full list is in the response)
+COMPARABLES_IN_TEXT = 3
+
+# Rule table, in explanation order: (rule, context flag, template, marketing stat).
+# Each rule is a boolean mask over the whole batch (see ContextEngine.rule_masks); templates
+# are only formatted for the rows whose mask fires.
+RULES = [
+    # 1. Budget Context
+    ('is_estimated', 'is_estimated',
+     "Prediction uses an **estimated budget** of ${budget_m:.1f}M. Actual performance may vary if the confirmed budget differs significantly.",
+     None),
+    # 2. Marketing / Trailer Context (trailer views from the media service, mocked or real)
+    ('high_marketing', 'high_marketing',
+     "Strong **organic marketing surge** detected with ~{trailer_views_m:.1f}M+ trailer views, indicating high pre-release hype.",
+     ('Organic Reach', "High")),
+    # Search interest (Google Trends exports via the search-interest store)
+    ('high_search_interest', 'high_search_interest',
+     "High **search interest** (buzz {buzz}/100){breakout} signals strong audience awareness ahead of release.",
+     ('Search Buzz', "{buzz}/100")),
+    # 3. Trailer Absence / Franchise Legacy
+    ('franchise_legacy', 'franchise_legacy',
+     "No official trailer released yet, but **Franchise Legacy** (Score: {star_power:.0f}/100) acts as a strong compensating signal. Historical performance of related movies supports the high prediction.",
+     None),
+    ('missing_marketing', 'missing_marketing',
+     "Lack of official trailers contributes to higher uncertainty in the opening weekend prediction.",
+     None),
+    # Closest historical titles from the analog index
+    ('comparables', 'has_comparables',
+     "Closest historical comparables: {comparables}.",
+     None),
+    # 4. Opening Weekend vs Total Gross Context
+    ('long_legs', None,
+     "Long run potential is high based on genre and release window (legs > 3.5x).",
+     None),
+]
 
 class ContextEngine:
+    @staticmethod
+    def batch_columns(movies, predictions, media_list, comparables=None):
+        # predictions: dict of arrays (opening_weekend, total_gross, star_power), e.g. score_features output;
+        # comparables: AnalogIndex.describe output (optional)
+        metrics = [m.get('metrics', {}) for m in media_list]
+        comparables = comparables or [[] for _ in movies]
+        return {
+            'is_estimated': np.array([bool(m.is_estimated_budget) for m in movies]),
+            'budget_m': np.array([m.budget for m in movies], dtype=float) / 1_000_000,
+            'trailer_views_m': np.array([x.get('trailer_views_approx', 0) for x in metrics], dtype=float) / 1_000_000,
+            # Raw values kept for rendering so "85" doesn't turn into "85.0"
+            'buzz': [x.get('social_buzz_score', 0) for x in metrics],
+            'breakout': [" with breakout rising queries" if x.get('search_breakout') else "" for x in metrics],
+            'has_trailers': np.array([len(m.get('trailers', [])) > 0 for m in media_list]),
+            'star_power': np.asarray(predictions['star_power'], dtype=float),
+            'opening_weekend': np.asarray(predictions['opening_weekend'], dtype=float),
+            'total_gross': np.asarray(predictions['total_gross'], dtype=float),
+            'comparables': [", ".join(f"{c['title']} ({c['year']}, {format_gross(c['revenue'])})" for c in row[:COMPARABLES_IN_TEXT])
+                            for row in comparables],
+        }
+
+    @staticmethod
+    def rule_masks(cols):
+        legacy = cols['star_power'] > 80
+        no_trailers = ~cols['has_trailers']
+        return {
+            'is_estimated': cols['is_estimated'],
+            'high_marketing': cols['trailer_views_m'] > 50,
+            'high_search_interest': np.array(cols['buzz'], dtype=float) >= 70,
+            'franchise_legacy': no_trailers & legacy,
+            'missing_marketing': no_trailers & ~legacy,
+            'comparables': np.array([bool(c) for c in cols['comparables']], dtype=bool),
+            'long_legs': cols['total_gross'] > cols['opening_weekend'] * 3.5,
+        }
+
+    @staticmethod
+    def explain_batch(movies, predictions, media_list, comparables=None):
+        # -> list of (explanation, flags, marketing_stats), one per movie
+        cols = ContextEngine.batch_columns(movies, predictions, media_list, comparables)
+        masks = ContextEngine.rule_masks(cols)
+
+        n = len(movies)
+        sentences = [[] for _ in range(n)]
+        flags = [{} for _ in range(n)]
+        marketing_stats = [{} for _ in range(n)]
+        for rule, flag, template, stat in RULES:
+            for i in np.flatnonzero(masks[rule]):
+                row = {k: v[i] for k, v in cols.items()}
+                sentences[i].append(template.format(**row))
+                if flag:
+                    flags[i][flag] = True
+                if stat:
+                    marketing_stats[i][stat[0]] = stat[1].format(**row)
+
+        return [(" ".join(sentences[i]), flags[i], marketing_stats[i]) for i in range(n)]
+
     @staticmethod
     def generate_explanation(movie_features, prediction, media_data):
-        explanation = []
-        flags = {}
-        marketing_stats = {}
-
-        title = movie_features.title or "The movie"
-        
-        # 1. Budget Context
-        if movie_features.is_estimated_budget:
-            explanation.append(f"Prediction uses an **estimated budget** of ${movie_features.budget/1_000_000:.1f}M. Actual performance may vary if the confirmed budget differs significantly.")
-            flags['is_estimated'] = True
-
-        # 2. Marketing / Trailer Context
-        # Heuristic: Check if we have high trailer views (mocked or real)
-        # Using media_data passed from service
-        trailer_views = media_data.get('metrics', {}).get('trailer_views_approx', 0)
-        
-        if trailer_views > 50_000_000:
-            explanation.append(f"Strong **organic marketing surge** detected with ~{trailer_views/1_000_000:.1f}M+ trailer views, indicating high pre-release hype.")
-            flags['high_marketing'] = True
-            marketing_stats['Organic Reach'] = "High"
-        
-        # 3. Trailer Absence / Franchise Legacy
-        has_trailers = len(media_data.get('trailers', [])) > 0
-        star_power = prediction.star_power
-        
-        if not has_trailers:
-            if star_power > 80:
-                explanation.append(f"No official trailer released yet, but **Franchise Legacy** (Score: {star_power:.0f}/100) acts as a strong compensating signal. Historical performance of related movies supports the high prediction.")
-                flags['franchise_legacy'] = True
-            else:
-                explanation.append("Lack of official trailers contributes to higher uncertainty in the opening weekend prediction.")
-                flags['missing_marketing'] = True
-        
-        # 4. Opening Weekend vs Total Gross Context
-        if prediction.total_gross > prediction.opening_weekend * 3.5:
-            explanation.append("Long run potential is high based on genre and release window (legs > 3.5x).")
-            
-        return " ".join(explanation), flags, marketing_stats
+        # Single-movie form; prediction is anything with opening_weekend / total_gross / star_power
+        predictions = {
+            'opening_weekend': [prediction.opening_weekend],
+            'total_gross': [prediction.total_gross],
+            'star_power': [prediction.star_power],
+        }
+        return ContextEngine.explain_batch([movie_features], predictions, [media_data])[0]
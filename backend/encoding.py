@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import importlib
+import importlib.util
+import json
+
+import numpy as np
+from starlette.responses import Response
+
+from .context_engine import RULES
+
+# Column-oriented prediction payloads for batch and sweep clients.
+#
+# Instead of one SinglePrediction per movie (per-item Pydantic validation, repeated dict keys),
+# results are flat parallel arrays plus one shared feature-name table that the SHAP index
+# columns point into. The same columns are written as JSON, MessagePack or Arrow IPC depending
+# on the Accept header (MessagePack / Arrow only when msgpack / pyarrow are installed) and
+# compressed with brotli or gzip depending on Accept-Encoding.
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.boxoffice.columnar+json"
+MSGPACK = "application/msgpack"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+MEDIA_ALIASES = {
+    "application/json": JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    COLUMNAR_JSON: COLUMNAR_JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW_STREAM: ARROW_STREAM,
+}
+
+# Optional dependency behind each binary format
+FORMAT_MODULES = {MSGPACK: "msgpack", ARROW_STREAM: "pyarrow"}
+
+FLAG_NAMES = [flag for _, flag, _, _ in RULES if flag]
+STAT_NAMES = [stat[0] for _, _, _, stat in RULES if stat]
+
+# Small bodies aren't worth the compression CPU
+MIN_COMPRESS_SIZE = 1024
+
+def has_module(name):
+    # Checked without importing, so pyarrow isn't loaded unless a client asks for Arrow
+    return importlib.util.find_spec(name) is not None
+
+def available_formats():
+    return [fmt for fmt in (JSON, COLUMNAR_JSON, MSGPACK, ARROW_STREAM)
+            if fmt not in FORMAT_MODULES or has_module(FORMAT_MODULES[fmt])]
+
+def negotiate(accept):
+    # Highest-q media type in the Accept header that we can produce; None means 406
+    candidates = []
+    for i, part in enumerate((accept or "*/*").split(",")):
+        fields = part.strip().split(";")
+        q = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            candidates.append((-q, i, fields[0].strip().lower()))
+
+    available = available_formats()
+    for _, _, media in sorted(candidates):
+        fmt = MEDIA_ALIASES.get(media)
+        if fmt in available:
+            return fmt
+    return None
+
+def prediction_columns(titles, scores, rois, feature_names, shap_matrix=None, contexts=None, comparables=None, k=5):
+    # scores: score_features output; contexts: ContextEngine.explain_batch output;
+    # comparables: AnalogIndex.describe output
+    columns = {
+        'title': list(titles),
+        'opening_weekend': scores['opening_weekend'],
+        'opening_weekend_low': np.ascontiguousarray(scores['opening_weekend_ci'][:, 0]),
+        'opening_weekend_high': np.ascontiguousarray(scores['opening_weekend_ci'][:, 1]),
+        'total_gross': scores['total_gross'],
+        'total_gross_low': np.ascontiguousarray(scores['total_gross_ci'][:, 0]),
+        'total_gross_high': np.ascontiguousarray(scores['total_gross_ci'][:, 1]),
+        'roi': np.asarray(rois, dtype=float),
+        'star_power': scores['star_power'],
+    }
+    for target in ('opening_weekend', 'total_gross'):
+        if f'{target}_quantiles' in scores:
+            keys, q = scores[f'{target}_quantiles']
+            for j, key in enumerate(keys):
+                columns[f'{target}_{key}'] = np.ascontiguousarray(q[:, j])
+
+    if shap_matrix is not None:
+        # Top-k features per row as indices into the shared `features` table (same order as top_features)
+        order = np.argsort(-np.abs(shap_matrix), axis=1, kind='stable')[:, :k]
+        columns['shap_index'] = order.astype(np.int32)
+        columns['shap_value'] = np.take_along_axis(shap_matrix, order, axis=1).astype(float)
+
+    if contexts is not None:
+        columns['explanation'] = [c[0] for c in contexts]
+        for flag in FLAG_NAMES:
+            columns[f'flag_{flag}'] = np.array([bool(c[1].get(flag)) for c in contexts])
+        for stat in STAT_NAMES:
+            columns[f'stat_{stat}'] = [c[2].get(stat) for c in contexts]
+
+    if comparables is not None:
+        # One list per row (list columns in Arrow)
+        columns['comparable_titles'] = [[c['title'] for c in row] for row in comparables]
+        columns['comparable_years'] = [[c['year'] for c in row] for row in comparables]
+        columns['comparable_revenue'] = [[c['revenue'] for c in row] for row in comparables]
+
+    return {'n': len(columns['title']), 'features': list(feature_names), 'columns': columns}
+
+def to_builtin(payload):
+    columns = {name: col.tolist() if isinstance(col, np.ndarray) else col for name, col in payload['columns'].items()}
+    return dict(payload, columns=columns)
+
+def encode_json(payload):
+    if has_module("orjson"):
+        import orjson
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(to_builtin(payload)).encode()
+
+def encode_msgpack(payload):
+    import msgpack
+    return msgpack.packb(to_builtin(payload))
+
+def encode_arrow(payload):
+    import pyarrow as pa
+    arrays = {}
+    for name, col in payload['columns'].items():
+        if isinstance(col, np.ndarray) and col.ndim == 2:
+            # (rows x k) SHAP columns as fixed-size lists
+            arrays[name] = pa.FixedSizeListArray.from_arrays(pa.array(col.ravel()), col.shape[1])
+        else:
+            arrays[name] = pa.array(col)
+    table = pa.table(arrays).replace_schema_metadata({'features': json.dumps(payload['features'])})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+ENCODERS = {JSON: encode_json, COLUMNAR_JSON: encode_json, MSGPACK: encode_msgpack, ARROW_STREAM: encode_arrow}
+
+def compress(body, accept_encoding):
+    # -> (body, content-encoding or None); brotli preferred when both sides support it
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    if "br" in accepted and has_module("brotli"):
+        import brotli
+        return brotli.compress(body, quality=4), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=5), "gzip"
+    return body, None
+
+def columnar_response(payload, fmt, accept_encoding=None):
+    body, encoding = compress(ENCODERS[fmt](payload), accept_encoding)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=fmt, headers=headers)
+
+def etag(body):
+    # Strong validator for a response body
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match, tag):
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+def cached_response(body, media_type, tag, cache_control, if_none_match=None):
+    # 304 with the validator headers only when the client already holds this version
+    headers = {"ETag": tag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, tag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def cached_json(payload, cache_control, if_none_match=None):
+    body = json.dumps(payload, sort_keys=True, default=str).encode()
+    return cached_response(body, JSON, etag(body), cache_control, if_none_match)
@@ -0,0 +1,34 @@
+import gc
+import os
+
+# Gunicorn config for multi-worker serving with shared model memory.
+#
+#   gunicorn -c backend/gunicorn_conf.py backend.main:app
+#
+# preload_app imports backend.main once in the master. With PRELOAD_ARTIFACTS=1 that import
+# loads both XGBoost models, the vectorizer, person_power and the SHAP explainers, and every
+# worker is forked from that state, sharing the pages copy-on-write instead of unpickling
+# its own copy. Nothing is predicted in the master, so no OpenMP thread pool exists at fork time.
+
+os.environ.setdefault("PRELOAD_ARTIFACTS", "1")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation. Otherwise the first
+    # GC pass in each worker touches every object header and un-shares the pages.
+    gc.freeze()
+
+def post_fork(server, worker):
+    import backend.main as main
+
+    # Split the cores between workers (override with XGBOOST_THREADS)
+    default_threads = max(1, (os.cpu_count() or 1) // workers)
+    n_threads = int(os.getenv("XGBOOST_THREADS", default_threads))
+    if main.models:
+        main.set_model_threads(main.models, n_threads)
+    server.log.info(f"Worker {worker.pid}: models {'shared from master' if main.models else 'not preloaded'}, {n_threads} threads")
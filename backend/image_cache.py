@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+import requests
+
+# On-disk cache for the poster / backdrop images served by GET /images/{size}/{filename}.
+#
+# Each TMDB rendition is fetched once and stored under the SHA-256 of its bytes
+# (objects/ab/abcdef...), so identical images requested under different keys share one file
+# and the digest doubles as a strong ETag. index.json maps "size/filename" keys to digests in
+# least-recently-used order; when the stored bytes exceed the budget the oldest keys are
+# dropped and their objects deleted once nothing else references them.
+
+TMDB_IMAGE_URL = "https://image.tmdb.org/t/p"
+
+# Renditions TMDB serves for posters and backdrops; the proxy never resizes itself
+IMAGE_SIZES = ("w92", "w154", "w185", "w342", "w500", "w780", "w1280", "original")
+
+# TMDB image file names ("/8b8R8l88Qje9dn9OE8PY05Nxl1X.jpg"); anything else is rejected so the
+# proxy can't be pointed at arbitrary paths. Raster formats only: SVG can carry script, which
+# would run with the API's origin
+FILENAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp)$")
+CONTENT_TYPES = ("image/jpeg", "image/png", "image/webp")
+
+def valid_image(size, filename):
+    return size in IMAGE_SIZES and bool(FILENAME_PATTERN.match(filename))
+
+def fetch_tmdb_image(size, filename):
+    # -> (bytes, content type); raises on network errors and non-image responses
+    response = requests.get(f"{TMDB_IMAGE_URL}/{size}/{filename}", timeout=10)
+    response.raise_for_status()
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if content_type not in CONTENT_TYPES:
+        raise ValueError(f"Unexpected content type {content_type!r} for {size}/{filename}")
+    return response.content, content_type
+
+class ImageCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # key -> {'digest', 'size', 'content_type'}, oldest first
+        self.refs = Counter()        # digest -> number of keys pointing at it
+        self.total_bytes = 0         # bytes of distinct objects on disk
+        self._fetching = {}          # key -> lock, so concurrent misses fetch once
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._load_index()
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _load_index(self):
+        path = os.path.join(self.root, "index.json")
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable image cache index: {e}")
+            return
+        for key, entry in saved:
+            # Objects removed by hand just fall out of the index
+            if os.path.exists(self.object_path(entry['digest'])):
+                self._add(key, entry)
+
+    def _save_index(self):
+        path = os.path.join(self.root, "index.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(self.entries.items()), f)
+        os.replace(tmp, path)
+
+    def _add(self, key, entry):
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        if self.refs[entry['digest']] == 0:
+            self.total_bytes += entry['size']
+        self.refs[entry['digest']] += 1
+
+    def _remove(self, key):
+        # -> digest whose object is no longer referenced, or None
+        entry = self.entries.pop(key)
+        self.refs[entry['digest']] -= 1
+        if self.refs[entry['digest']] > 0:
+            return None
+        del self.refs[entry['digest']]
+        self.total_bytes -= entry['size']
+        return entry['digest']
+
+    def _evict(self):
+        # Least recently used first; the newest entry always stays even if it alone is over budget
+        orphans = []
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            digest = self._remove(next(iter(self.entries)))
+            self.evictions += 1
+            if digest:
+                orphans.append(digest)
+        return orphans
+
+    def lookup(self, key):
+        # Entry without reading the object (enough to answer a conditional GET)
+        with self.lock:
+            return self.entries.get(key)
+
+    def get(self, key):
+        # -> (entry, bytes) or None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+        try:
+            with open(self.object_path(entry['digest']), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Evicted between the lookup and the read
+            return None
+        with self.lock:
+            self.hits += 1
+        return entry, data
+
+    def put(self, key, data, content_type):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        entry = {'digest': digest, 'size': len(data), 'content_type': content_type}
+        with self.lock:
+            self._add(key, entry)
+            orphans = self._evict()
+            # An orphan can be re-referenced by a concurrent put before we delete it
+            orphans = [d for d in orphans if self.refs[d] == 0]
+            self._save_index()
+        for orphan in orphans:
+            try:
+                os.remove(self.object_path(orphan))
+            except FileNotFoundError:
+                pass
+        return entry
+
+    def get_or_fetch(self, key, fetch):
+        # fetch() -> (bytes, content type), called at most once per key at a time
+        cached = self.get(key)
+        if cached:
+            return cached
+        with self.lock:
+            key_lock = self._fetching.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another request may have filled it while we waited
+                cached = self.get(key)
+                if cached:
+                    return cached
+                data, content_type = fetch()
+                with self.lock:
+                    self.misses += 1
+                return self.put(key, data, content_type), data
+        finally:
+            with self.lock:
+                self._fetching.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "objects": len(self.refs),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,300 @@
+import numpy as np
+import os
+import json
+from ml.search_interest import get_store
+from ml.ticket_sales import MoneyNormalizer
+from ml.analogs import AnalogIndex
+from ml.feature_schema import frame_from_columns
+
+# Shared model loading, feature encoding and scoring.
+# Used by the FastAPI app (main.py) and the offline batch scorer (batch_score.py),
+# so it must stay free of web/TMDB side effects.
+#
+# joblib (and xgboost/sklearn behind the pickles), pandas and shap are imported inside the
+# functions that need them, so importing this module (and backend.main) stays fast.
+
+ARTIFACT_PATH = 'ml/artifacts'
+
+def load_model_artifacts(artifact_path=ARTIFACT_PATH):
+    import joblib
+    models = {}
+    artifacts = {}
+
+    models['opening'] = joblib.load(f'{artifact_path}/model_opening.pkl')
+    models['revenue'] = joblib.load(f'{artifact_path}/model_revenue.pkl')
+    artifacts['vectorizer'] = joblib.load(f'{artifact_path}/genre_vectorizer.pkl')
+    artifacts['person_power'] = joblib.load(f'{artifact_path}/person_power.pkl')
+
+    # Optional multi-quantile models (ml/train.py --quantiles)
+    for target in ['opening', 'revenue']:
+        q_path = f'{artifact_path}/model_{target}_quantiles.pkl'
+        if os.path.exists(q_path):
+            models[f'{target}_quantiles'] = joblib.load(q_path)
+
+    with open(f'{artifact_path}/metrics.json', 'r') as f:
+        artifacts['metrics'] = json.load(f)
+
+    with open(f'{artifact_path}/model_columns.json', 'r') as f:
+        artifacts['columns'] = json.load(f)
+
+    # Per-year money normalization the models were trained with (preprocessing.py --normalize)
+    if os.path.exists(f'{artifact_path}/normalization.json'):
+        with open(f'{artifact_path}/normalization.json', 'r') as f:
+            artifacts['normalizer'] = MoneyNormalizer.from_config(json.load(f))
+
+    # Google Trends search-interest table (picks up new export files on its own)
+    artifacts['search_interest'] = get_store(os.getenv('SEARCH_INTEREST_DIR', '.'))
+
+    # Training reference profile for drift monitoring (preprocessing.py / ml/drift.py)
+    if os.path.exists(f'{artifact_path}/reference_profile.json'):
+        with open(f'{artifact_path}/reference_profile.json', 'r') as f:
+            artifacts['reference_profile'] = json.load(f)
+
+    # Comparable-title index (ml/train.py / ml/analogs.py)
+    if os.path.exists(f'{artifact_path}/analog_index.npz'):
+        artifacts['analogs'] = AnalogIndex.load(f'{artifact_path}/analog_index.npz')
+
+    return models, artifacts
+
+def get_power(crew_str, person_power):
+    # Mean historical revenue of the named people in "Name, Role, Name, Role, ..."
+    if not crew_str: return 0
+    parts = [x.strip() for x in crew_str.split(',')]
+    names = parts[0::2]
+    if not names: return 0
+    powers = [person_power.get(n, 0) for n in names]
+    return np.mean(powers) if powers else 0
+
+def clean_genre_string(raw_genres):
+    # Apply same preprocessing as training: "Science Fiction, Action" -> "Science_Fiction Action"
+    parts = [x.strip().replace(' ', '_') for x in (raw_genres or "").split(',')]
+    return ' '.join(parts)
+
+# MovieFeatures fields that feed the model matrix (title -> search-interest buzz)
+MOVIE_FIELDS = ('title', 'budget', 'release_date', 'genres', 'crew', 'score')
+
+def encode_fields(movies, artifacts_dict, fields=MOVIE_FIELDS):
+    # Model columns derived from the given MovieFeatures fields, as column name -> array.
+    # Requires logic similar to preprocessing.py; the genre vectorizer and date parser
+    # run once for the whole batch instead of once per movie. Only the requested fields
+    # are parsed, so catalog rows with overrides (catalog.py) re-encode just those.
+    import pandas as pd
+    features = {}
+    normalizer = artifacts_dict.get('normalizer')
+    
+    release_year = None
+    if 'release_date' in fields or ('budget' in fields and normalizer is not None):
+        # Date parsing (unparseable dates fall back to January 2023)
+        dates = pd.to_datetime(pd.Series([m.release_date for m in movies], dtype=object), errors='coerce', format='mixed')
+        release_year = dates.dt.year.fillna(2023).to_numpy()
+        if 'release_date' in fields:
+            features['release_year'] = release_year
+            features['release_month'] = dates.dt.month.fillna(1).to_numpy()
+            features['release_quarter'] = dates.dt.quarter.fillna(1).to_numpy()
+    
+    if 'budget' in fields or ('release_date' in fields and normalizer is not None):
+        budget = np.array([m.budget for m in movies], dtype=float)
+        if normalizer is not None:
+            # Models were trained on ref-year money
+            budget = normalizer.normalize(budget, release_year)
+        features['log_budget'] = np.log1p(budget)
+    
+    if 'crew' in fields:
+        person_power = artifacts_dict.get('person_power', {})
+        star_power = np.array([get_power(m.crew, person_power) for m in movies], dtype=float)
+        features['log_star_power'] = np.log1p(star_power)
+    
+    if 'score' in fields:
+        features['score'] = np.array([m.score or 0 for m in movies], dtype=float)
+    
+    if 'title' in fields and 'buzz_score' in artifacts_dict['columns']:
+        # Search-interest feature (models trained after the Google Trends store was added)
+        store = artifacts_dict['search_interest']
+        features['buzz_score'] = np.array([store.match(m.title or '')['buzz_score'] for m in movies], dtype=float)
+    
+    if 'genres' in fields:
+        genre_vec = artifacts_dict['vectorizer'].transform([clean_genre_string(m.genres) for m in movies]).astype(np.uint8).toarray()
+        features.update(zip(genre_columns(artifacts_dict), genre_vec.T))
+    return features
+
+def preprocess_batch(movies, artifacts_dict):
+    # Encode a batch of movies (anything with MovieFeatures-like attributes) in one pass.
+    # Every block is placed by column name, so the frame follows model_columns.json whatever
+    # order (or optional features) the model was trained with; unknown columns stay 0.
+    # Columns are built directly in the feature-schema dtypes (ml/feature_schema.py).
+    return frame_from_columns(artifacts_dict['columns'], len(movies), encode_fields(movies, artifacts_dict))
+
+def genre_columns(artifacts_dict):
+    # Vectorizer vocabulary in column order (cached)
+    if 'genre_columns' not in artifacts_dict:
+        artifacts_dict['genre_columns'] = list(artifacts_dict['vectorizer'].get_feature_names_out())
+    return artifacts_dict['genre_columns']
+
+def preprocess_input(movie_data, artifacts_dict):
+    return preprocess_batch([movie_data], artifacts_dict)
+
+def quantile_keys(model):
+    # Alphas the multi-quantile booster was trained with, e.g. [0.1, 0.5, 0.9] -> ['p10', 'p50', 'p90']
+    alphas = np.atleast_1d(model.get_params().get('quantile_alpha'))
+    return [f"p{int(round(a * 100))}" for a in alphas]
+
+# Nominal coverage of the RMSE-band intervals (+/- 1.96 RMSE)
+RMSE_INTERVAL_LEVEL = 0.95
+
+def interval_level(scores):
+    # Nominal coverage of *_ci: the spread of the outer quantiles (p10-p90 -> 0.8) when the
+    # quantile models served the batch, otherwise the RMSE band's 0.95
+    if 'opening_weekend_quantiles' in scores:
+        keys = scores['opening_weekend_quantiles'][0]
+        return round((int(keys[-1][1:]) - int(keys[0][1:])) / 100, 2)
+    return RMSE_INTERVAL_LEVEL
+
+def score_features(X, models, artifacts):
+    # One batched predict per model for every row in X.
+    # Quantile models emit all of their quantiles from the same tree pass.
+    n = len(X)
+    scores = {
+        'opening_weekend': models['opening'].predict(X).astype(float),
+        'total_gross': models['revenue'].predict(X).astype(float),
+    }
+    # The models' own outputs (ref-year money when normalized, before dampening): the space the
+    # training targets in the drift reference profile are in
+    scores['model_opening_weekend'] = scores['opening_weekend']
+    scores['model_total_gross'] = scores['total_gross']
+
+    if 'opening_quantiles' in models and 'revenue_quantiles' in models:
+        for target, key in [('opening', 'opening_weekend'), ('revenue', 'total_gross')]:
+            model = models[f'{target}_quantiles']
+            # Independent alphas can cross on rare rows; sorting restores monotonic quantiles
+            q = np.sort(np.asarray(model.predict(X), dtype=float).reshape(n, -1), axis=1)
+            q = np.maximum(q, 0)
+            scores[f'{key}_quantiles'] = (quantile_keys(model), q)
+            scores[f'{key}_ci'] = q[:, [0, -1]]
+    else:
+        # Confidence Interval (Heuristic based on RMSE from metrics)
+        rmse_ow = artifacts['metrics']['opening_weekend']['RMSE']
+        rmse_rev = artifacts['metrics']['revenue']['RMSE']
+
+        # 95% CI ~= +/- 1.96 * RMSE (assuming normal errors, rough approx)
+        for key, rmse in [('opening_weekend', rmse_ow), ('total_gross', rmse_rev)]:
+            pred = scores[key]
+            scores[f'{key}_ci'] = np.column_stack([np.maximum(0, pred - 1.96 * rmse), pred + 1.96 * rmse])
+
+    normalizer = artifacts.get('normalizer')
+    if normalizer is not None:
+        # Models predict ref-year money; convert back to the release year's dollars
+        years = X['release_year'].to_numpy()
+        for key in ['opening_weekend', 'total_gross']:
+            scores[key] = normalizer.denormalize(scores[key], years)
+            scores[f'{key}_ci'] = normalizer.denormalize(scores[f'{key}_ci'], years)
+            if f'{key}_quantiles' in scores:
+                keys, q = scores[f'{key}_quantiles']
+                scores[f'{key}_quantiles'] = (keys, normalizer.denormalize(q, years))
+
+    # Normalize Star Power for display (approx scaling based on log)
+    # log_star_power ranges roughly 0 to 20?
+    # Let's just return the raw log value or scaled 0-100 heuristic
+    raw_sp = X['log_star_power'].to_numpy(dtype=float)
+    scores['star_power'] = np.minimum(100, (raw_sp / 20.0) * 100) # Heuristic scaling
+
+    # Calibration Layer: "Good Value" Heuristic
+    # The raw model can over-index on Budget for high-grossing genres (Sci-Fi).
+    # We apply a dampener for opening weekends > $200M if the Star Power isn't "Avengers-Level" (approx 95/100).
+    dampened = (scores['opening_weekend'] > 200_000_000) & (scores['star_power'] < 94)
+    # Apply a smooth decay
+    correction = np.where(dampened, 0.65, 1.0) # Reduces $271M -> ~$176M (More realistic for Dune 3)
+    # Assume total gross, CI and quantiles scale similarly
+    for key in ['opening_weekend', 'total_gross']:
+        scores[key] = scores[key] * correction
+        scores[f'{key}_ci'] = scores[f'{key}_ci'] * correction[:, None]
+        if f'{key}_quantiles' in scores:
+            keys, q = scores[f'{key}_quantiles']
+            scores[f'{key}_quantiles'] = (keys, q * correction[:, None])
+    scores['dampened'] = dampened
+    return scores
+
+def compute_roi(total_gross, budget):
+    # Vectorized ROI (%) with 0 for missing/zero budgets
+    budget = np.asarray(budget, dtype=float)
+    safe_budget = np.where(budget > 0, budget, 1.0)
+    return np.where(budget > 0, (np.asarray(total_gross) - budget) / safe_budget * 100, 0.0)
+
+def top_features(feature_names, vals, k=5):
+    # Get top k absolute impact features
+    order = np.argsort(-np.abs(vals), kind='stable')[:k]
+    return {feature_names[i]: float(vals[i]) for i in order}
+
+def get_explainer(model):
+    # shap pulls in numba/llvmlite; only pay for it once explanations are needed
+    import shap
+    # Try-catch for various SHAP versions / model types
+    try:
+        return shap.TreeExplainer(model)
+    except Exception as e1:
+        print(f"DEBUG: TreeExplainer(model) failed: {e1}. Trying model.get_booster()")
+        return shap.TreeExplainer(model.get_booster())
+
+def build_explainers(models):
+    # Explainers are built once alongside the models instead of on every request
+    return {'revenue': get_explainer(models['revenue'])}
+
+def set_model_threads(models, n_threads):
+    # Thread budget per process, so N forked workers don't each spin up one OpenMP thread per core
+    for model in models.values():
+        model.set_params(n_jobs=n_threads)
+
+def explain_batch(explainer, X_df):
+    # SHAP matrix (rows x features) for the whole batch in one call, or None if SHAP fails
+    try:
+        # check_additivity=False allows SHAP to proceed even if sum != prediction (common in XGBoost)
+        shap_values = explainer.shap_values(X_df, check_additivity=False)
+
+        # shap_values might be a list (if MultiOutput) or matrix
+        if isinstance(shap_values, list):
+            shap_values = shap_values[0]
+        return np.asarray(shap_values).reshape(len(X_df), -1)
+    except Exception as e:
+        print(f"SHAP Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def get_shap_values(model, X_df, explainer=None):
+    # Top 5 SHAP features for a single row
+    if explainer is None:
+        explainer = get_explainer(model)
+    vals = explain_batch(explainer, X_df)
+    if vals is None:
+        return {}
+    return top_features(list(X_df.columns), vals[0])
+
+def score_and_explain(X, models, artifacts, explainers):
+    # Everything model-side for a batch: one predict per model and one SHAP call
+    scores = score_features(X, models, artifacts)
+    shap_matrix = explain_batch(explainers['revenue'], X) if 'revenue' in explainers else None
+    return scores, shap_matrix
+
+def blend_with_analogs(scores, opening_estimate, revenue_estimate, weight):
+    # Pull the point predictions toward the comparable-title estimate (AnalogIndex.estimate);
+    # intervals and quantiles move by the same ratio so they stay centred on the blended value
+    blended = dict(scores)
+    for key, estimate in (('opening_weekend', opening_estimate), ('total_gross', revenue_estimate)):
+        old = scores[key]
+        new = (1 - weight) * old + weight * estimate
+        ratio = np.divide(new, old, out=np.ones_like(new), where=old > 0)
+        blended[key] = new
+        blended[f'{key}_ci'] = scores[f'{key}_ci'] * ratio[:, None]
+        if f'{key}_quantiles' in scores:
+            keys, q = scores[f'{key}_quantiles']
+            blended[f'{key}_quantiles'] = (keys, q * ratio[:, None])
+    return blended
+
+def slice_scores(scores, start, stop):
+    # Rows [start, stop) of a score_features() result (quantiles are stored as (keys, matrix))
+    sliced = {}
+    for key, value in scores.items():
+        if isinstance(value, tuple):
+            sliced[key] = (value[0], value[1][start:stop])
+        else:
+            sliced[key] = value[start:stop]
+    return sliced
@@ -1,26 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-try:
-    from .media_service import MediaService
-    from .context_engine import ContextEngine
-except ImportError:
-    from media_service import MediaService
-    from context_engine import ContextEngine
-import joblib
-import pandas as pd
+# Served from the repo root (uvicorn backend.main:app) so the ml package and ml/artifacts resolve
+from .media_service import MediaService
+from .context_engine import ContextEngine
+from .inference import ARTIFACT_PATH, load_model_artifacts, build_explainers, set_model_threads, preprocess_batch, score_features, score_and_explain, slice_scores, blend_with_analogs, compute_roi, top_features, interval_level
+from .encoding import JSON, negotiate, available_formats, prediction_columns, columnar_response, cached_json, cached_response, etag_matches
+from .image_cache import ImageCache, valid_image, fetch_tmdb_image
+from .catalog import CATALOG_PATH, load_catalog
+from .profiling import Profiler, ProfilingMiddleware, render as render_profile
+from .sessions import ComparisonSession, serve_session
+from .batching import MicroBatcher
+from .warmup import Warmup
+from ml.drift import DriftMonitor
+from starlette.concurrency import run_in_threadpool
 import numpy as np
 import os
-import json
-import shap
+import threading
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-try:
-    from .schemas import PredictionRequest, PredictionResponse, SinglePrediction
-except ImportError:
-    from schemas import PredictionRequest, PredictionResponse, SinglePrediction
+from .schemas import MovieFeatures, BatchPredictionRequest, PredictionRequest, PredictionResponse, SinglePrediction, CatalogPredictionRequest, CatalogBatchRequest
 
 app = FastAPI(title="Box Office Prediction API")
 
@@ -36,14 +38,54 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],  # Restricted to necessary headers
 )
 
+# Opt-in profiling (armed at runtime via /admin/profiling, or from boot with PROFILING_ENABLED=1)
+profiler = Profiler()
+if os.getenv("PROFILING_ENABLED") == "1":
+    profiler.configure(True, sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+                       memory=os.getenv("PROFILING_MEMORY") == "1")
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
 # Global variables for models
 models = {}
 artifacts = {}
-media_service = MediaService()
+explainers = {}
+media_service = None
+image_cache = None
+monitor = None
+_explainer_lock = threading.Lock()
+
+def get_media_service():
+    # Created on first use, so a missing TMDB_API_KEY doesn't stop the app from importing
+    global media_service
+    if media_service is None:
+        media_service = MediaService()
+    return media_service
+
+def get_image_cache():
+    global image_cache
+    if image_cache is None:
+        image_cache = ImageCache(os.getenv("IMAGE_CACHE_DIR", ".cache/images"),
+                                 int(os.getenv("IMAGE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+    return image_cache
+
+def fetch_media(title):
+    try:
+        return get_media_service().get_movie_media(title) # Cached
+    except ValueError as e:
+        print(f"Media unavailable: {e}")
+        return {}
+
+def ensure_explainers():
+    # Builds the SHAP explainers (importing shap) on first need; the startup warm-up calls
+    # this in the background so normally no request has to wait for it
+    if models and 'revenue' not in explainers:
+        with _explainer_lock:
+            if 'revenue' not in explainers:
+                explainers.update(build_explainers(models))
+    return explainers
 
 def load_artifacts():
-    global models, artifacts
-    artifact_path = 'ml/artifacts'
+    artifact_path = ARTIFACT_PATH
     try:
         # print(f"Current Working Directory: {os.getcwd()}")
         with open('backend_startup_info.log', 'w') as f:
@@ -53,245 +95,457 @@ def load_artifacts():
             else:
                 f.write(f"Artifact path NOT found: {os.path.abspath(artifact_path)}\n")
 
-        models['opening'] = joblib.load(f'{artifact_path}/model_opening.pkl')
-        models['revenue'] = joblib.load(f'{artifact_path}/model_revenue.pkl')
-        artifacts['vectorizer'] = joblib.load(f'{artifact_path}/genre_vectorizer.pkl')
-        artifacts['person_power'] = joblib.load(f'{artifact_path}/person_power.pkl')
+        with profiler.section("load_artifacts"):
+            loaded_models, loaded_artifacts = load_model_artifacts(artifact_path)
+            # Precomputed rows for /predict/catalog (python -m backend.catalog)
+            loaded_artifacts['catalog'] = load_catalog(CATALOG_PATH, loaded_artifacts)
+        models.clear()
+        models.update(loaded_models)
+        artifacts.update(loaded_artifacts)
+        explainers.clear()
         
-        with open(f'{artifact_path}/metrics.json', 'r') as f:
-            artifacts['metrics'] = json.load(f)
-            
-        with open(f'{artifact_path}/model_columns.json', 'r') as f:
-            artifacts['columns'] = json.load(f)
+        global monitor
+        profile = artifacts.get('reference_profile')
+        monitor = DriftMonitor(profile) if profile and os.getenv("MONITORING_ENABLED", "1") == "1" else None
             
         with open('backend_startup_info.log', 'a') as f:
             f.write("Artifacts loaded successfully.\n")
+        print("Artifacts loaded successfully.")
+        return True
             
     except Exception as e:
         with open('backend_startup_error.log', 'w') as f:
             f.write(f"Error loading artifacts: {str(e)}\n")
         print(f"Error loading artifacts: {e}")
-        models['revenue'] = joblib.load(f'{artifact_path}/model_revenue.pkl')
-        artifacts['vectorizer'] = joblib.load(f'{artifact_path}/genre_vectorizer.pkl')
-        artifacts['person_power'] = joblib.load(f'{artifact_path}/person_power.pkl')
-        
-        with open(f'{artifact_path}/metrics.json', 'r') as f:
-            artifacts['metrics'] = json.load(f)
-            
-        with open(f'{artifact_path}/model_columns.json', 'r') as f:
-            artifacts['columns'] = json.load(f)
-            
-        print("Artifacts loaded successfully.")
-    except Exception as e:
-        print(f"Error loading artifacts: {e}")
+        return False
+
+# Preload mode (gunicorn --preload, see gunicorn_conf.py): artifacts are loaded once in the
+# master at import time and forked workers share them copy-on-write instead of reloading.
+if os.getenv("PRELOAD_ARTIFACTS") == "1":
+    load_artifacts()
+    ensure_explainers()
+
+def warm_artifacts():
+    # Already loaded in preload mode; otherwise a failure is retried by the warm-up loop
+    if not models and not load_artifacts():
+        raise RuntimeError("Artifacts failed to load (see backend_startup_error.log)")
+
+def warm_predict():
+    # A small synthetic batch through encoding, the models (and quantile models) and SHAP,
+    # so pandas, the XGBoost thread pool and the explainers are hot before real traffic
+    movies = [
+        MovieFeatures(title="Warm-up A", budget=200000000, release_date="2025-07-04", genres="Action,Adventure", crew="", score=75),
+        MovieFeatures(title="Warm-up B", budget=15000000, release_date="2024-10-31", genres="Horror", crew="", score=60),
+    ]
+    # Straight to the models, so the synthetic rows stay out of the drift monitor
+    score_and_explain(preprocess_batch(movies, artifacts), models, artifacts, ensure_explainers())
+
+def warm_media():
+    # Prefill the media cache for titles users are likely to compare (WARMUP_TITLES=comma list)
+    titles = [t.strip() for t in os.getenv("WARMUP_TITLES", "").split(",") if t.strip()]
+    if titles and not os.getenv("TMDB_API_KEY"):
+        print("Skipping media warm-up: TMDB_API_KEY not set")
+        return
+    for title in titles:
+        fetch_media(title)
+
+warmup = Warmup(max_retry_delay=float(os.getenv("WARMUP_MAX_RETRY_SECONDS", "60")))
+warmup.add_step("artifacts", warm_artifacts, retry=True)
+warmup.add_step("explainers", ensure_explainers)
+warmup.add_step("synthetic_batch", warm_predict)
+# Media is nice-to-have: a TMDB outage shouldn't keep the instance out of rotation
+warmup.add_step("media_cache", warm_media, required=False)
+
+# How long a /predict arriving mid-warm-up waits for the models before returning 503
+PREDICT_WAIT_SECONDS = float(os.getenv("PREDICT_WAIT_SECONDS", "10"))
 
 @app.on_event("startup")
 async def startup_event():
-    load_artifacts()
+    # Startup returns immediately; /health/ready flips to 200 once the warm-up has finished
+    warmup.start()
 
-def preprocess_input(movie_data, artifacts_dict):
-    # Convert input to dataframe row
-    # Requires logic similar to preprocessing.py but for single row
-    # Calculate star power
-    
-    person_power = artifacts_dict.get('person_power', {})
-    
-    def get_power(crew_str):
-        if not crew_str: return 0
-        parts = [x.strip() for x in crew_str.split(',')]
-        names = parts[0::2]
-        if not names: return 0
-        powers = [person_power.get(n, 0) for n in names]
-        return np.mean(powers) if powers else 0
-
-    star_power = get_power(movie_data.crew)
-    log_star_power = np.log1p(star_power)
-    
-    # Date parsing
+def observe(X, scores):
+    # Feed the drift monitor once per scored batch (runs in the scoring thread, off the event loop)
+    if monitor is None:
+        return
     try:
-        dt = pd.to_datetime(movie_data.release_date)
-        release_year = dt.year
-        release_month = dt.month
-        release_quarter = dt.quarter
-    except:
-        release_year = 2023
-        release_month = 1
-        release_quarter = 1
-        
-    log_budget = np.log1p(movie_data.budget)
-    
-    # Genres
-    vectorizer = artifacts_dict['vectorizer']
-    
-    # Apply same preprocessing as training
-    raw_genres = movie_data.genres or ""
-    parts = [x.strip().replace(' ', '_') for x in raw_genres.split(',')]
-    clean_genres = ' '.join(parts)
-    
-    genre_input = [clean_genres]
-    genre_vec = vectorizer.transform(genre_input).toarray()
-    
-    # Create feature array
-    # Base features must match training order
-    # ['log_budget', 'release_year', 'release_month', 'release_quarter', 'log_star_power', 'score'] + genre columns
-    
-    base_feats = [log_budget, release_year, release_month, release_quarter, log_star_power, movie_data.score or 0]
-    full_feats = np.concatenate([base_feats, genre_vec[0]])
+        values = np.column_stack([
+            X.to_numpy(dtype=float),
+            # Undenormalized, undampened: comparable with the training targets in the profile
+            np.log1p(np.clip(scores['model_opening_weekend'], 0, None)),
+            np.log1p(np.clip(scores['model_total_gross'], 0, None)),
+        ])
+        monitor.update(values, list(X.columns) + ['pred_log_opening_weekend', 'pred_log_total_gross'])
+    except Exception as e:
+        print(f"Drift monitor update failed: {e}")
+
+# Model calls and result assembly are the profiled sections (/admin/profiling) of every
+# prediction path: /predict, /predict/batch, /predict/catalog and /ws/compare
+def score_rows(X):
+    with profiler.section("score_rows"):
+        scores, shap_matrix = score_and_explain(X, models, artifacts, ensure_explainers())
+        observe(X, scores)
+        return scores, shap_matrix
+
+def score_rows_fast(X):
+    # No SHAP (/predict/batch?shap=false)
+    with profiler.section("score_rows_fast"):
+        scores = score_features(X, models, artifacts)
+        observe(X, scores)
+        return scores
+
+def split_scored(result, start, stop):
+    scores, shap_matrix = result
+    return slice_scores(scores, start, stop), (shap_matrix[start:stop] if shap_matrix is not None else None)
+
+# Concurrent /predict requests share one model + SHAP call per batch.
+# BATCH_MAX_WAIT_MS=0 disables batching (each request scores its own rows directly).
+batcher = MicroBatcher(
+    score_rows,
+    split_scored,
+    max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "64")),
+    max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "2")),
+)
+
+async def score_request_rows(X, shap=True):
+    # /predict/batch and /predict/catalog/batch. Rows that fit in one micro-batch share it with
+    # the interactive traffic; anything larger is scored on its own in the threadpool, so a
+    # 10,000-row SHAP request never sits in front of the /predict calls queued behind it
+    if not shap:
+        return await run_in_threadpool(score_rows_fast, X), None
+    if len(X) <= batcher.max_batch_size:
+        return await batcher.submit(X)
+    return await run_in_threadpool(score_rows, X)
+
+# Comparable historical titles per prediction; ANALOG_BLEND_WEIGHT > 0 also pulls the
+# predictions toward their grosses (0 = comparables are informational only)
+ANALOG_COUNT = int(os.getenv("ANALOG_COUNT", "5"))
+ANALOG_BLEND_WEIGHT = float(os.getenv("ANALOG_BLEND_WEIGHT", "0"))
+
+def attach_analogs(movies, X, scores):
+    index = artifacts.get('analogs')
+    if index is None:
+        return scores, [[] for _ in movies]
+    rows, similarity = index.query(X, [m.title for m in movies], k=ANALOG_COUNT)
+    if ANALOG_BLEND_WEIGHT > 0:
+        scores = blend_with_analogs(scores, *index.estimate(rows, similarity), ANALOG_BLEND_WEIGHT)
+    return scores, index.describe(rows, similarity)
+
+def build_predictions(movies, X, scores, shap_matrix, media=None):
+    with profiler.section("build_predictions"):
+        scores, comparables = attach_analogs(movies, X, scores)
+        rois = compute_roi(scores['total_gross'], [m.budget for m in movies]).tolist()
+        feature_names = list(X.columns)
     
-    # Ensure columns match model expectation (handling alignment)
-    # Ideally should use pandas to align with model_columns.json
-    feature_cols = artifacts_dict['columns']
+        # Plain Python lists once per batch instead of per-element float() conversions
+        pred_ow = scores['opening_weekend'].tolist()
+        pred_rev = scores['total_gross'].tolist()
+        ci_ow = scores['opening_weekend_ci'].tolist()
+        ci_rev = scores['total_gross_ci'].tolist()
+        ci_level = interval_level(scores)
+        display_sp = scores['star_power'].tolist()
+        q_ow = q_rev = None
+        if 'opening_weekend_quantiles' in scores:
+            keys, q = scores['opening_weekend_quantiles']
+            q_ow = [dict(zip(keys, row)) for row in q.tolist()]
+            keys, q = scores['total_gross_quantiles']
+            q_rev = [dict(zip(keys, row)) for row in q.tolist()]
     
-    # Reconstruct dataframe to ensure column match
-    # Note: Vectorizer columns might vary if retrained with different params, 
-    # but since we loaded the same vectorizer, indices should match IF the feature list was constructed same way.
-    # In preprocessing:  numeric + genre_df
-    # Here: numeric + genre_vec
+        # Contextual explanations for the whole batch in one pass over the rule table
+        if media is None:
+            media = [fetch_media(movie.title) for movie in movies] # Cached
+        contexts = ContextEngine.explain_batch(movies, scores, media, comparables)
     
-    return pd.DataFrame([full_feats], columns=feature_cols)
-
-def get_shap_values(model, X_df):
-    try:
-        # Try-catch for various SHAP versions / model types
-        try:
-            explainer = shap.TreeExplainer(model)
-        except Exception as e1:
-            print(f"DEBUG: TreeExplainer(model) failed: {e1}. Trying model.get_booster()")
-            explainer = shap.TreeExplainer(model.get_booster())
-            
-        # check_additivity=False allows SHAP to proceed even if sum != prediction (common in XGBoost)
-        shap_values = explainer.shap_values(X_df, check_additivity=False)
-        
-        # Get top 5 absolute impact features
-        # shap_values might be a list (if MultiOutput) or matrix
-        if isinstance(shap_values, list):
-            vals = shap_values[0]
-        else:
-            vals = shap_values
+        results = []
+        for i, movie in enumerate(movies):
+            if scores['dampened'][i]:
+                print(f"DEBUG: Dampened High-Budget Prediction for {movie.title} (SP: {display_sp[i]})")
             
-        # Ensure it's 1-dimensional for single row
-        if len(vals.shape) > 1:
-            vals = vals[0]
+            shap_vals = top_features(feature_names, shap_matrix[i]) if shap_matrix is not None else {}
+            explanation, flags, m_stats = contexts[i]
         
-        feature_names = X_df.columns
-        print(f"DEBUG: Feature Names: {len(feature_names)}, SHAP Vals: {len(vals)}")
-        
-        # Zip and sort
-        feature_importance = list(zip(feature_names, vals))
-        feature_importance.sort(key=lambda x: abs(x[1]), reverse=True)
-        
-        top_features = {k: float(v) for k, v in feature_importance[:5]}
-        return top_features
-    except Exception as e:
-        print(f"SHAP Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return {}
+            results.append(SinglePrediction(
+                opening_weekend=pred_ow[i],
+                total_gross=pred_rev[i],
+                opening_weekend_ci=ci_ow[i],
+                total_gross_ci=ci_rev[i],
+                ci_level=ci_level,
+                opening_weekend_quantiles=q_ow[i] if q_ow else {},
+                total_gross_quantiles=q_rev[i] if q_rev else {},
+                roi=rois[i],
+                star_power=display_sp[i],
+                shap_values=shap_vals,
+                explanation=explanation,
+                context_flags=flags,
+                marketing_stats=m_stats,
+                comparables=comparables[i]
+            ))
+        return results
+
+def build_columns(movies, X, scores, shap_matrix, context=True):
+    # Fast path: flat columns straight from the score arrays, no per-movie Pydantic objects
+    with profiler.section("build_columns"):
+        scores, comparables = attach_analogs(movies, X, scores)
+        rois = compute_roi(scores['total_gross'], [m.budget for m in movies])
+        contexts = None
+        if context:
+            media = [fetch_media(movie.title) for movie in movies] # Cached
+            contexts = ContextEngine.explain_batch(movies, scores, media, comparables)
+        return prediction_columns([m.title for m in movies], scores, rois, list(X.columns), shap_matrix, contexts, comparables)
+
+def negotiate_or_406(http_request):
+    fmt = negotiate(http_request.headers.get("accept"))
+    if fmt is None:
+        raise HTTPException(status_code=406, detail={"available": available_formats()})
+    return fmt
 
-def predict_single(movie, artifacts):
+async def wait_for_models():
     if not models:
-        return SinglePrediction(
-            opening_weekend=0, total_gross=0, opening_weekend_ci=[0,0], total_gross_ci=[0,0], roi=0, shap_values={}
-        )
-    
-    X = preprocess_input(movie, artifacts)
+        await run_in_threadpool(warmup.wait_for, "artifacts", PREDICT_WAIT_SECONDS)
+    if not models:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+
+@app.post("/predict", response_model=PredictionResponse)
+async def predict_movies(request: PredictionRequest, http_request: Request):
+    # application/json (default) keeps the PredictionResponse shape the frontend uses;
+    # columnar JSON / MessagePack / Arrow are served from the same scores via encoding.py
+    fmt = negotiate_or_406(http_request)
+    await wait_for_models()
     
-    pred_ow = float(models['opening'].predict(X)[0])
-    pred_rev = float(models['revenue'].predict(X)[0])
+    # Both movies go through the models (and quantile models) in a single batched call,
+    # coalesced with whatever other requests are in flight
+    movies = [request.movie1, request.movie2]
+    X = preprocess_batch(movies, artifacts)
+    scores, shap_matrix = await batcher.submit(X)
     
-    # Confidence Interval (Heuristic based on RMSE from metrics)
-    rmse_ow = artifacts['metrics']['opening_weekend']['RMSE']
-    rmse_rev = artifacts['metrics']['revenue']['RMSE']
+    if fmt != JSON:
+        payload = await run_in_threadpool(build_columns, movies, X, scores, shap_matrix)
+        return columnar_response(payload, fmt, http_request.headers.get("accept-encoding"))
     
-    # 95% CI ~= +/- 1.96 * RMSE (assuming normal errors, rough approx)
-    ci_ow = [max(0, pred_ow - 1.96 * rmse_ow), pred_ow + 1.96 * rmse_ow]
-    ci_rev = [max(0, pred_rev - 1.96 * rmse_rev), pred_rev + 1.96 * rmse_rev]
+    # Media lookups and explanations are blocking I/O; keep them off the event loop
+    p1, p2 = await run_in_threadpool(build_predictions, movies, X, scores, shap_matrix)
     
-    # Calibration Layer: "Good Value" Heuristic
-    # The raw model can over-index on Budget for high-grossing genres (Sci-Fi).
-    # We apply a dampener for opening weekends > $200M if the Star Power isn't "Avengers-Level" (approx 95/100).
+    return PredictionResponse(movie1=p1, movie2=p2)
+
+BATCH_REQUEST_MAX_ROWS = int(os.getenv("BATCH_REQUEST_MAX_ROWS", "10000"))
+
+@app.post("/predict/batch")
+async def predict_batch_endpoint(request: BatchPredictionRequest, http_request: Request, shap: bool = True, context: bool = True):
+    # Column-oriented results for many movies (JSON with parallel arrays by default).
+    # shap=false skips the explainer and context=false skips media lookups / explanations.
+    fmt = negotiate_or_406(http_request)
+    if len(request.movies) > BATCH_REQUEST_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_REQUEST_MAX_ROWS} movies per request")
+    await wait_for_models()
     
-    # Calculate display SP first for the check
-    raw_sp = X['log_star_power'].values[0]
-    display_sp = min(100, (raw_sp / 20.0) * 100) # Heuristic scaling
-
-    if pred_ow > 200_000_000 and display_sp < 94:
-        print(f"DEBUG: Dampening High-Budget Prediction for {movie.title} (SP: {display_sp})")
-        # Apply a smooth decay
-        correction = 0.65 # Reduces $271M -> ~$176M (More realistic for Dune 3)
-        pred_ow *= correction
-        pred_rev *= correction # Assume total gross scales similarly
-        
-        # Adjust CI with same scale
-        ci_ow = [x * correction for x in ci_ow]
-        ci_rev = [x * correction for x in ci_rev]
+    movies = request.movies
+    if not movies:
+        return columnar_response({'n': 0, 'features': list(artifacts['columns']), 'columns': {}}, fmt)
+    X = preprocess_batch(movies, artifacts)
+    scores, shap_matrix = await score_request_rows(X, shap)
     
-    # Re-calculate ROI with corrected values
+    payload = await run_in_threadpool(build_columns, movies, X, scores, shap_matrix, context)
+    return columnar_response(payload, fmt, http_request.headers.get("accept-encoding"))
+
+def catalog_rows(entries):
+    # CatalogMovie list -> (movies, X) from the catalog feature store; only overridden fields are encoded
+    catalog = artifacts.get('catalog')
+    if catalog is None:
+        raise HTTPException(status_code=404, detail="Catalog not available (run python -m backend.catalog)")
+    rows = [catalog.resolve(e.id, e.year) for e in entries]
+    missing = [e.id for e, row in zip(entries, rows) if row is None]
+    if missing:
+        raise HTTPException(status_code=404, detail={"not_in_catalog": missing})
     try:
-        roi = ((pred_rev - movie.budget) / movie.budget) * 100 if movie.budget > 0 else 0
-    except:
-        roi = 0
-        
-    shap_vals = get_shap_values(models['revenue'], X)
-    print(f"DEBUG: SHAP Values generated: {shap_vals}")
+        return catalog.assemble(rows, [e.overrides.model_dump(exclude_none=True) for e in entries], artifacts)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/predict/catalog", response_model=PredictionResponse)
+async def predict_catalog(request: CatalogPredictionRequest, http_request: Request):
+    # Same response as /predict for titles already in the catalog: {"id": 438631, "overrides": {...}}
+    fmt = negotiate_or_406(http_request)
+    await wait_for_models()
     
-    # Normalize Star Power for display (approx scaling based on log)
-    # log_star_power ranges roughly 0 to 20? 
-    # Let's just return the raw log value or scaled 0-100 heuristic
-    raw_sp = X['log_star_power'].values[0]
-    display_sp = min(100, (raw_sp / 20.0) * 100) # Heuristic scaling
+    movies, X = catalog_rows([request.movie1, request.movie2])
+    scores, shap_matrix = await batcher.submit(X)
     
-    # Contextual Explanation
-    media_data = media_service.get_movie_media(movie.title) # Cached
-    explanation, flags, m_stats = ContextEngine.generate_explanation(movie, p_obj := SinglePrediction(
-        opening_weekend=pred_ow,
-        total_gross=pred_rev,
-        opening_weekend_ci=ci_ow,
-        total_gross_ci=ci_rev,
-        roi=roi,
-        star_power=display_sp,
-        shap_values=shap_vals
-    ), media_data)
+    if fmt != JSON:
+        payload = await run_in_threadpool(build_columns, movies, X, scores, shap_matrix)
+        return columnar_response(payload, fmt, http_request.headers.get("accept-encoding"))
     
-    # Re-instantiate with explanation (since p_obj is immutable/validated Pydantic, easier to just create fresh kv pairs)
-    return SinglePrediction(
-        opening_weekend=pred_ow,
-        total_gross=pred_rev,
-        opening_weekend_ci=ci_ow,
-        total_gross_ci=ci_rev,
-        roi=roi,
-        star_power=display_sp,
-        shap_values=shap_vals,
-        explanation=explanation,
-        context_flags=flags,
-        marketing_stats=m_stats
-    )
+    p1, p2 = await run_in_threadpool(build_predictions, movies, X, scores, shap_matrix)
+    return PredictionResponse(movie1=p1, movie2=p2)
 
-@app.post("/predict", response_model=PredictionResponse)
-async def predict_movies(request: PredictionRequest):
-    if not models:
-        raise HTTPException(status_code=503, detail="Models not loaded")
+@app.post("/predict/catalog/batch")
+async def predict_catalog_batch(request: CatalogBatchRequest, http_request: Request, shap: bool = True, context: bool = True):
+    # /predict/batch for catalog entries
+    fmt = negotiate_or_406(http_request)
+    if len(request.movies) > BATCH_REQUEST_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_REQUEST_MAX_ROWS} movies per request")
+    await wait_for_models()
     
-    p1 = predict_single(request.movie1, artifacts)
-    p2 = predict_single(request.movie2, artifacts)
+    if not request.movies:
+        return columnar_response({'n': 0, 'features': list(artifacts['columns']), 'columns': {}}, fmt)
+    movies, X = catalog_rows(request.movies)
+    scores, shap_matrix = await score_request_rows(X, shap)
     
-    return PredictionResponse(movie1=p1, movie2=p2)
+    payload = await run_in_threadpool(build_columns, movies, X, scores, shap_matrix, context)
+    return columnar_response(payload, fmt, http_request.headers.get("accept-encoding"))
+
+# Slider moves within this window (ms) are applied as one update in /ws/compare sessions
+SESSION_DEBOUNCE_MS = float(os.getenv("SESSION_DEBOUNCE_MS", "50"))
+
+@app.websocket("/ws/compare")
+async def compare_session(websocket: WebSocket):
+    # Live two-movie comparison: send field-level deltas, receive only the changed results
+    # (protocol in sessions.py)
+    await websocket.accept()
+    if not models:
+        await run_in_threadpool(warmup.wait_for, "artifacts", PREDICT_WAIT_SECONDS)
+    if not models:
+        await websocket.close(code=1013, reason="Models not loaded") # Try again later
+        return
+    session = ComparisonSession(artifacts, batcher.submit, fetch_media, build_predictions)
+    await serve_session(websocket, session, SESSION_DEBOUNCE_MS / 1000)
+
+# /metrics only changes on retrain and /media is cached per process, so clients revalidate
+# with If-None-Match and get a bodiless 304 while nothing changed
+METRICS_CACHE_CONTROL = "no-cache"
+MEDIA_CACHE_CONTROL = "public, max-age=3600"
+# Proxied TMDB renditions never change under the same file name
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+IMAGE_SECURITY_HEADERS = {"X-Content-Type-Options": "nosniff", "Content-Security-Policy": "default-src 'none'"}
 
 @app.get("/metrics")
-async def get_metrics():
+async def get_metrics(request: Request):
     if not artifacts.get('metrics'):
         raise HTTPException(status_code=503, detail="Metrics not available")
-    return artifacts['metrics']
+    return cached_json(artifacts['metrics'], METRICS_CACHE_CONTROL, request.headers.get("if-none-match"))
 
 @app.post("/retrain")
-async def retrain_model():
+async def retrain_model(incremental: bool = False):
     # Trigger retraining in background (simplification)
     #In prod, use Celery. Here we just say okay.
     # To actually retrain, one would run the train script.
+    # incremental=true continues the current boosters on recent releases (seconds, no tuning)
     import subprocess
-    subprocess.Popen(["python", "ml/train.py"])
-    return {"status": "Retraining started"}
+    subprocess.Popen(["python", "ml/train.py"] + (["--incremental"] if incremental else []))
+    return {"status": "Retraining started", "incremental": incremental}
+
+@app.get("/batching/stats")
+async def get_batching_stats():
+    return batcher.stats()
 
 @app.get("/media")
-async def get_media(title: str):
-    return media_service.get_movie_media(title)
+async def get_media(title: str, request: Request):
+    try:
+        service = get_media_service()
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return cached_json(service.get_movie_media(title), MEDIA_CACHE_CONTROL, request.headers.get("if-none-match"))
+
+@app.get("/images/stats")
+async def get_image_stats():
+    return get_image_cache().stats()
+
+@app.get("/images/{size}/{filename}")
+async def get_image(size: str, filename: str, request: Request):
+    # Poster / backdrop proxy: fetched from TMDB once, then served from the disk cache
+    if not valid_image(size, filename):
+        raise HTTPException(status_code=404, detail="Unknown image")
+    cache = get_image_cache()
+    key = f"{size}/{filename}"
+    if_none_match = request.headers.get("if-none-match")
+
+    # Revalidation of a cached image needs no disk read
+    entry = cache.lookup(key)
+    if entry and etag_matches(if_none_match, f'"{entry["digest"]}"'):
+        return cached_response(b"", entry['content_type'], f'"{entry["digest"]}"', IMAGE_CACHE_CONTROL, if_none_match)
+
+    try:
+        entry, data = await run_in_threadpool(cache.get_or_fetch, key, lambda: fetch_tmdb_image(size, filename))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Image unavailable: {e}")
+    response = cached_response(data, entry['content_type'], f'"{entry["digest"]}"', IMAGE_CACHE_CONTROL, if_none_match)
+    # Served from the API's origin: never sniffed into, or rendered as, anything active
+    response.headers.update(IMAGE_SECURITY_HEADERS)
+    return response
+
+@app.get("/health")
+async def health():
+    # accepting_traffic: models loaded, /predict works
+    # warm: the background warm-up has finished (same as /health/ready)
+    state = {"accepting_traffic": bool(models), "warm": warmup.ready}
+    if not state["accepting_traffic"]:
+        raise HTTPException(status_code=503, detail=state)
+    return state
+
+@app.get("/monitoring/drift")
+async def monitoring_drift():
+    # PSI of served features / predictions against the training reference profile
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring disabled (no reference_profile.json or MONITORING_ENABLED=0)")
+    return await run_in_threadpool(monitor.report)
+
+@app.post("/monitoring/reset")
+async def monitoring_reset():
+    # Start a new observation window (e.g. after a retrain or a traffic change)
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring disabled")
+    monitor.reset()
+    return {"status": "reset"}
+
+@app.get("/health/live")
+async def health_live():
+    # Liveness: the process is up and serving (never depends on artifacts)
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    # Readiness: every required warm-up step has finished
+    status = warmup.status()
+    if not status["ready"]:
+        raise HTTPException(status_code=503, detail=status)
+    return status
+
+def check_profiling_token(request):
+    # Every profiling endpoint needs X-Profiling-Token matching PROFILING_TOKEN; without a
+    # configured token they don't exist
+    if profiler.token is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiler.token_ok(request.headers.get("x-profiling-token")):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@app.get("/admin/profiling")
+async def profiling_status(request: Request):
+    check_profiling_token(request)
+    return profiler.status()
+
+@app.post("/admin/profiling")
+async def profiling_configure(request: Request, enabled: bool = True, sample_rate: Optional[float] = None,
+                              interval_ms: Optional[float] = None, memory: Optional[bool] = None):
+    # Arm (enabled=true) or disarm profiling. While armed, sample_rate of requests plus any
+    # request sent with "X-Profile: 1" are profiled; memory=true adds tracemalloc diffs to sections
+    check_profiling_token(request)
+    return profiler.configure(enabled, sample_rate, interval_ms, memory)
+
+@app.post("/admin/profiling/clear")
+async def profiling_clear(request: Request):
+    check_profiling_token(request)
+    profiler.clear()
+    return {"status": "cleared"}
+
+@app.get("/admin/profiling/{profile_id}")
+async def profiling_download(profile_id: str, request: Request, format: str = "folded"):
+    # format=folded (flamegraph.pl / speedscope), text (summary) or pstats (sections, for snakeviz)
+    check_profiling_token(request)
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    rendered = await run_in_threadpool(render_profile, profile, format)
+    if rendered is None:
+        raise HTTPException(status_code=400, detail=f"Format '{format}' not available for this profile")
+    body, media_type, extension = rendered
+    return Response(content=body, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{profile_id}.{extension}"'})
@@ -2,10 +2,15 @@ import requests
 import functools
 import os
 from dotenv import load_dotenv
+from ml.search_interest import get_store
 
 # Load environment variables
 load_dotenv()
 
+# Renditions listed in /media responses; w500 / w1280 stay the default poster_url / backdrop_url
+POSTER_SIZES = ("w185", "w342", "w500")
+BACKDROP_SIZES = ("w780", "w1280")
+
 class MediaService:
     def __init__(self):
         # Load API key from environment variable
@@ -13,8 +18,11 @@ class MediaService:
         if not self.api_key:
             raise ValueError("TMDB_API_KEY environment variable is not set. Please check your .env file.")
         self.base_url = "https://api.themoviedb.org/3"
-        self.image_base_url = "https://image.tmdb.org/t/p/w500" # w500 is a good size for web
-        self.backdrop_base_url = "https://image.tmdb.org/t/p/w1280"
+        # Images go through the backend's caching proxy (GET /images/{size}/{file}) unless this
+        # is set to "", in which case clients hot-link image.tmdb.org as before
+        self.image_proxy_url = os.getenv("IMAGE_PROXY_URL", "/images")
+        # Google Trends exports (searched_with_*-queries_*.csv) for real buzz features
+        self.search_interest = get_store(os.getenv("SEARCH_INTEREST_DIR", "."))
 
     def _make_request(self, endpoint, params=None):
         if params is None:
@@ -74,6 +82,13 @@ class MediaService:
         
         return []
 
+    def image_urls(self, path, sizes):
+        # Size -> URL for each rendition a client may pick from (e.g. for srcset)
+        if not path:
+            return {}
+        base = self.image_proxy_url or "https://image.tmdb.org/t/p"
+        return {size: f"{base}/{size}{path}" for size in sizes}
+
     @functools.lru_cache(maxsize=50)
     def get_movie_media(self, title):
         movie = self.search_movie(title)
@@ -82,7 +97,9 @@ class MediaService:
                 "found": False,
                 "poster_url": None,
                 "backdrop_url": None,
-                "trailers": []
+                "trailers": [],
+                # Unreleased titles often aren't on TMDB yet but are already being searched for
+                "metrics": self.get_social_stats(title)
             }
 
         movie_id = movie["id"]
@@ -93,8 +110,10 @@ class MediaService:
         poster_path = movie.get("poster_path")
         backdrop_path = movie.get("backdrop_path")
         
-        poster_url = f"{self.image_base_url}{poster_path}" if poster_path else None
-        backdrop_url = f"{self.backdrop_base_url}{backdrop_path}" if backdrop_path else None
+        posters = self.image_urls(poster_path, POSTER_SIZES)
+        backdrops = self.image_urls(backdrop_path, BACKDROP_SIZES)
+        poster_url = posters.get("w500")
+        backdrop_url = backdrops.get("w1280")
         
         trailers = self.get_videos(movie_id)
         
@@ -112,10 +131,23 @@ class MediaService:
             "year": movie.get("release_date", "")[:4],
             "poster_url": poster_url,
             "backdrop_url": backdrop_url,
+            "images": {"poster": posters, "backdrop": backdrops},
             "trailers": trailers,
-            "metrics": self.get_social_stats_mock(movie.get("title"))
+            "metrics": self.get_social_stats(movie.get("title"))
         }
 
+    def get_social_stats(self, title):
+        # Buzz comes from the search-interest store; trailer views are still simulated
+        stats = self.get_social_stats_mock(title)
+        if not title: return stats
+        
+        buzz = self.search_interest.match(title)
+        stats["social_buzz_score"] = round(buzz['buzz_score'])
+        stats["rising_search_score"] = round(buzz['rising_score'])
+        stats["trailer_search_interest"] = round(buzz['trailer_interest'])
+        stats["search_breakout"] = buzz['breakout']
+        return stats
+
     def get_social_stats_mock(self, title):
         # Simulation of social intelligence API
         # In production this would query YouTube/Twitter APIs
@@ -132,13 +164,10 @@ class MediaService:
         # Mocking for demo cases
         if "avengers" in t_lower and "doomsday" in t_lower:
             stats["trailer_views_approx"] = 1_020_000_000 # 1.02B
-            stats["social_buzz_score"] = 98
         elif "dune" in t_lower and ("3" in t_lower or "part three" in t_lower):
-             # Dune 3: No trailer yet, but people search for it
+            # Dune 3: No trailer yet
             stats["trailer_views_approx"] = 0 
-            stats["social_buzz_score"] = 85 # High anticipation
         elif "dune" in t_lower:
             stats["trailer_views_approx"] = 150_000_000
-            stats["social_buzz_score"] = 90
             
         return stats
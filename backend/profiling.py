@@ -0,0 +1,300 @@
+import cProfile
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+# Opt-in profiling for live traffic, armed and disarmed at runtime through /admin/profiling.
+#
+# While disarmed the only cost is one attribute check per request (ProfilingMiddleware) and
+# per profiled section. Once armed:
+#   * a sampled fraction of requests, plus any request sent with "X-Profile: 1", runs under a
+#     stack sampler that snapshots every thread (event loop, threadpool, micro-batcher) at a
+#     fixed interval, so time spent in XGBoost, SHAP or MediaService shows up whichever thread
+#     it runs on. Output is folded stacks ("frame;frame;frame count"), the input format of
+#     flamegraph.pl, speedscope and inferno.
+#   * profiled sections (load_artifacts, score_rows, build_predictions ...) run under cProfile, with tracemalloc
+#     snapshot diffs around them when memory tracing is on.
+# Finished profiles are kept in a small ring and downloaded by id.
+
+# Leaf frames of threads that are just waiting; they would otherwise dominate every flamegraph
+IDLE_FRAMES = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'), ('queue.py', 'get'), ('thread.py', '_worker'),
+    ('base_events.py', '_run_once'),
+}
+
+# The profilers' own allocations are left out of the tracemalloc diffs
+PROFILER_FILTERS = [
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+
+def folded_stack(frame):
+    # Root-first "function (file:line);..." for one thread, or None when it is idle
+    if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+        return None
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+class StackSampler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = folded_stack(frame)
+                if stack:
+                    self.counts[f"{names.get(ident, ident)};{stack}"] += 1
+            self.samples += 1
+
+class Profiler:
+    def __init__(self, max_profiles=20):
+        self.armed = False
+        self.sample_rate = 0.0  # fraction of requests profiled while armed
+        self.interval = 0.005   # stack sampling interval (seconds)
+        self.trace_memory = False
+        self.token = os.getenv("PROFILING_TOKEN") or None # no token: admin endpoints and X-Profile are off
+        self.max_profiles = max_profiles
+        self.profiles = OrderedDict() # id -> profile record, oldest first
+        self._ids = itertools.count(1)
+        # One cProfile section at a time in the whole process: from Python 3.12 enabling a second
+        # profiler raises while another thread's is active (score_rows on the batcher thread and
+        # build_predictions on the threadpool overlap). Sections that find it taken are skipped.
+        self._section_lock = threading.Lock()
+        self.lock = threading.Lock()
+
+    def configure(self, enabled, sample_rate=None, interval_ms=None, memory=None):
+        with self.lock:
+            if sample_rate is not None:
+                self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+            if interval_ms is not None:
+                self.interval = max(interval_ms, 1.0) / 1000
+            if memory is not None:
+                self.trace_memory = memory
+            # tracemalloc slows every allocation, so it only runs while armed with memory=true
+            if enabled and self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            elif (not enabled or not self.trace_memory) and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self.armed = enabled
+        return self.status()
+
+    def status(self):
+        with self.lock:
+            profiles = [self.summary(p) for p in self.profiles.values()]
+        return {
+            "armed": self.armed,
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "memory": self.trace_memory,
+            "profiles": profiles,
+        }
+
+    def summary(self, profile):
+        return {k: v for k, v in profile.items() if k in ("id", "kind", "name", "started", "seconds", "samples")}
+
+    def token_ok(self, supplied):
+        # Fails closed: nothing matches while no token is configured
+        if self.token is None or supplied is None:
+            return False
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def wants(self, forced):
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def _new_id(self, kind):
+        with self.lock:
+            return f"{kind}-{next(self._ids)}"
+
+    def _store(self, profile):
+        if "id" not in profile:
+            profile["id"] = self._new_id(profile["kind"])
+        with self.lock:
+            self.profiles[profile["id"]] = profile
+            while len(self.profiles) > self.max_profiles:
+                self.profiles.popitem(last=False)
+        return profile["id"]
+
+    def get(self, profile_id):
+        with self.lock:
+            return self.profiles.get(profile_id)
+
+    def clear(self):
+        with self.lock:
+            self.profiles.clear()
+
+    def start_request(self, name):
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        return {"id": self._new_id("request"), "kind": "request", "name": name, "started": time.time(),
+                "_t0": time.perf_counter(), "_sampler": sampler}
+
+    def finish_request(self, session):
+        sampler = session.pop("_sampler")
+        counts = sampler.stop()
+        session["seconds"] = time.perf_counter() - session.pop("_t0")
+        session["samples"] = sampler.samples
+        session["folded"] = counts
+        return self._store(session)
+
+    @contextmanager
+    def section(self, name):
+        # cProfile (and tracemalloc diff) around a synchronous block; a no-op while disarmed or
+        # while another section is running. Profiling errors are printed, never raised into the
+        # request.
+        if not self.armed or not self._section_lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            if before is not None:
+                tracemalloc.reset_peak()
+            profile = cProfile.Profile()
+            started, t0 = time.time(), time.perf_counter()
+            profile.enable()
+        except Exception as e:
+            # e.g. a debugger or coverage tool already holds the profiling hook
+            self._section_lock.release()
+            print(f"Profiling section {name} skipped: {e}")
+            yield
+            return
+        try:
+            yield
+        finally:
+            try:
+                profile.disable()
+                record = {"kind": "section", "name": name, "started": started, "seconds": time.perf_counter() - t0}
+                if before is not None:
+                    # Snapshot before building the cProfile stats so their allocations don't show up
+                    after = tracemalloc.take_snapshot().filter_traces(PROFILER_FILTERS)
+                    diff = after.compare_to(before.filter_traces(PROFILER_FILTERS), "lineno")
+                    record["memory"] = {
+                        "peak_bytes": tracemalloc.get_traced_memory()[1],
+                        "top": [{"where": str(d.traceback), "size_diff": d.size_diff, "count_diff": d.count_diff} for d in diff[:20]],
+                    }
+                profile.create_stats()
+                record["stats"] = profile.stats
+                self._store(record)
+            except Exception as e:
+                print(f"Profiling section {name} failed: {e}")
+            finally:
+                self._section_lock.release()
+
+def render(profile, fmt):
+    # -> (body, media type, file extension)
+    if fmt == "folded":
+        if profile["kind"] == "request":
+            lines = [f"{stack} {count}" for stack, count in profile["folded"].most_common()]
+        else:
+            lines = [f"{stack} {count}" for stack, count in stats_to_folded(profile["stats"]).most_common()]
+        return "\n".join(lines) + "\n", "text/plain", "folded"
+    if fmt == "pstats" and profile["kind"] == "section":
+        # Loadable with pstats.Stats / snakeviz
+        return marshal.dumps(profile["stats"]), "application/octet-stream", "prof"
+    if fmt == "text":
+        out = io.StringIO()
+        if profile["kind"] == "section":
+            stats = pstats.Stats(_StatsHolder(profile["stats"]), stream=out)
+            stats.sort_stats("cumulative").print_stats(40)
+            for entry in profile.get("memory", {}).get("top", []):
+                out.write(f"{entry['size_diff']:>12} B {entry['count_diff']:>8} {entry['where']}\n")
+        else:
+            for stack, count in profile["folded"].most_common(40):
+                out.write(f"{count:>6} {stack.rsplit(';', 1)[-1]}  <- {stack}\n")
+        return out.getvalue(), "text/plain", "txt"
+    return None
+
+class _StatsHolder:
+    # pstats.Stats accepts any object with create_stats() / .stats
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def stats_to_folded(stats):
+    # cProfile keeps caller -> callee edges, not whole stacks; each edge's time is attributed
+    # to the path through the heaviest caller chain, which is what flamegraph tools expect
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    best_caller = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        if callers:
+            best_caller[func] = max(callers, key=lambda c: callers[c][3])
+
+    folded = Counter()
+    for func, (_, _, tottime, _, _) in stats.items():
+        path, seen, node = [], set(), func
+        while node is not None and node not in seen:
+            seen.add(node)
+            path.append(label(node))
+            node = best_caller.get(node)
+        weight = int(round(tottime * 1e6)) # microseconds
+        if weight:
+            folded[";".join(reversed(path))] += weight
+    return folded
+
+class ProfilingMiddleware:
+    # Pure ASGI so the disarmed path is a single attribute check
+    def __init__(self, app, profiler, exclude_prefix="/admin/profiling"):
+        self.app = app
+        self.profiler = profiler
+        self.exclude_prefix = exclude_prefix
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if not profiler.armed or scope["type"] != "http" or scope["path"].startswith(self.exclude_prefix):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        forced = headers.get(b"x-profile") == b"1" and profiler.token_ok(headers.get(b"x-profiling-token", b"").decode() or None)
+        if not profiler.wants(forced):
+            return await self.app(scope, receive, send)
+
+        session = profiler.start_request(f"{scope['method']} {scope['path']}")
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                # Download with GET /admin/profiling/{id}
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-id", session["id"].encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.finish_request(session)
+            print(f"Profiled {session['name']} in {session['seconds'] * 1000:.1f}ms -> /admin/profiling/{session['id']}")
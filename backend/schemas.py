@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Union
 
 class MovieFeatures(BaseModel):
     title: Optional[str] = "Unknown"
@@ -14,17 +14,46 @@ class PredictionRequest(BaseModel):
     movie1: MovieFeatures
     movie2: MovieFeatures
 
+class BatchPredictionRequest(BaseModel):
+    movies: List[MovieFeatures]
+
+class MovieOverrides(BaseModel):
+    # Any MovieFeatures field; only the fields given replace the catalog values
+    title: Optional[str] = None
+    budget: Optional[float] = None
+    is_estimated_budget: Optional[bool] = None
+    release_date: Optional[str] = None
+    genres: Optional[str] = None
+    crew: Optional[str] = None
+    score: Optional[float] = None
+
+class CatalogMovie(BaseModel):
+    id: Union[int, str] # TMDB id, or a title (matched on its normalized form)
+    year: Optional[int] = None # Picks the release when a title was made more than once
+    overrides: MovieOverrides = MovieOverrides()
+
+class CatalogPredictionRequest(BaseModel):
+    movie1: CatalogMovie
+    movie2: CatalogMovie
+
+class CatalogBatchRequest(BaseModel):
+    movies: List[CatalogMovie]
+
 class SinglePrediction(BaseModel):
     opening_weekend: float
     total_gross: float
     opening_weekend_ci: List[float] # [lower, upper]
     total_gross_ci: List[float] # [lower, upper]
+    ci_level: Optional[float] = None # Nominal coverage of both CIs: 0.8 for p10-p90 quantiles, 0.95 for the RMSE band
+    opening_weekend_quantiles: Optional[Dict[str, float]] = {} # e.g. {"p10": .., "p50": .., "p90": ..}
+    total_gross_quantiles: Optional[Dict[str, float]] = {}
     roi: float
     star_power: float # Historical/Franchise score
     shap_values: Dict[str, float] # Top contributing features
     explanation: Optional[str] = ""
     context_flags: Optional[Dict[str, bool]] = {}
     marketing_stats: Optional[Dict[str, str]] = {}
+    comparables: Optional[List[Dict[str, Any]]] = [] # Closest historical titles with their grosses
 
 class PredictionResponse(BaseModel):
     movie1: SinglePrediction
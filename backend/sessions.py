@@ -0,0 +1,207 @@
+import asyncio
+import json
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketDisconnect
+
+from ml.feature_schema import cast_column, column_dtype, frame_from_columns
+
+from .inference import MOVIE_FIELDS, encode_fields, slice_scores
+from .schemas import MovieFeatures, MovieOverrides
+
+# Interactive comparison sessions (WebSocket /ws/compare).
+#
+# The server keeps the two movies of a comparison, their encoded feature rows, scores, media
+# and last results. Clients send field-level deltas:
+#
+#   {"seq": 7, "movie1": {"budget": 250000000}}
+#
+# (the first message carries both movies in full). Deltas arriving within the debounce window,
+# or while the previous update is still being computed, are merged into one update. Each update
+# re-runs only the stages its fields feed:
+#
+#   encode   just the changed fields (encode_fields), for the changed movie only
+#   media    only when the title changed
+#   score    models + SHAP, only for movies whose encoded row actually changed
+#   context  analogs, ROI and explanation for every changed movie
+#
+# and the reply holds only the result fields whose values changed:
+#
+#   {"type": "delta", "seq": 7, "coalesced": 3, "movie1": {"opening_weekend": ..., "roi": ...},
+#    "recomputed": {"movie1": ["encode", "score", "context"]}}
+
+SLOTS = ('movie1', 'movie2')
+FIELDS = tuple(MovieFeatures.model_fields)
+
+class ComparisonSession:
+    def __init__(self, artifacts, score, fetch_media, build):
+        # score(X) -> awaitable (scores, shap_matrix), e.g. MicroBatcher.submit
+        # fetch_media(title) -> media dict (blocking)
+        # build(movies, X, scores, shap_matrix, media) -> list of SinglePrediction (blocking)
+        self.artifacts = artifacts
+        self.score = score
+        self.fetch_media = fetch_media
+        self.build = build
+        self.movies = {}  # slot -> MovieFeatures
+        self.rows = {}    # slot -> column -> 1-element array in schema dtype
+        self.scores = {}  # slot -> (scores, shap row) for that movie alone
+        self.media = {}
+        self.results = {} # slot -> last result sent, as a plain dict
+
+    def merge(self, deltas):
+        # slot -> {field: value} -> slot -> (movie, changed fields). Raises ValueError (pydantic's
+        # ValidationError) when a movie would be invalid; nothing is modified in that case.
+        missing = [s for s in SLOTS if s not in self.movies and s not in deltas]
+        if missing:
+            raise ValueError(f"The first update must include both movies (missing {', '.join(missing)})")
+        merged = {}
+        for slot, delta in deltas.items():
+            current = self.movies.get(slot)
+            fields = dict(current.model_dump() if current else {}, **delta)
+            movie = MovieFeatures.model_validate(fields)
+            changed = {f for f in FIELDS if current is None or getattr(movie, f) != getattr(current, f)}
+            if changed:
+                merged[slot] = (movie, changed)
+        return merged
+
+    def prepare(self, merged):
+        # Encoding and media lookups for the changed movies (blocking; run in a worker thread).
+        # -> (slots to rescore, stages per slot)
+        columns = self.artifacts['columns']
+        stages = {slot: [] for slot in merged}
+
+        # One encode pass per distinct set of changed fields
+        groups = {}
+        for slot, (movie, changed) in merged.items():
+            fields = frozenset(changed & set(MOVIE_FIELDS))
+            if fields:
+                groups.setdefault(fields, []).append(slot)
+        rescore = []
+        for fields, slots in groups.items():
+            encoded = encode_fields([merged[s][0] for s in slots], self.artifacts, fields)
+            for i, slot in enumerate(slots):
+                old = self.rows.get(slot)
+                row = dict(old) if old else {c: np.zeros(1, dtype=column_dtype(c)) for c in columns}
+                for column, values in encoded.items():
+                    if column in row:
+                        row[column] = cast_column(column, values[i:i + 1])
+                self.rows[slot] = row
+                stages[slot].append('encode')
+                # e.g. a crew edit that leaves star power unchanged needs no model call
+                if old is None or any(not np.array_equal(old[c], row[c], equal_nan=True) for c in columns):
+                    rescore.append(slot)
+
+        for slot, (movie, changed) in merged.items():
+            if 'title' in changed or slot not in self.media:
+                self.media[slot] = self.fetch_media(movie.title) # Cached
+                stages[slot].append('media')
+            self.movies[slot] = movie
+        return rescore, stages
+
+    def frame(self, slots):
+        columns = self.artifacts['columns']
+        values = {c: np.concatenate([self.rows[s][c] for s in slots]) for c in columns}
+        return frame_from_columns(columns, len(slots), values)
+
+    def finish(self, slots):
+        # Analogs, ROI and explanations for the changed movies -> slot -> changed result fields
+        changes = {}
+        for slot in slots:
+            scores, shap_row = self.scores[slot]
+            [prediction] = self.build([self.movies[slot]], self.frame([slot]), scores, shap_row, [self.media[slot]])
+            result = prediction.model_dump()
+            previous = self.results.get(slot, {})
+            changed = {k: v for k, v in result.items() if previous.get(k) != v}
+            self.results[slot] = result
+            if changed:
+                changes[slot] = changed
+        return changes
+
+    async def apply(self, merged):
+        # merge() output -> (slot -> changed result fields, slot -> stages run)
+        if not merged:
+            return {}, {}
+
+        rescore, stages = await run_in_threadpool(self.prepare, merged)
+        if rescore:
+            scores, shap_matrix = await self.score(self.frame(rescore))
+            for i, slot in enumerate(rescore):
+                self.scores[slot] = (slice_scores(scores, i, i + 1), shap_matrix[i:i + 1] if shap_matrix is not None else None)
+                stages[slot].append('score')
+        for slot in merged:
+            stages[slot].append('context')
+
+        changes = await run_in_threadpool(self.finish, list(merged))
+        return changes, stages
+
+def parse_message(text):
+    # -> (seq, slot -> delta). Raises ValueError for malformed messages.
+    message = json.loads(text)
+    if not isinstance(message, dict):
+        raise ValueError("Expected a JSON object")
+    deltas = {}
+    for slot in SLOTS:
+        delta = message.get(slot)
+        if delta is None:
+            continue
+        if not isinstance(delta, dict):
+            raise ValueError(f"{slot} must be an object of fields")
+        unknown = set(delta) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields for {slot}: {', '.join(sorted(unknown))}")
+        # Per-field type checks here; whole-movie validation happens when the update is applied
+        MovieOverrides.model_validate(delta)
+        deltas[slot] = delta
+    return message.get('seq'), deltas
+
+async def serve_session(websocket, session, debounce):
+    # Reads deltas as they arrive and applies them in coalesced batches: after the first pending
+    # delta the worker waits `debounce` seconds, then applies everything received so far. Deltas
+    # that arrive while an update is being computed form the next batch.
+    pending = {}
+    state = {'seq': None, 'count': 0}
+    wake = asyncio.Event()
+
+    async def reader():
+        while True:
+            text = await websocket.receive_text()
+            try:
+                seq, deltas = parse_message(text)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            for slot, delta in deltas.items():
+                pending.setdefault(slot, {}).update(delta)
+            state['seq'] = seq
+            state['count'] += 1
+            wake.set()
+
+    async def worker():
+        while True:
+            await wake.wait()
+            if debounce > 0:
+                await asyncio.sleep(debounce)
+            wake.clear()
+            deltas = dict(pending)
+            pending.clear()
+            seq, count = state['seq'], state['count']
+            state['count'] = 0
+            try:
+                merged = session.merge(deltas)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": str(e)})
+                continue
+            changes, stages = await session.apply(merged)
+            await websocket.send_json(dict({"type": "delta", "seq": seq, "coalesced": count, "recomputed": stages}, **changes))
+
+    tasks = [asyncio.ensure_future(reader()), asyncio.ensure_future(worker())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from ml.analogs import AnalogIndex
+
+def history():
+    X = pd.DataFrame({
+        'log_budget': [19.0, 19.1, 16.0, 18.9, 15.5],
+        'release_year': [1984, 2021, 2010, 2015, 2019],
+        'genre_Action': [0, 0, 1, 1, 0],
+    })
+    titles = np.array(["Dune", "Dune", "Small Comedy", "Big Action", "Indie Drama"])
+    revenue = np.array([30.9e6, 400e6, 20e6, 300e6, 5e6])
+    return AnalogIndex.build(X, titles, revenue, revenue / 3), X
+
+def test_query_prefers_franchise_and_skips_own_entry():
+    index, X = history()
+    query = X.iloc[[1]]  # "Dune" (2021) itself
+    rows, similarity = index.query(query, ["Dune: Part Two"], k=3)
+    assert index.titles[rows[0, 0]] == "Dune"
+    assert np.all(np.diff(similarity[0]) <= 0)
+
+    rows, similarity = index.query(query, ["Dune"], k=3)
+    comparables = index.describe(rows, similarity)[0]
+    assert (comparables[0]['title'], comparables[0]['year']) == ("Dune", 1984)
+    assert ("Dune", 2021) not in [(c['title'], c['year']) for c in comparables]
+
+def test_estimate_stays_within_comparables():
+    index, X = history()
+    rows, similarity = index.query(X, list(index.titles), k=2)
+    opening, revenue = index.estimate(rows, similarity)
+    assert revenue.shape == (len(X),)
+    assert np.all(revenue >= index.revenue[rows].min(axis=1) - 1)
+    assert np.all(revenue <= index.revenue[rows].max(axis=1) + 1)
+    assert np.allclose(opening * 3, revenue, rtol=1e-6)
@@ -43,3 +43,16 @@ def test_predict():
     assert data['movie1']['opening_weekend'] > 0
     assert data['movie1']['roi'] != 0
     assert "shap_values" in data['movie1']
+
+def test_profiling_endpoints_fail_closed(monkeypatch):
+    from backend.main import profiler
+    # No PROFILING_TOKEN configured: the endpoints don't exist
+    monkeypatch.setattr(profiler, "token", None)
+    assert client.get("/admin/profiling").status_code == 404
+    assert client.post("/admin/profiling?enabled=true").status_code == 404
+    assert not profiler.armed
+
+    monkeypatch.setattr(profiler, "token", "secret")
+    assert client.get("/admin/profiling").status_code == 403
+    assert client.get("/admin/profiling", headers={"X-Profiling-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/profiling", headers={"X-Profiling-Token": "secret"}).status_code == 200
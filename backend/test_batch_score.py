@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from backend import batch_score
+
+# Chunk id the fake scorer fails on (read by the forked pool workers)
+FAIL_ON_CHUNK = None
+
+def fake_init_worker(artifact_path, n_threads, with_shap):
+    pass
+
+def fake_score_chunk(chunk_id, movies, with_shap):
+    if chunk_id == FAIL_ON_CHUNK:
+        raise RuntimeError("worker crashed")
+    return chunk_id, pd.DataFrame({'title': movies['title'].to_numpy(), 'total_gross': movies['budget'].to_numpy() * 2})
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    # Workers are forked, so the patched functions are what they run
+    monkeypatch.setattr(batch_score, '_init_worker', fake_init_worker)
+    monkeypatch.setattr(batch_score, 'score_chunk', fake_score_chunk)
+
+def write_input(path, n):
+    pd.DataFrame({'title': [f"Movie {i}" for i in range(n)], 'budget': [1e6 * (i + 1) for i in range(n)],
+                  'release_date': ["2024-05-01"] * n}).to_csv(path, index=False)
+
+def test_chunks_are_written_in_input_order(tmp_path, fake_pool):
+    write_input(tmp_path / "in.csv", 7)
+    out = tmp_path / "out.csv"
+    assert batch_score.run(str(tmp_path / "in.csv"), str(out), chunksize=2, workers=2) == 7
+    scored = pd.read_csv(out)
+    assert scored['title'].tolist() == [f"Movie {i}" for i in range(7)]
+    assert not (tmp_path / "out.csv.checkpoint.json").exists()
+
+def test_resume_truncates_partial_chunk_after_crash(tmp_path, fake_pool):
+    global FAIL_ON_CHUNK
+    write_input(tmp_path / "in.csv", 6)
+    out = tmp_path / "out.csv"
+    FAIL_ON_CHUNK = 2
+    try:
+        with pytest.raises(RuntimeError):
+            batch_score.run(str(tmp_path / "in.csv"), str(out), chunksize=2, workers=1)
+    finally:
+        FAIL_ON_CHUNK = None
+    assert batch_score.load_checkpoint(f"{out}.checkpoint.json")['chunks_done'] == 2
+    # A chunk cut off mid-write
+    with open(out, 'a') as f:
+        f.write("Movie 4,80000")
+
+    assert batch_score.run(str(tmp_path / "in.csv"), str(out), chunksize=2, workers=1, resume=True) == 6
+    scored = pd.read_csv(out)
+    assert scored['title'].tolist() == [f"Movie {i}" for i in range(6)]
+    assert scored['total_gross'].tolist() == [2e6 * (i + 1) for i in range(6)]
+
+def test_resume_refuses_missing_or_replaced_output(tmp_path, fake_pool):
+    global FAIL_ON_CHUNK
+    write_input(tmp_path / "in.csv", 6)
+    out = tmp_path / "out.csv"
+    FAIL_ON_CHUNK = 2
+    try:
+        with pytest.raises(RuntimeError):
+            batch_score.run(str(tmp_path / "in.csv"), str(out), chunksize=2, workers=1)
+    finally:
+        FAIL_ON_CHUNK = None
+
+    # Replaced by a shorter file, then deleted: never padded with NULs and appended to
+    out.write_text("title\n")
+    with pytest.raises(ValueError, match="--resume"):
+        batch_score.run(str(tmp_path / "in.csv"), str(out), chunksize=2, workers=1, resume=True)
+    assert out.read_text() == "title\n"
+    out.unlink()
+    with pytest.raises(ValueError, match="--resume"):
+        batch_score.run(str(tmp_path / "in.csv"), str(out), chunksize=2, workers=1, resume=True)
+    assert not out.exists()
+
+def test_header_only_input(tmp_path, fake_pool):
+    write_input(tmp_path / "in.csv", 0)
+    assert batch_score.run(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), workers=1) == 0
+
+def test_missing_budget_column_is_refused(tmp_path):
+    pd.DataFrame({'Release Group': ["Dune"], 'Year': [2021]}).to_csv(tmp_path / "in.csv", index=False)
+    column_map = batch_score.detect_column_map(str(tmp_path / "in.csv"))
+    with pytest.raises(ValueError, match="budget"):
+        batch_score.run(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), workers=1, column_map=column_map)
+    assert batch_score.check_columns(['Release Group', 'Year'], column_map, allow_missing=True) == ['budget', 'genres', 'crew', 'score']
+
+def test_normalize_chunk_parses_ratings_and_years():
+    chunk = pd.DataFrame({'Release Group': ["Dune", None], 'Year': [2021.0, 1999.0],
+                          'Rating': ["7.8/10", "85"], 'Genres': ["Sci-Fi", None]})
+    movies = batch_score.normalize_chunk(chunk, batch_score.CATALOG_COLUMNS)
+    assert movies['release_date'].tolist() == ["2021-01-01", "1999-01-01"]
+    assert movies['score'].tolist() == [78.0, 85.0]
+    assert movies['title'].tolist() == ["Dune", "Unknown"]
+    assert movies['budget'].tolist() == [0.0, 0.0] and movies['genres'].tolist() == ["Sci-Fi", ""]
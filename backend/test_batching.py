@@ -0,0 +1,78 @@
+import asyncio
+import pandas as pd
+from backend.batching import MicroBatcher
+
+def make_batcher(calls, **kwargs):
+    def score_fn(X):
+        calls.append(len(X))
+        return X['x'].to_numpy() * 10
+
+    def split_fn(result, start, stop):
+        return result[start:stop]
+
+    return MicroBatcher(score_fn, split_fn, **kwargs)
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+    batcher = make_batcher(calls, max_batch_size=64, max_wait_ms=20)
+
+    async def run():
+        frames = [pd.DataFrame({'x': [i, i + 100]}) for i in range(5)]
+        return await asyncio.gather(*(batcher.submit(X) for X in frames))
+
+    results = asyncio.run(run())
+
+    assert calls == [10]
+    for i, result in enumerate(results):
+        assert list(result) == [i * 10, (i + 100) * 10]
+    stats = batcher.stats()
+    assert stats['batches'] == 1
+    assert stats['batch_size_histogram'] == {'10': 1}
+
+def test_max_batch_size_caps_batches():
+    calls = []
+    batcher = make_batcher(calls, max_batch_size=4, max_wait_ms=20)
+
+    async def run():
+        frames = [pd.DataFrame({'x': [i, i]}) for i in range(4)]
+        return await asyncio.gather(*(batcher.submit(X) for X in frames))
+
+    results = asyncio.run(run())
+
+    assert calls == [4, 4]
+    assert [list(r) for r in results] == [[i * 10, i * 10] for i in range(4)]
+
+def test_disabled_batcher_scores_directly():
+    calls = []
+    batcher = make_batcher(calls, max_wait_ms=0)
+
+    result = asyncio.run(batcher.submit(pd.DataFrame({'x': [1, 2]})))
+
+    assert calls == [2]
+    assert list(result) == [10, 20]
+
+def test_large_batch_requests_bypass_the_micro_batcher(monkeypatch):
+    import backend.main as main
+    routes = []
+
+    async def submit(X):
+        routes.append(('batcher', len(X)))
+        return 'scores', 'shap'
+
+    def score_rows(X):
+        routes.append(('direct', len(X)))
+        return 'scores', 'shap'
+
+    monkeypatch.setattr(main.batcher, 'submit', submit)
+    monkeypatch.setattr(main.batcher, 'max_batch_size', 4)
+    monkeypatch.setattr(main, 'score_rows', score_rows)
+    monkeypatch.setattr(main, 'score_rows_fast', lambda X: 'scores')
+
+    async def run():
+        small = await main.score_request_rows(pd.DataFrame({'x': range(4)}))
+        large = await main.score_request_rows(pd.DataFrame({'x': range(5)}))
+        fast = await main.score_request_rows(pd.DataFrame({'x': range(5)}), shap=False)
+        return small, large, fast
+
+    assert asyncio.run(run()) == (('scores', 'shap'), ('scores', 'shap'), ('scores', None))
+    assert routes == [('batcher', 4), ('direct', 5)]
@@ -0,0 +1,66 @@
+import numpy as np
+
+from backend.catalog import CatalogStore, catalog_fingerprint, load_catalog
+
+COLUMNS = ['log_budget', 'release_year', 'score', 'action']
+ARTIFACTS = {'columns': COLUMNS, 'metrics': {'training': {'trained_through': "2024-06"}}}
+
+def store():
+    values = {
+        'log_budget': np.array([18.0, 19.0, 0.0], dtype=np.float32),
+        'release_year': np.array([1984, 2021, 2026], dtype=np.int16),
+        'score': np.array([60, 78, 0], dtype=np.float32),
+        'action': np.array([0, 1, 1], dtype=np.uint8),
+    }
+    return CatalogStore(COLUMNS, values, titles=["Dune", "Dune", "Dune: Part Three"], years=[1984, 2021, 2026],
+                        ids=[-1, 438631, 1170608], budgets=[4e7, 1.65e8, 0], release_dates=["1984-12-01", "2021-09-01", "2026-12-17"],
+                        genres=["", "action", "action"], scores=[60, 78, 0], fingerprint=catalog_fingerprint(ARTIFACTS))
+
+def test_resolve_by_id_and_normalized_title():
+    catalog = store()
+    assert catalog.resolve(438631) == 1
+    assert catalog.resolve("the dune") == 1 # most recent release
+    assert catalog.resolve("DUNE", year=1984) == 0
+    assert catalog.resolve("Dune Part 3") == 2
+    assert catalog.resolve(5) is None and catalog.resolve("Arrival") is None
+
+def test_assemble_reencodes_only_overridden_fields():
+    catalog = store()
+    artifacts = {'columns': COLUMNS}
+    movies, X = catalog.assemble([1, 0], [{'score': 90}, {}], artifacts)
+    assert X['score'].tolist() == [90, 60]
+    assert X['log_budget'].tolist() == [19.0, 18.0] and X['action'].tolist() == [1, 0]
+    assert movies[0].title == "Dune" and movies[0].budget == 1.65e8
+    # The stored arrays are untouched
+    assert catalog.values['score'][1] == 78
+
+    try:
+        catalog.assemble([2], [{}], artifacts)
+        assert False, "catalog rows without a budget need overrides.budget"
+    except ValueError:
+        pass
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "catalog_store.npz")
+    store().save(path)
+    loaded = load_catalog(path, ARTIFACTS)
+    assert loaded.resolve(1170608) == 2 and loaded.values['action'].dtype == np.uint8
+    assert loaded.fingerprint == catalog_fingerprint(ARTIFACTS)
+    assert load_catalog(path, dict(ARTIFACTS, columns=COLUMNS + ['buzz_score'])) is None
+
+def test_load_ignores_store_built_from_other_artifacts(tmp_path):
+    class Normalizer:
+        def to_config(self):
+            return {'mode': 'market', 'ref_year': 2019}
+
+    path = str(tmp_path / "catalog_store.npz")
+    store().save(path)
+    # Retrained on newer releases, or with money normalized differently
+    assert load_catalog(path, dict(ARTIFACTS, metrics={'training': {'trained_through': "2025-01"}})) is None
+    assert load_catalog(path, dict(ARTIFACTS, normalizer=Normalizer())) is None
+
+    # Stores written before fingerprints existed are ignored too
+    unmarked = store()
+    unmarked.fingerprint = None
+    unmarked.save(path)
+    assert load_catalog(path, ARTIFACTS) is None
@@ -0,0 +1,28 @@
+try:
+    from .context_engine import ContextEngine
+    from .schemas import MovieFeatures
+except ImportError:
+    from context_engine import ContextEngine
+    from schemas import MovieFeatures
+
+def movie(title, estimated=False):
+    return MovieFeatures(title=title, budget=150_000_000, is_estimated_budget=estimated,
+                         release_date="2025-12-18", genres="Action", crew="", score=70)
+
+def test_explain_batch_fires_rules_per_row():
+    movies = [movie("Sequel", estimated=True), movie("Original")]
+    predictions = {'opening_weekend': [100e6, 20e6], 'total_gross': [300e6, 90e6], 'star_power': [95, 40]}
+    media = [
+        {'trailers': [], 'metrics': {'trailer_views_approx': 80_000_000, 'social_buzz_score': 85, 'search_breakout': True}},
+        {'trailers': ['t'], 'metrics': {'trailer_views_approx': 1_000_000, 'social_buzz_score': 10}},
+    ]
+
+    (text1, flags1, stats1), (text2, flags2, stats2) = ContextEngine.explain_batch(movies, predictions, media)
+
+    assert flags1 == {'is_estimated': True, 'high_marketing': True, 'high_search_interest': True, 'franchise_legacy': True}
+    assert stats1 == {'Organic Reach': "High", 'Search Buzz': "85/100"}
+    assert "$150.0M" in text1 and "~80.0M+" in text1 and "(buzz 85/100) with breakout" in text1
+    assert "legs > 3.5x" not in text1
+    # Trailers present, low buzz, 4.5x legs: only the legs sentence
+    assert flags2 == {} and stats2 == {}
+    assert text2 == "Long run potential is high based on genre and release window (legs > 3.5x)."
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from ml.drift import DriftMonitor, build_reference_profile
+
+def make_frame(rng, n, budget_shift=0.0):
+    return pd.DataFrame({
+        'log_budget': rng.normal(17.5 + budget_shift, 1.0, n),
+        'action': (rng.random(n) < 0.3).astype(int),
+    })
+
+def test_drift_monitor_flags_shifted_columns_only():
+    rng = np.random.default_rng(0)
+    train = make_frame(rng, 5000)
+    y = pd.DataFrame({'opening_weekend': rng.lognormal(16, 1, 5000), 'revenue': rng.lognormal(17, 1, 5000)})
+    profile = build_reference_profile(train, y)
+    assert profile['columns']['action']['edges'] == [0.5]
+
+    monitor = DriftMonitor(profile, reservoir_size=64)
+    served = make_frame(rng, 2000, budget_shift=2.0)
+    # Column order differs from the profile and the predictions are absent
+    monitor.update(served[['action', 'log_budget']].to_numpy(), ['action', 'log_budget'])
+
+    report = monitor.report()
+    assert report['rows'] == 2000 and monitor.reservoir.shape == (64, 4)
+    assert report['columns']['log_budget']['status'] == 'major'
+    assert report['columns']['action']['status'] == 'stable'
+    assert report['columns']['pred_log_total_gross']['status'] == 'insufficient_data'
+    assert report['drifted'] == ['log_budget']
+
+    monitor.reset()
+    assert monitor.report()['rows'] == 0
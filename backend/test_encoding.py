@@ -0,0 +1,35 @@
+import gzip
+import json
+
+import numpy as np
+
+from backend import encoding
+
+def test_negotiate_prefers_highest_q_available_format():
+    assert encoding.negotiate(None) == encoding.JSON
+    assert encoding.negotiate("text/html;q=0.9, application/vnd.boxoffice.columnar+json") == encoding.COLUMNAR_JSON
+    assert encoding.negotiate("application/json;q=0.5, application/vnd.boxoffice.columnar+json;q=0.8") == encoding.COLUMNAR_JSON
+    assert encoding.negotiate("text/html, application/json;q=0") is None
+
+def test_columnar_json_round_trip():
+    scores = {
+        'opening_weekend': np.array([100.0, 20.0]),
+        'opening_weekend_ci': np.array([[80.0, 120.0], [10.0, 30.0]]),
+        'total_gross': np.array([300.0, 90.0]),
+        'total_gross_ci': np.array([[250.0, 350.0], [60.0, 120.0]]),
+        'star_power': np.array([95.0, 40.0]),
+    }
+    shap_matrix = np.array([[1.0, -5.0, 2.0], [0.5, 0.1, -0.2]])
+    contexts = [("Sequel text", {'franchise_legacy': True}, {'Search Buzz': "85/100"}), ("", {}, {})]
+    payload = encoding.prediction_columns(["A", "B"], scores, [50.0, -10.0], ["budget", "year", "score"], shap_matrix, contexts, k=2)
+
+    response = encoding.columnar_response(payload, encoding.COLUMNAR_JSON, "gzip")
+    body = json.loads(gzip.decompress(response.body)) if response.headers.get("content-encoding") else json.loads(response.body)
+
+    cols = body['columns']
+    assert body['n'] == 2 and cols['total_gross_high'] == [350.0, 120.0]
+    # Top features by |SHAP|, as indices into the shared feature table
+    assert [body['features'][i] for i in cols['shap_index'][0]] == ["year", "score"]
+    assert cols['shap_value'][0] == [-5.0, 2.0]
+    assert cols['flag_franchise_legacy'] == [True, False]
+    assert cols['stat_Search Buzz'] == ["85/100", None]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.feature_schema import apply_schema, column_dtype, frame_from_columns, read_processed
+
+def test_frame_uses_declared_dtypes_and_zero_fills():
+    X = frame_from_columns(['log_budget', 'release_year', 'release_month', 'action'], 2,
+                           {'log_budget': [18.5, 17.0], 'release_year': [2024.0, 1999.0], 'action': [1, 0]})
+    assert list(X.dtypes) == [np.float32, np.int16, np.uint8, np.uint8]
+    assert X['release_month'].tolist() == [0, 0] and X['release_year'].tolist() == [2024, 1999]
+
+def test_apply_schema_and_read_processed_round_trip(tmp_path):
+    df = pd.DataFrame({'log_budget': [18.5], 'release_year': [2024], 'drama': [1], 'revenue': [1e8], 'names': ["A"]})
+    path = tmp_path / "processed_data.csv"
+    df.to_csv(path, index=False)
+    loaded = read_processed(path)
+    assert loaded['drama'].dtype == np.uint8 and loaded['revenue'].dtype == np.float64
+    X = apply_schema(df[['log_budget', 'release_year', 'drama']])
+    assert all(X[c].dtype == column_dtype(c) for c in X.columns)
+    assert apply_schema(X) is X
+
+def test_undeclared_columns_must_be_indicators(tmp_path):
+    # A continuous feature missing from DTYPES would otherwise wrap modulo 256 as uint8
+    with pytest.raises(ValueError, match="opening_theaters"):
+        frame_from_columns(['log_budget', 'opening_theaters'], 1, {'log_budget': [18.5], 'opening_theaters': [4100]})
+    with pytest.raises(ValueError, match="opening_theaters"):
+        apply_schema(pd.DataFrame({'opening_theaters': [4100.0, 0.0]}))
+    pd.DataFrame({'drama': [1], 'opening_theaters': [4100]}).to_csv(tmp_path / "processed_data.csv", index=False)
+    with pytest.raises(ValueError, match="opening_theaters"):
+        read_processed(tmp_path / "processed_data.csv")
+    # Indicator columns in any integer, float or bool dtype are fine
+    X = frame_from_columns(['action', 'drama', 'war'], 2, {'action': [1.0, 0.0], 'drama': [True, False], 'war': np.array([0, 1], dtype=np.int64)})
+    assert list(X.dtypes) == [np.uint8] * 3
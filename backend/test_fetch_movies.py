@@ -0,0 +1,93 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+import fetch_movies
+
+MOVIES = {
+    "The Avengers": {"id": 24428, "title": "The Avengers", "release_date": "2012-04-25", "genres": [{"name": "Action"}]},
+    "Dune": {"id": 438631, "title": "Dune", "release_date": "2021-09-15", "genres": [{"name": "Science Fiction"}]},
+}
+
+class FakeTMDB(BaseHTTPRequestHandler):
+    requests_seen = []
+    throttle_once = set()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        FakeTMDB.requests_seen.append(url.path)
+
+        # First hit on each throttled path gets a 429 to exercise the retry path
+        if url.path in FakeTMDB.throttle_once:
+            FakeTMDB.throttle_once.discard(url.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        if url.path == "/3/search/movie":
+            movie = MOVIES.get(query["query"][0])
+            body = {"results": [{"id": movie["id"]}] if movie else []}
+        elif url.path.startswith("/3/movie/"):
+            movie_id = int(url.path.rsplit("/", 1)[1])
+            movie = next(m for m in MOVIES.values() if m["id"] == movie_id)
+            assert query["append_to_response"] == ["credits"]
+            body = dict(movie, credits={
+                "cast": [{"popularity": 10.0}, {"popularity": 5.0}],
+                "crew": [{"job": "Director", "popularity": 2.5}],
+            })
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_tmdb():
+    FakeTMDB.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTMDB)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/3"
+    server.shutdown()
+
+def test_fetch_all_with_retry_and_resume(fake_tmdb, tmp_path):
+    FakeTMDB.throttle_once = {"/3/movie/24428"}
+    client = fetch_movies.TMDBClient("key", base_url=fake_tmdb, rate=100, backoff=0.01)
+    movies = [("The Avengers", 2012), ("Dune", 2021), ("Not A Movie", None)]
+    checkpoint = str(tmp_path / "progress.jsonl")
+
+    rows = fetch_movies.fetch_all(client, movies, workers=4, checkpoint_path=checkpoint)
+
+    assert [r["title"] for r in rows] == ["The Avengers", "Dune"]
+    assert rows[0]["cast_popularity"] == 15.0
+    assert rows[0]["director_popularity"] == 2.5
+    # search + one combined details/credits call per found movie, plus the retried 429
+    assert FakeTMDB.requests_seen.count("/3/movie/24428") == 2
+    assert not any(p.endswith("/credits") for p in FakeTMDB.requests_seen)
+
+    # Everything (including the miss) is checkpointed, so a rerun makes no requests
+    FakeTMDB.requests_seen = []
+    rows_again = fetch_movies.fetch_all(client, movies, workers=4, checkpoint_path=checkpoint)
+    assert rows_again == rows
+    assert FakeTMDB.requests_seen == []
+
+def test_token_bucket_limits_rate():
+    bucket = fetch_movies.TokenBucket(rate=50, capacity=1)
+    start = fetch_movies.time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert fetch_movies.time.monotonic() - start >= 0.09
@@ -0,0 +1,42 @@
+from backend.image_cache import ImageCache, valid_image
+from backend.encoding import cached_json
+
+def test_cache_fetches_once_and_evicts_least_recently_used(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=250)
+    fetches = []
+    def fetcher(body):
+        def fetch():
+            fetches.append(body)
+            return body, "image/jpeg"
+        return fetch
+
+    a, _ = cache.get_or_fetch("w500/a.jpg", fetcher(b"a" * 100))
+    cache.get_or_fetch("w500/a.jpg", fetcher(b"a" * 100))
+    # Same bytes under another key share one object
+    cache.get_or_fetch("w342/a.jpg", fetcher(b"a" * 100))
+    assert len(fetches) == 2 and cache.stats()["objects"] == 1
+
+    cache.get_or_fetch("w500/b.jpg", fetcher(b"b" * 100))
+    cache.get("w500/a.jpg") # a is now more recent than b
+    cache.get_or_fetch("w500/c.jpg", fetcher(b"c" * 100))
+    assert cache.lookup("w500/b.jpg") is None
+    assert cache.lookup("w500/a.jpg")["digest"] == a["digest"]
+    assert cache.stats()["bytes"] <= 250
+
+    # The index survives a restart
+    reopened = ImageCache(str(tmp_path), max_bytes=250)
+    assert reopened.get("w500/c.jpg")[1] == b"c" * 100
+
+def test_valid_image_rejects_arbitrary_paths():
+    assert valid_image("w500", "8b8R8l88Qje9dn9OE8PY05Nxl1X.jpg")
+    assert not valid_image("w500", "..%2Fetc%2Fpasswd")
+    assert not valid_image("w9999", "a.jpg")
+    # Scriptable SVG is never proxied
+    assert not valid_image("w500", "logo.svg")
+
+def test_cached_json_answers_matching_etag_with_304():
+    first = cached_json({"RMSE": 1.0}, "no-cache")
+    tag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+    assert cached_json({"RMSE": 1.0}, "no-cache", f"W/{tag}").status_code == 304
+    assert cached_json({"RMSE": 2.0}, "no-cache", tag).status_code == 200
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from ml.train import continue_training, holdout_gate, incremental_rows, period_label, release_period
+
+def test_continue_training_keeps_trees_and_adds_rounds():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'release_year': rng.integers(2000, 2024, 400), 'release_month': rng.integers(1, 13, 400),
+                      'log_budget': rng.normal(17, 1, 400)})
+    y = np.exp(X['log_budget']) * 2 + rng.normal(0, 1e6, 400)
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=3, random_state=42)
+    model.fit(X, y)
+
+    recent = X['release_year'] >= 2020
+    updated = continue_training(model, X[recent], y[recent], rounds=5)
+
+    assert updated.get_booster().num_boosted_rounds() == 25
+    # The original booster is untouched
+    assert model.get_booster().num_boosted_rounds() == 20
+
+def test_release_period_round_trips_to_year_month():
+    X = pd.DataFrame({'release_year': [2019, 2023], 'release_month': [12, 7]})
+    assert [period_label(p) for p in release_period(X)] == ["2019-12", "2023-07"]
+
+def test_holdout_gate_rejects_updates_it_cannot_evaluate():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'log_budget': rng.normal(17, 1, 200)})
+    y = pd.Series(np.exp(X['log_budget']) * 2)
+    model = xgb.XGBRegressor(n_estimators=10, max_depth=3, random_state=42).fit(X, y)
+
+    # Every recent row inside the holdout: nothing to boost on, nothing deployed unless forced
+    accepted, report = holdout_gate(model, X[:0], y[:0], X[:20], y[:20], rounds=5)
+    assert not accepted and report == {'evaluated': False, 'accepted': False}
+    assert holdout_gate(model, X[:0], y[:0], X[:20], y[:20], rounds=5, force=True)[0]
+
+    accepted, report = holdout_gate(model, X[20:], y[20:], X[:20], y[:20], rounds=5)
+    assert report['evaluated'] and accepted == (report['candidate']['RMSE'] <= report['baseline']['RMSE'])
+
+def test_incremental_rows_skip_months_the_boosters_have_seen():
+    X = pd.DataFrame({'release_year': [2023, 2024, 2024, 2024, 2024], 'release_month': [11, 6, 7, 9, 12]})
+    new, update, holdout = incremental_rows(release_period(X), "2024-06", holdout_months=4)
+    # 2024-06 and earlier were in the full run's training data: neither boosted on nor held out
+    assert new.tolist() == [False, False, True, True, True]
+    assert update.tolist() == [False, False, True, False, False]
+    assert holdout.tolist() == [False, False, False, True, True]
+
+    # A holdout reaching back before the cutoff still only takes unseen months
+    _, update, holdout = incremental_rows(release_period(X), "2024-06", holdout_months=12)
+    assert not update.any() and holdout.tolist() == [False, False, True, True, True]
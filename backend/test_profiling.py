@@ -0,0 +1,106 @@
+import time
+import threading
+
+try:
+    from . import profiling
+    from .profiling import Profiler, render
+except ImportError:
+    import profiling
+    from profiling import Profiler, render
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_section_is_a_no_op_while_disarmed():
+    profiler = Profiler()
+    with profiler.section("score_rows"):
+        busy(0.01)
+    assert profiler.status()["profiles"] == []
+
+def test_armed_section_renders_folded_and_text():
+    profiler = Profiler()
+    profiler.configure(True, memory=True)
+    try:
+        with profiler.section("score_rows"):
+            [bytes(1000) for _ in range(100)]
+            busy(0.01)
+    finally:
+        profiler.configure(False)
+    [summary] = profiler.status()["profiles"]
+    profile = profiler.get(summary["id"])
+    assert profile["name"] == "score_rows" and profile["memory"]["top"]
+
+    folded, media_type, _ = render(profile, "folded")
+    assert media_type == "text/plain"
+    assert any("busy (test_profiling.py" in line for line in folded.splitlines())
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+    assert "cumulative" in render(profile, "text")[0]
+    assert render(profile, "unknown") is None
+
+def test_request_session_samples_other_threads():
+    profiler = Profiler()
+    profiler.configure(True, interval_ms=1)
+    session = profiler.start_request("POST /predict")
+    busy(0.05)
+    profile_id = profiler.finish_request(session)
+    profile = profiler.get(profile_id)
+    assert profile["samples"] > 0
+    assert any("busy (test_profiling.py" in stack for stack in profile["folded"])
+    # Stack samples can't be exported as pstats
+    assert render(profile, "pstats") is None
+
+def test_ring_keeps_newest_profiles():
+    profiler = Profiler(max_profiles=2)
+    profiler.configure(True)
+    for name in ("a", "b", "c"):
+        with profiler.section(name):
+            pass
+    assert [p["name"] for p in profiler.status()["profiles"]] == ["b", "c"]
+
+def test_token_check():
+    profiler = Profiler()
+    profiler.token = None
+    # No token configured: nothing is accepted
+    assert not profiler.token_ok(None) and not profiler.token_ok("")
+    profiler.token = "secret"
+    assert profiler.token_ok("secret") and not profiler.token_ok(None) and not profiler.token_ok("wrong")
+
+def test_overlapping_sections_on_other_threads_are_skipped():
+    profiler = Profiler()
+    profiler.configure(True)
+    entered, release = threading.Event(), threading.Event()
+
+    def batcher_thread():
+        with profiler.section("score_rows"):
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=batcher_thread)
+    thread.start()
+    entered.wait(5)
+    # Python 3.12+ can't enable a second cProfile while this one runs; it must not raise either way
+    with profiler.section("build_predictions"):
+        busy(0.01)
+    release.set()
+    thread.join()
+    assert [p["name"] for p in profiler.status()["profiles"]] == ["score_rows"]
+
+def test_profiler_errors_never_reach_the_request(monkeypatch):
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    profiler = Profiler()
+    profiler.configure(True)
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+    with profiler.section("score_rows"):
+        result = 42
+    assert result == 42 and profiler.status()["profiles"] == []
+
+    # The section slot was released: the next section is profiled again
+    monkeypatch.undo()
+    with profiler.section("score_rows"):
+        busy(0.01)
+    assert len(profiler.status()["profiles"]) == 1
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from ml.train import QUANTILE_ALPHAS, quantile_metrics
+
+try:
+    from .inference import interval_level, score_features
+except ImportError:
+    from inference import interval_level, score_features
+
+class FakeModel:
+    def __init__(self, preds, alphas=None):
+        self.preds = np.asarray(preds, dtype=float)
+        self.alphas = alphas
+
+    def predict(self, X):
+        return self.preds
+
+    def get_params(self):
+        return {'quantile_alpha': np.array(self.alphas)} if self.alphas else {}
+
+class HalvingNormalizer:
+    # Release-year dollars are half the reference-year dollars the models predict
+    def denormalize(self, values, years):
+        return np.asarray(values, dtype=float) / 2
+
+def test_quantile_metrics_coverage_and_pinball_keys():
+    y = np.array([10.0, 20.0, 30.0, 40.0])
+    # Last row's quantiles cross; they are sorted before scoring
+    preds = np.array([[5, 10, 15], [25, 30, 35], [20, 30, 40], [45, 40, 35]], dtype=float)
+    result = quantile_metrics(y, preds)
+    # Rows 0, 2 and 3 fall inside [p10, p90]; unsorted, row 3's interval would be empty
+    assert result['coverage'] == 0.75
+    assert list(result)[1:] == [f"pinball_p{int(round(a * 100))}" for a in QUANTILE_ALPHAS]
+    # A perfect median has zero p50 loss; outer quantiles still pay for their spread
+    perfect = quantile_metrics(y, np.column_stack([y - 1, y, y + 1]))
+    assert perfect['coverage'] == 1.0 and perfect['pinball_p50'] == 0.0
+    assert np.isclose(perfect['pinball_p10'], 0.1) and np.isclose(perfect['pinball_p90'], 0.1)
+
+def test_score_features_serves_sorted_denormalized_quantiles():
+    X = pd.DataFrame({'release_year': [2024, 2025], 'log_star_power': [0.0, 0.0]})
+    models = {
+        'opening': FakeModel([100.0, 200.0]),
+        'revenue': FakeModel([300.0, 600.0]),
+        # Row 1 crosses (p10 > p50)
+        'opening_quantiles': FakeModel([[80, 100, 120], [220, 200, 260]], QUANTILE_ALPHAS),
+        'revenue_quantiles': FakeModel([[-10, 300, 400], [500, 600, 700]], QUANTILE_ALPHAS),
+    }
+    scores = score_features(X, models, {'normalizer': HalvingNormalizer()})
+
+    keys, q = scores['opening_weekend_quantiles']
+    assert keys == ['p10', 'p50', 'p90']
+    assert q.tolist() == [[40, 50, 60], [100, 110, 130]]
+    assert scores['opening_weekend'].tolist() == [50, 100]
+    # The drift monitor sees the models' ref-year outputs, like the training targets it compares with
+    assert scores['model_opening_weekend'].tolist() == [100, 200]
+    # The CI is the outer quantiles, in the same release-year dollars
+    assert scores['opening_weekend_ci'].tolist() == [[40, 60], [100, 130]]
+    # Negative quantiles are clipped before denormalizing
+    assert scores['total_gross_ci'].tolist() == [[0, 200], [250, 350]]
+    assert interval_level(scores) == 0.8
+
+def test_rmse_band_without_quantile_models():
+    X = pd.DataFrame({'release_year': [2024], 'log_star_power': [0.0]})
+    models = {'opening': FakeModel([100.0]), 'revenue': FakeModel([300.0])}
+    metrics = {'opening_weekend': {'RMSE': 10.0}, 'revenue': {'RMSE': 100.0}}
+    scores = score_features(X, models, {'metrics': metrics})
+    assert np.allclose(scores['opening_weekend_ci'], [[80.4, 119.6]])
+    assert scores['total_gross_ci'][0, 0] == 104.0
+    assert interval_level(scores) == 0.95
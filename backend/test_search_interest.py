@@ -0,0 +1,81 @@
+import os
+import time
+
+from ml.search_interest import SearchInterestStore
+
+def write_export(path, rows):
+    lines = ['"query","search interest","increase percent"']
+    lines += [f'"{q}",{interest},"{growth}"' for q, interest, growth in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+def test_match_and_incremental_refresh(tmp_path):
+    write_export(tmp_path / "searched_with_top-queries_IN_20250101-0000_20260101-0000.csv", [
+        ("avengers doomsday", 100, "200%"),
+        ("avengers doomsday trailer", 80, "450%"),
+        ("marvel", 90, "10%"),
+    ])
+    store = SearchInterestStore(str(tmp_path))
+    assert store.refresh(force=True) == 3
+
+    buzz = store.match("Avengers: Doomsday")
+    assert buzz['buzz_score'] == 100
+    assert buzz['trailer_interest'] == 80
+    assert not buzz['breakout']
+    # Typo-tolerant token lookup
+    assert store.match("Avengrs Doomsday")['buzz_score'] == 100
+    assert store.match("Gladiator")['matched_queries'] == 0
+
+    # A new export is picked up without re-reading the first one
+    write_export(tmp_path / "searched_with_rising-queries_IN_20250101-0000_20260101-0000.csv", [
+        ("avengers doomsday teaser", 15, "Breakout"),
+    ])
+    assert store.refresh(force=True) == 1
+    buzz = store.match("Avengers: Doomsday")
+    assert buzz['breakout']
+    assert buzz['rising_score'] == 15
+
+def test_reexport_retires_only_its_own_rows(tmp_path):
+    a = tmp_path / "searched_with_top-queries_IN_20250101-0000_20260101-0000.csv"
+    b = tmp_path / "searched_with_top-queries_US_20250101-0000_20260101-0000.csv"
+    c = tmp_path / "searched_with_rising-queries_US_20250101-0000_20260101-0000.csv"
+    write_export(a, [("avengers doomsday", 100, "200%")])
+    write_export(b, [("gladiator", 80, "10%")])
+    store = SearchInterestStore(str(tmp_path))
+    store.refresh(force=True)
+
+    bumps = iter(range(10, 100, 10))
+    def reexport(path, rows):
+        # A distinct mtime even when the rewrite lands in the same clock tick
+        write_export(path, rows)
+        stamp = time.time() + next(bumps)
+        os.utime(path, (stamp, stamp))
+
+    # Re-export A, add C, re-export A again: B's rows must stay live throughout
+    reexport(a, [("avengers doomsday", 90, "200%")])
+    store.refresh(force=True)
+    write_export(c, [("dune 3", 40, "Breakout")])
+    store.refresh(force=True)
+    reexport(a, [("avengers doomsday", 95, "200%")])
+    store.refresh(force=True)
+
+    assert store.match("Gladiator")['buzz_score'] == 80
+    assert store.match("Avengers: Doomsday")['buzz_score'] == 95
+    assert store.match("Dune 3")['breakout']
+
+def test_unrelated_titles_do_not_match(tmp_path):
+    write_export(tmp_path / "searched_with_top-queries_IN_20250101-0000_20260101-0000.csv", [
+        ("hulk 3", 100, "10%"),
+        ("iron man 3", 90, "10%"),
+        ("marvel", 96, "10%"),
+        ("men", 70, "10%"),
+        ("chris hemsworth", 60, "10%"),
+    ])
+    store = SearchInterestStore(str(tmp_path))
+    store.refresh(force=True)
+
+    # Unmatched title words count against the similarity ("musketeers" has no hit)
+    assert store.match("The Three Musketeers")['matched_queries'] == 0
+    # Near-miss words are not typos of each other
+    for title in ["The Marvels", "The Omen", "The Passion of the Christ"]:
+        assert store.match(title)['buzz_score'] == 0, title
+    assert store.match("Iron Man 3")['buzz_score'] == 90
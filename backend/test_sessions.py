@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+from starlette.applications import Starlette
+from starlette.routing import WebSocketRoute
+from starlette.testclient import TestClient
+
+from backend.sessions import ComparisonSession, parse_message, serve_session
+from backend.schemas import SinglePrediction
+
+COLUMNS = ['log_budget', 'log_star_power', 'score', 'release_year', 'action', 'drama']
+MOVIE = {"title": "Dune", "budget": 1.65e8, "release_date": "2021-10-22", "genres": "Action", "crew": "", "score": 78}
+
+def fake_session():
+    calls = {'score': [], 'media': []}
+
+    async def score(X):
+        calls['score'].append(len(X))
+        gross = np.exp(X['log_budget'].to_numpy(dtype=float)) * 2
+        return {'opening_weekend': gross / 4, 'total_gross': gross}, None
+
+    def fetch_media(title):
+        calls['media'].append(title)
+        return {}
+
+    def build(movies, X, scores, shap_matrix, media):
+        return [SinglePrediction(opening_weekend=float(scores['opening_weekend'][0]), total_gross=float(scores['total_gross'][0]),
+                                 opening_weekend_ci=[0, 0], total_gross_ci=[0, 0], roi=0, star_power=0, shap_values={},
+                                 explanation="estimated" if movies[0].is_estimated_budget else "")]
+
+    artifacts = {'columns': COLUMNS, 'person_power': {}, 'vectorizer': CountVectorizer().fit(["action drama"])}
+    return ComparisonSession(artifacts, score, fetch_media, build), calls
+
+def update(session, deltas):
+    return asyncio.run(session.apply(session.merge(deltas)))
+
+def test_updates_recompute_only_the_changed_movie():
+    session, calls = fake_session()
+    changes, stages = update(session, {'movie1': MOVIE, 'movie2': dict(MOVIE, title="Arrival")})
+    assert set(changes) == {'movie1', 'movie2'} and calls['score'] == [2]
+    assert stages['movie1'] == ['encode', 'media', 'score', 'context']
+
+    changes, stages = update(session, {'movie2': {'budget': 3.3e8}})
+    assert list(changes) == ['movie2'] and calls['score'] == [2, 1]
+    assert set(changes['movie2']) == {'opening_weekend', 'total_gross'}
+    assert stages == {'movie2': ['encode', 'score', 'context']} and len(calls['media']) == 2
+
+    # Context-only field: no encoding, no model call
+    changes, stages = update(session, {'movie1': {'is_estimated_budget': True}})
+    assert stages == {'movie1': ['context']} and changes == {'movie1': {'explanation': "estimated"}}
+    # Unknown crew leaves the encoded row as it was, so nothing is rescored
+    changes, stages = update(session, {'movie1': {'crew': "Nobody, Director"}})
+    assert stages == {'movie1': ['encode', 'context']} and changes == {} and calls['score'] == [2, 1]
+    # Unchanged values are no-ops
+    assert update(session, {'movie1': {'score': 78}}) == ({}, {})
+
+def test_first_update_needs_both_movies_and_bad_updates_change_nothing():
+    session, calls = fake_session()
+    try:
+        session.merge({'movie1': MOVIE})
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    update(session, {'movie1': MOVIE, 'movie2': MOVIE})
+    try:
+        session.merge({'movie1': {'budget': "lots"}})
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert session.movies['movie1'].budget == MOVIE['budget']
+
+def test_parse_message_rejects_unknown_fields():
+    assert parse_message('{"seq": 3, "movie1": {"budget": 1e8}}') == (3, {'movie1': {'budget': 1e8}})
+    for bad in ('[1]', '{"movie1": {"bogus": 1}}', '{"movie2": 5}', '{"movie1": {"score": "high"}}'):
+        try:
+            parse_message(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+def test_rapid_deltas_are_coalesced():
+    session, calls = fake_session()
+
+    async def endpoint(websocket):
+        await websocket.accept()
+        await serve_session(websocket, session, debounce=0.2)
+
+    app = Starlette(routes=[WebSocketRoute("/ws", endpoint)])
+    with TestClient(app).websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"seq": 1, "movie1": MOVIE, "movie2": MOVIE}))
+        assert ws.receive_json()["seq"] == 1
+        for seq, budget in enumerate([1e8, 2e8, 3e8], start=2):
+            ws.send_text(json.dumps({"seq": seq, "movie1": {"budget": budget}}))
+        reply = ws.receive_json()
+        assert reply["seq"] == 4 and reply["coalesced"] == 3 and "movie2" not in reply
+        assert reply["movie1"]["total_gross"] == pytest.approx(6e8, rel=1e-5)
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+    assert calls['score'] == [2, 1]
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+# Importing the app must stay cheap: worker boot and test collection shouldn't pay for
+# shap/numba, xgboost, sklearn or pandas before the first request needs them.
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))
+HEAVY_MODULES = ["shap", "numba", "xgboost", "sklearn", "pandas", "joblib"]
+
+def test_backend_import_is_lazy_and_within_budget():
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import backend.main\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(elapsed, '|', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    # No TMDB key: the app must still import (media is optional until first use)
+    env = {k: v for k, v in os.environ.items() if k != "TMDB_API_KEY"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    elapsed, loaded = result.stdout.strip().splitlines()[-1].split("|")
+
+    assert loaded.strip() == ""
+    assert float(elapsed) < IMPORT_BUDGET_SECONDS
+
+def test_preload_loads_models_and_post_fork_splits_threads():
+    # What gunicorn_conf.py does: import the app in the master with PRELOAD_ARTIFACTS=1, then
+    # run post_fork in each worker
+    code = (
+        "import types\n"
+        "import backend.main as main\n"
+        "import backend.gunicorn_conf as conf\n"
+        "print('preloaded', sorted(main.models), sorted(main.explainers))\n"
+        "log = types.SimpleNamespace(info=print)\n"
+        "conf.post_fork(types.SimpleNamespace(log=log), types.SimpleNamespace(pid=1))\n"
+        "print('threads', sorted({m.get_params()['n_jobs'] for m in main.models.values()}))\n"
+    )
+    env = {k: v for k, v in os.environ.items() if k != "TMDB_API_KEY"}
+    env.update(PRELOAD_ARTIFACTS="1", WEB_CONCURRENCY="2", XGBOOST_THREADS="3")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    lines = result.stdout.splitlines()
+
+    # Only the revenue explainer is used for SHAP values
+    assert "preloaded ['opening', 'revenue'] ['revenue']" in lines
+    assert "models shared from master, 3 threads" in result.stdout
+    assert lines[-1] == "threads [3]"
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from ml.tuning import cross_validate, fold_chunks, refit_and_evaluate
+
+def test_cross_validate_picks_best_candidate_per_target():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'a': rng.normal(size=300), 'b': rng.normal(size=300)})
+    Y = pd.DataFrame({'smooth': 3 * X['a'], 'noisy': X['b'] + rng.normal(0, 0.1, 300)})
+    param_dist = {'n_estimators': [1, 50], 'max_depth': [3], 'learning_rate': [0.3]}
+
+    best, scores, timings = cross_validate(X, Y, param_dist, n_iter=2, n_folds=2, workers=1, threads=1)
+
+    assert scores.shape == (2, 2, 2) and not np.isnan(scores).any()
+    # A single tree can't fit either target as well as fifty
+    assert [p['n_estimators'] for p in best] == [50, 50]
+    assert {'cv_dmatrix_build', 'cv_fit_predict', 'cv_wall'} <= set(timings)
+    assert timings['cv_dmatrix_builds'] == 2
+
+    # Two workers share the folds instead of each building both
+    _, scores2, timings = cross_validate(X, Y, param_dist, n_iter=2, n_folds=2, workers=2, threads=1)
+    assert np.allclose(scores2, scores) and timings['cv_dmatrix_builds'] == 2
+
+    models, metrics = refit_and_evaluate(best, X, Y, X, Y, workers=1, threads=1)
+    assert len(models) == 2 and all(m['R2'] > 0.9 for m in metrics)
+
+def test_fold_chunks_never_mix_folds():
+    jobs = [(c, {}, f, t) for f in range(3) for c in range(4) for t in range(2)]
+    # Fewer workers than folds: one chunk per fold
+    assert [len(chunk) for chunk in fold_chunks(jobs, 3, 2)] == [8, 8, 8]
+    # More workers than folds: each fold split so every worker has work
+    chunks = fold_chunks(jobs, 3, 6)
+    assert len(chunks) == 6 and all(len({job[2] for job in chunk}) == 1 for chunk in chunks)
+    assert sorted(job for chunk in chunks for job in chunk) == sorted(jobs)
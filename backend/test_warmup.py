@@ -0,0 +1,30 @@
+try:
+    from .warmup import Warmup
+except ImportError:
+    from warmup import Warmup
+
+def test_warmup_retries_and_reports_ready():
+    calls = {"load": 0}
+
+    def flaky_load():
+        calls["load"] += 1
+        if calls["load"] < 3:
+            raise RuntimeError("artifacts missing")
+
+    def broken_media():
+        raise ConnectionError("TMDB down")
+
+    warmup = Warmup(max_retry_delay=0.01)
+    warmup.add_step("artifacts", flaky_load, retry=True)
+    warmup.add_step("media_cache", broken_media, required=False)
+    assert not warmup.ready
+    assert not warmup.wait_for("artifacts", 0)  # not started yet
+
+    warmup.start().join(5)
+
+    status = warmup.status()
+    assert status["steps"]["artifacts"]["attempts"] == 3
+    assert status["steps"]["artifacts"]["status"] == "done"
+    # Optional steps can fail without holding back readiness
+    assert status["steps"]["media_cache"]["status"] == "failed"
+    assert warmup.ready and warmup.wait_for("artifacts", 0)
@@ -0,0 +1,83 @@
+import threading
+import time
+import traceback
+
+# Background warm-up for the API process.
+#
+# Steps run in order on a daemon thread after startup (load artifacts, build explainers,
+# push a synthetic batch through the models, prefill the media cache). The instance reports
+# ready only once every required step has finished, so load balancers can hold traffic
+# until the first real request no longer pays for loading, JIT or explainer construction.
+
+class Warmup:
+    def __init__(self, max_retry_delay=60.0):
+        self.max_retry_delay = max_retry_delay
+        self._steps = []
+        self._state = {}
+        self._events = {}
+        self._thread = None
+        self.started_at = None
+        self.finished_at = None
+
+    def add_step(self, name, fn, required=True, retry=False):
+        # retry=True keeps retrying with exponential backoff until the step succeeds
+        # (a failed artifact load no longer means 503s until the next restart)
+        self._steps.append((name, fn, required, retry))
+        self._state[name] = {"status": "pending", "required": required, "attempts": 0, "seconds": None, "error": None}
+        self._events[name] = threading.Event()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def run(self):
+        self.started_at = time.time()
+        for name, fn, required, retry in self._steps:
+            state = self._state[name]
+            state["status"] = "running"
+            delay = min(1.0, self.max_retry_delay)
+            while True:
+                state["attempts"] += 1
+                started = time.perf_counter()
+                try:
+                    fn()
+                    state["status"] = "done"
+                    state["error"] = None
+                    break
+                except Exception as e:
+                    state["error"] = str(e)
+                    print(f"Warm-up step '{name}' failed (attempt {state['attempts']}): {e}")
+                    traceback.print_exc()
+                    if not retry:
+                        state["status"] = "failed"
+                        break
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+                finally:
+                    state["seconds"] = round(time.perf_counter() - started, 3)
+            self._events[name].set()
+        self.finished_at = time.time()
+
+    def wait_for(self, name, timeout=None):
+        # Block until a step has finished (successfully or not); True if it succeeded
+        event = self._events.get(name)
+        if event is None or self._thread is None:
+            return False
+        event.wait(timeout)
+        return self._state[name]["status"] == "done"
+
+    @property
+    def ready(self):
+        return bool(self._steps) and all(
+            s["status"] == "done" for s in self._state.values() if s["required"]
+        )
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": {name: dict(self._state[name]) for name, _, _, _ in self._steps},
+        }
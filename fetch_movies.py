@@ -1,43 +1,97 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 import pandas as pd
-import os
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-API_KEY = os.getenv("TMDB_API_KEY")
-if not API_KEY:
-    raise ValueError("TMDB_API_KEY environment variable is not set. Please check your .env file.")
-BASE_URL = "https://api.themoviedb.org/3"
+BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
 
 
 # ---------------------------
-# Utility Functions
+# Rate limiting / HTTP client
 # ---------------------------
 
-def search_movie(title, year=None):
-    url = f"{BASE_URL}/search/movie"
-    params = {
-        "api_key": API_KEY,
-        "query": title,
-        "year": year
-    }
-    r = requests.get(url, params=params)
-    results = r.json().get("results", [])
-    return results[0] if results else None
+class TokenBucket:
+    # Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 
+class TMDBClient:
+    RETRY_STATUS = {429, 500, 502, 503, 504}
 
-def get_movie_details(movie_id):
-    url = f"{BASE_URL}/movie/{movie_id}"
-    params = {"api_key": API_KEY}
-    return requests.get(url, params=params).json()
+    def __init__(self, api_key, base_url=BASE_URL, rate=20.0, max_retries=4, backoff=0.5, timeout=10, pool_size=16):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.bucket = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # One pooled session shared by all threads (keep-alive instead of a new connection per call)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
+    def get(self, endpoint, params=None):
+        params = dict(params or {})
+        params["api_key"] = self.api_key
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.get(f"{self.base_url}{endpoint}", params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                print(f"Retrying {endpoint} after error: {e}")
+            else:
+                if response.status_code not in self.RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                # Honour Retry-After on 429, otherwise exponential backoff
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after else self.backoff * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, self.backoff / 2))
 
-def get_movie_credits(movie_id):
-    url = f"{BASE_URL}/movie/{movie_id}/credits"
-    params = {"api_key": API_KEY}
-    return requests.get(url, params=params).json()
+    def search_movie(self, title, year=None):
+        params = {"query": title}
+        if year:
+            params["year"] = year
+        results = self.get("/search/movie", params).get("results", [])
+        return results[0] if results else None
+
+    def get_movie_with_credits(self, movie_id):
+        # Details and credits in a single request
+        return self.get(f"/movie/{movie_id}", {"append_to_response": "credits"})
 
 
 # ---------------------------
@@ -59,17 +113,16 @@ def extract_cast_director_features(credits):
     return cast_popularity, director_popularity
 
 
-def process_movie(title, year=None):
-    movie = search_movie(title, year)
+def process_movie(client, title, year=None):
+    movie = client.search_movie(title, year)
     if not movie:
         print(f"❌ Movie not found: {title}")
         return None
 
     movie_id = movie["id"]
-    details = get_movie_details(movie_id)
-    credits = get_movie_credits(movie_id)
+    details = client.get_movie_with_credits(movie_id)
 
-    cast_pop, director_pop = extract_cast_director_features(credits)
+    cast_pop, director_pop = extract_cast_director_features(details.get("credits", {}))
 
     return {
         "movie_id": movie_id,
@@ -85,6 +138,65 @@ def process_movie(title, year=None):
     }
 
 
+# ---------------------------
+# Checkpointed concurrent fetch
+# ---------------------------
+
+def movie_key(title, year):
+    return f"{title}|{year or ''}"
+
+
+def load_checkpoint(path):
+    # key -> row (None for titles TMDB doesn't know, so they aren't searched again)
+    done = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # line cut off by an interrupted run
+                done[record["key"]] = record["row"]
+    return done
+
+
+def fetch_all(client, movies, workers=8, checkpoint_path=None):
+    done = load_checkpoint(checkpoint_path) if checkpoint_path else {}
+    todo = [(title, year) for title, year in movies if movie_key(title, year) not in done]
+    if done:
+        print(f"Resuming: {len(done)} titles already fetched, {len(todo)} to go")
+
+    lock = threading.Lock()
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(process_movie, client, title, year): (title, year) for title, year in todo}
+            for i, future in enumerate(as_completed(futures), 1):
+                title, year = futures[future]
+                try:
+                    row = future.result()
+                except Exception as e:
+                    # Leave it out of the checkpoint so the next run retries it
+                    print(f"❌ Failed: {title} ({e})")
+                    continue
+                key = movie_key(title, year)
+                with lock:
+                    done[key] = row
+                    if checkpoint:
+                        checkpoint.write(json.dumps({"key": key, "row": row}) + "\n")
+                        checkpoint.flush()
+                if i % 50 == 0:
+                    print(f"Fetched {i}/{len(todo)} ({i / (time.perf_counter() - start):.1f} titles/sec)")
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    # Input order, skipping titles that weren't found or failed
+    rows = [done.get(movie_key(title, year)) for title, year in movies]
+    return [row for row in rows if row]
+
+
 # ---------------------------
 # Movies to Fetch
 # ---------------------------
@@ -105,20 +217,44 @@ movies_list = [
 ]
 
 
+def read_titles(path, title_col="title", year_col="year"):
+    # CSV with a title column and an optional year column
+    df = pd.read_csv(path)
+    years = df[year_col] if year_col in df.columns else [None] * len(df)
+    return [(str(t), int(y) if pd.notna(y) else None) for t, y in zip(df[title_col], years)]
+
+
 # ---------------------------
 # Main Execution
 # ---------------------------
 
-all_movies = []
+def main():
+    parser = argparse.ArgumentParser(description="Build movies_dataset.csv from TMDB")
+    parser.add_argument("--titles", help="CSV of titles to fetch (columns: title[, year]); defaults to the built-in list")
+    parser.add_argument("--title-column", default="title")
+    parser.add_argument("--year-column", default="year")
+    parser.add_argument("-o", "--output", default="movies_dataset.csv")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=20.0, help="Max requests per second")
+    parser.add_argument("--checkpoint", default=None, help="Resumable progress file (default: <output>.checkpoint.jsonl)")
+    args = parser.parse_args()
+
+    api_key = os.getenv("TMDB_API_KEY")
+    if not api_key:
+        raise ValueError("TMDB_API_KEY environment variable is not set. Please check your .env file.")
+
+    movies = read_titles(args.titles, args.title_column, args.year_column) if args.titles else movies_list
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+
+    client = TMDBClient(api_key, rate=args.rate, pool_size=args.workers)
+    all_movies = fetch_all(client, movies, workers=args.workers, checkpoint_path=checkpoint_path)
+
+    df = pd.DataFrame(all_movies)
+    df.to_csv(args.output, index=False)
 
-for title, year in movies_list:
-    print(f"Fetching: {title}")
-    data = process_movie(title, year)
-    if data:
-        all_movies.append(data)
+    print(f"\n✅ Dataset saved as {args.output}")
+    print(df)
 
-df = pd.DataFrame(all_movies)
-df.to_csv("movies_dataset.csv", index=False)
 
-print("\n✅ Dataset saved as movies_dataset.csv")
-print(df)
+if __name__ == "__main__":
+    main()
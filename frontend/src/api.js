@@ -10,6 +10,15 @@ export const api = axios.create({
     },
 });
 
+// Image URLs from /media point at the backend's caching proxy (/images/...) and are relative
+export const imageUrl = (url) => (url && url.startsWith('/') ? `${API_URL}${url}` : url);
+
+// "w342" -> "... 342w" entries for <img srcSet>
+export const imageSrcSet = (variants) =>
+    Object.entries(variants || {})
+        .map(([size, url]) => `${imageUrl(url)} ${size.slice(1)}w`)
+        .join(', ');
+
 export const getMetrics = async () => {
     const response = await api.get('/metrics');
     return response.data;
@@ -21,6 +30,26 @@ export const predict = async (movie1, movie2) => {
     return response.data;
 };
 
+// Live comparison over /ws/compare: send both movies once, then only the fields that change.
+// onMessage receives {type: "delta", seq, movie1?: {changed fields}, movie2?: {...}} or {type: "error", detail}.
+export const openComparisonSession = (onMessage) => {
+    const socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/ws/compare`);
+    const queue = [];
+    let seq = 0;
+    socket.onopen = () => queue.splice(0).forEach((message) => socket.send(message));
+    socket.onmessage = (event) => onMessage(JSON.parse(event.data));
+    return {
+        // changes: {movie1?: {...fields}, movie2?: {...fields}}
+        update: (changes) => {
+            const message = JSON.stringify({ seq: ++seq, ...changes });
+            if (socket.readyState === WebSocket.OPEN) socket.send(message);
+            else queue.push(message);
+            return seq;
+        },
+        close: () => socket.close(),
+    };
+};
+
 export const fetchMedia = async (title) => {
     try {
         const response = await api.get('/media', { params: { title } });
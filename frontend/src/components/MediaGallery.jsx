@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { fetchMedia } from '../api';
+import { fetchMedia, imageUrl, imageSrcSet } from '../api';
 import { motion } from 'framer-motion';
 
 const MediaGallery = ({ movieTitle }) => {
@@ -39,7 +39,7 @@ const MediaGallery = ({ movieTitle }) => {
                 {media.backdrop_url && (
                     <div
                         className="absolute inset-0 bg-cover bg-center opacity-30 blur-sm"
-                        style={{ backgroundImage: `url(${media.backdrop_url})` }}
+                        style={{ backgroundImage: `url(${imageUrl(media.backdrop_url)})` }}
                     />
                 )}
 
@@ -47,7 +47,9 @@ const MediaGallery = ({ movieTitle }) => {
                     <motion.img
                         initial={{ opacity: 0, scale: 0.9 }}
                         animate={{ opacity: 1, scale: 1 }}
-                        src={media.poster_url || "https://via.placeholder.com/300x450?text=No+Poster"}
+                        src={imageUrl(media.poster_url) || "https://via.placeholder.com/300x450?text=No+Poster"}
+                        srcSet={imageSrcSet(media.images?.poster) || undefined}
+                        sizes="12rem"
                         alt={`${movieTitle} Poster`}
                         className="w-48 rounded-lg shadow-lg hover:shadow-cyan-500/50 transition-shadow duration-300"
                     />
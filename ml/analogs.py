@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+try:
+    from search_interest import normalize_tokens
+except ImportError:
+    from ml.search_interest import normalize_tokens
+
+# Nearest-neighbour index of historical releases ("analogs") for comparable-title lookup.
+#
+# Built at training time from the engineered feature vectors in processed_data.csv plus title
+# tokens. Feature similarity is an RBF over standardized, weighted features computed with one
+# matrix product per batch; titles sharing franchise tokens ("Dune" / "Dune: Part Two") get a
+# Jaccard bonus through a small inverted index. Used by the backend for the comparables in
+# the explanation text and for the optional analog blend of the predictions.
+
+INDEX_PATH = 'ml/artifacts/analog_index.npz'
+
+# Relative importance when deciding what counts as "comparable"; unlisted columns weigh 1
+COLUMN_WEIGHTS = {
+    'log_budget': 2.0,
+    'log_star_power': 2.0,
+    'release_year': 1.0,
+    'score': 1.0,
+    'release_month': 0.25,
+    'release_quarter': 0.25,
+}
+
+def franchise_tokens(title):
+    # Title tokens without sequel numbers, so entries of the same franchise share a token set
+    return frozenset(t for t in normalize_tokens(title) if not t.isdigit())
+
+def format_gross(value):
+    return f"${value / 1e9:.2f}B" if value >= 1e9 else f"${value / 1e6:.1f}M"
+
+class AnalogIndex:
+    def __init__(self, columns, vectors, mean, scale, weights, titles, years, revenue, opening_weekend):
+        self.columns = list(columns)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.sq_norms = (self.vectors.astype(np.float64) ** 2).sum(axis=1)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.titles = np.asarray(titles, dtype=str)
+        self.years = np.asarray(years, dtype=int)
+        self.revenue = np.asarray(revenue, dtype=float)
+        self.opening_weekend = np.asarray(opening_weekend, dtype=float)
+
+        # token -> rows, and each row's token set for the Jaccard bonus
+        self.tokens = [franchise_tokens(t) for t in self.titles]
+        inverted = {}
+        for row, tokens in enumerate(self.tokens):
+            for token in tokens:
+                inverted.setdefault(token, []).append(row)
+        self.inverted = {token: np.array(rows) for token, rows in inverted.items()}
+        self._positions = {}
+
+    @classmethod
+    def build(cls, X, titles, revenue, opening_weekend):
+        # X: engineered training features (DataFrame). Binary columns (genres) keep a 0/1 scale,
+        # continuous ones are standardized so no single unit dominates the distance.
+        values = X.to_numpy(dtype=float)
+        mean = values.mean(axis=0)
+        std = values.std(axis=0)
+        binary = np.all((values == 0) | (values == 1), axis=0)
+        mean = np.where(binary, 0.0, mean)
+        scale = np.where(binary | (std == 0), 1.0, std)
+        weights = np.array([COLUMN_WEIGHTS.get(c, 1.0) for c in X.columns])
+        vectors = (values - mean) / scale * weights
+        return cls(X.columns, vectors, mean, scale, weights, titles, X['release_year'], revenue, opening_weekend)
+
+    def save(self, path=INDEX_PATH):
+        np.savez_compressed(
+            path, columns=np.array(self.columns), vectors=self.vectors, mean=self.mean, scale=self.scale,
+            weights=self.weights, titles=self.titles, years=self.years, revenue=self.revenue,
+            opening_weekend=self.opening_weekend,
+        )
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def encode(self, X):
+        # Serving frames are aligned by column name; columns the index doesn't know are ignored
+        key = tuple(X.columns)
+        if key not in self._positions:
+            index = {c: i for i, c in enumerate(X.columns)}
+            self._positions[key] = np.array([index.get(c, -1) for c in self.columns])
+        pos = self._positions[key]
+        values = np.tile(self.mean, (len(X), 1))
+        present = pos >= 0
+        values[:, present] = X.to_numpy(dtype=float)[:, pos[present]]
+        return ((values - self.mean) / self.scale * self.weights).astype(np.float32)
+
+    def query(self, X, titles=None, k=5, title_weight=1.0):
+        # -> (rows, similarity), both (len(X) x k), best first. similarity is in [0, 1].
+        # A movie's own entry (same title and year) is never returned as its own comparable.
+        Q = self.encode(X)
+        d2 = (Q.astype(np.float64) ** 2).sum(axis=1)[:, None] + self.sq_norms[None, :] - 2.0 * (Q @ self.vectors.T)
+        score = np.exp(-np.maximum(d2, 0) / len(self.columns))
+
+        if titles is not None:
+            years = X['release_year'].to_numpy(dtype=int) if 'release_year' in X else None
+            for i, title in enumerate(titles):
+                tokens = franchise_tokens(title or '')
+                rows = [self.inverted[t] for t in tokens if t in self.inverted]
+                if not rows:
+                    continue
+                rows = np.unique(np.concatenate(rows))
+                overlap = np.array([len(tokens & self.tokens[r]) / len(tokens | self.tokens[r]) for r in rows])
+                score[i, rows] += title_weight * overlap
+                if years is not None:
+                    own = rows[(overlap == 1.0) & (self.years[rows] == years[i])]
+                    score[i, own] = -np.inf
+            score /= 1.0 + title_weight
+
+        k = min(k, score.shape[1])
+        top = np.argpartition(-score, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(score, top, axis=1), axis=1, kind='stable')
+        rows = np.take_along_axis(top, order, axis=1)
+        return rows, np.take_along_axis(score, rows, axis=1)
+
+    def describe(self, rows, similarity):
+        # One list of comparable-title dicts per query row
+        return [
+            [{
+                'title': str(self.titles[r]),
+                'year': int(self.years[r]),
+                'revenue': float(self.revenue[r]),
+                'opening_weekend': float(self.opening_weekend[r]),
+                'similarity': round(float(s), 4),
+            } for r, s in zip(row_ids, sims) if np.isfinite(s)]
+            for row_ids, sims in zip(rows, similarity)
+        ]
+
+    def estimate(self, rows, similarity):
+        # Similarity-weighted geometric mean of the analogs' grosses -> (opening_weekend, revenue)
+        w = np.where(np.isfinite(similarity), np.clip(similarity, 0, None), 0.0)
+        w = w / np.maximum(w.sum(axis=1, keepdims=True), 1e-12)
+        opening = np.expm1((w * np.log1p(self.opening_weekend[rows])).sum(axis=1))
+        revenue = np.expm1((w * np.log1p(self.revenue[rows])).sum(axis=1))
+        return opening, revenue
+
+def build_from_processed(df, feature_cols, normalizer=None):
+    # processed_data.csv -> index. Grosses are stored in each release's own dollars, so with
+    # --normalize the ref-year money is converted back before it is shown as a real gross.
+    df = df.drop_duplicates(subset=['names', 'release_year'])
+    X = df[feature_cols]
+    revenue = df['revenue'].to_numpy(dtype=float)
+    opening = df['opening_weekend'].to_numpy(dtype=float)
+    if normalizer is not None:
+        years = X['release_year'].to_numpy()
+        revenue = normalizer.denormalize(revenue, years)
+        opening = normalizer.denormalize(opening, years)
+    return AnalogIndex.build(X, df['names'].astype(str).to_numpy(), revenue, opening)
+
+if __name__ == "__main__":
+    # Rebuild the index from an existing processed_data.csv without retraining
+    import pandas as pd
+    try:
+        from ticket_sales import MoneyNormalizer
+    except ImportError:
+        from ml.ticket_sales import MoneyNormalizer
+    parser = argparse.ArgumentParser(description="Build the comparable-title index used by the backend")
+    parser.add_argument('--data', default='ml/artifacts/processed_data.csv')
+    parser.add_argument('--columns', default='ml/artifacts/model_columns.json')
+    parser.add_argument('-o', '--output', default=INDEX_PATH)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    with open(args.columns) as f:
+        feature_cols = [c for c in json.load(f) if c in df.columns]
+    normalizer = None
+    normalization_path = os.path.join(os.path.dirname(args.columns), 'normalization.json')
+    if os.path.exists(normalization_path):
+        with open(normalization_path) as f:
+            normalizer = MoneyNormalizer.from_config(json.load(f))
+    index = build_from_processed(df, feature_cols, normalizer)
+    index.save(args.output)
+    print(f"Analog index over {len(index.titles)} titles written to {args.output}")
@@ -0,0 +1,179 @@
+import argparse
+import json
+import threading
+
+import numpy as np
+
+# Streaming drift monitoring against a training-set reference profile.
+#
+# preprocessing.py writes the profile: per-column bin edges taken from the training quantiles,
+# the share of training rows in each bin and a few reference quantiles. The backend keeps one
+# fixed-size histogram per column plus a fixed-size reservoir sample of rows, and reports the
+# population stability index (PSI) of what it has served against the profile. Memory does not
+# grow with traffic and each micro-batch costs one broadcast compare and one bincount.
+
+PROFILE_PATH = 'ml/artifacts/reference_profile.json'
+
+# Money predictions are profiled on the log scale, against the training targets
+PREDICTION_COLUMNS = {'opening_weekend': 'pred_log_opening_weekend', 'revenue': 'pred_log_total_gross'}
+
+REFERENCE_QUANTILES = (5, 25, 50, 75, 95)
+
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, >= 0.25 major shift
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+
+# Keeps empty bins from making PSI infinite
+PSI_EPSILON = 1e-4
+
+def bin_edges(values, bins=10):
+    # Inner edges; the outer bins are open-ended so serving values outside the training range still land
+    uniq = np.unique(values)
+    if len(uniq) <= bins:
+        # Low-cardinality columns (genre flags, quarter): one bin per training value
+        return (uniq[:-1] + uniq[1:]) / 2
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+
+def column_profile(values, bins=10):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    edges = bin_edges(values, bins)
+    counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+    return {
+        'edges': edges.tolist(),
+        'expected': (counts / max(counts.sum(), 1)).tolist(),
+        'quantiles': {f'p{q}': float(np.quantile(values, q / 100)) for q in REFERENCE_QUANTILES},
+    }
+
+def build_reference_profile(X, y=None, bins=10):
+    # X: training feature frame; y: training targets (opening_weekend, revenue) for the prediction columns
+    columns = {col: column_profile(X[col], bins) for col in X.columns}
+    if y is not None:
+        for target, name in PREDICTION_COLUMNS.items():
+            if target in y:
+                columns[name] = column_profile(np.log1p(np.clip(y[target].to_numpy(dtype=float), 0, None)), bins)
+    return {'rows': int(len(X)), 'bins': bins, 'columns': columns}
+
+def save_profile(profile, path=PROFILE_PATH):
+    with open(path, 'w') as f:
+        json.dump(profile, f)
+
+def psi(expected, actual_counts):
+    actual = actual_counts / max(actual_counts.sum(), 1)
+    expected = np.clip(expected, PSI_EPSILON, None)
+    actual = np.clip(actual, PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def psi_status(value):
+    if value >= PSI_MAJOR:
+        return 'major'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+class DriftMonitor:
+    def __init__(self, profile, reservoir_size=512, min_rows=50, seed=0):
+        self.profile = profile
+        self.names = list(profile['columns'])
+        edges = [np.asarray(profile['columns'][n]['edges'], dtype=float) for n in self.names]
+        self.expected = [np.asarray(profile['columns'][n]['expected'], dtype=float) for n in self.names]
+        # All columns' edges in one (columns x max_edges) table padded with +inf, and every
+        # column's bins laid out back to back in one flat counts array, so a batch is binned
+        # with a single broadcast compare and a single bincount
+        self.edge_table = np.full((len(edges), max((len(e) for e in edges), default=0)), np.inf)
+        for j, e in enumerate(edges):
+            self.edge_table[j, :len(e)] = e
+        sizes = np.array([len(e) + 1 for e in edges])
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self.slices = [slice(o, o + n) for o, n in zip(self.offsets, sizes)]
+        self.n_bins = int(sizes.sum())
+        self._positions = {}
+        self.reservoir_size = reservoir_size
+        self.min_rows = min_rows
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = np.zeros(self.n_bins, dtype=np.int64)
+            # Uniform sample of served rows (all columns) for current-quantile estimates
+            self.reservoir = np.full((self.reservoir_size, len(self.names)), np.nan)
+            self.rows = 0
+
+    def positions(self, names):
+        # Column index in the profile for each incoming column (-1 = not profiled); cached per layout
+        key = tuple(names)
+        if key not in self._positions:
+            index = {n: j for j, n in enumerate(self.names)}
+            self._positions[key] = np.array([index.get(n, -1) for n in names])
+        return self._positions[key]
+
+    def update(self, values, names):
+        # values: (rows x len(names)) batch; profiled columns missing from `names` are left as NaN
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        pos = self.positions(names)
+        block = np.full((len(values), len(self.names)), np.nan)
+        block[:, pos[pos >= 0]] = values[:, pos >= 0]
+
+        bins = (block[:, :, None] >= self.edge_table[None, :, :]).sum(axis=2) + self.offsets
+        counts = np.bincount(bins[np.isfinite(block)], minlength=self.n_bins)
+
+        with self.lock:
+            self.counts += counts
+            # Reservoir sampling (Algorithm R) for the whole batch at once
+            n = len(block)
+            seen = np.arange(self.rows, self.rows + n)
+            slots = np.where(seen < self.reservoir_size, seen, self.rng.integers(0, seen + 1))
+            keep = slots < self.reservoir_size
+            self.reservoir[slots[keep]] = block[keep]
+            self.rows += n
+
+    def report(self):
+        with self.lock:
+            counts = [self.counts[s].copy() for s in self.slices]
+            sample = self.reservoir[:min(self.rows, self.reservoir_size)].copy()
+            rows = self.rows
+
+        columns = {}
+        for j, name in enumerate(self.names):
+            observed = int(counts[j].sum())
+            entry = {'rows': observed, 'reference_quantiles': self.profile['columns'][name]['quantiles']}
+            if observed >= self.min_rows:
+                value = psi(self.expected[j], counts[j])
+                entry['psi'] = value
+                entry['status'] = psi_status(value)
+                col = sample[:, j]
+                col = col[np.isfinite(col)]
+                if len(col):
+                    entry['current_quantiles'] = {f'p{q}': float(np.quantile(col, q / 100)) for q in REFERENCE_QUANTILES}
+            else:
+                entry['status'] = 'insufficient_data'
+            columns[name] = entry
+
+        scored = {name: c['psi'] for name, c in columns.items() if 'psi' in c}
+        return {
+            'rows': rows,
+            'reference_rows': self.profile.get('rows'),
+            'max_psi': max(scored.values()) if scored else None,
+            'drifted': sorted(name for name, value in scored.items() if value >= PSI_MAJOR),
+            'columns': columns,
+        }
+
+if __name__ == "__main__":
+    # Rebuild the profile from an existing processed_data.csv without rerunning preprocessing
+    import pandas as pd
+    parser = argparse.ArgumentParser(description="Write the training reference profile used for drift monitoring")
+    parser.add_argument('--data', default='ml/artifacts/processed_data.csv')
+    parser.add_argument('--columns', default='ml/artifacts/model_columns.json')
+    parser.add_argument('-o', '--output', default=PROFILE_PATH)
+    parser.add_argument('--bins', type=int, default=10)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    with open(args.columns) as f:
+        feature_cols = [c for c in json.load(f) if c in df.columns]
+    save_profile(build_reference_profile(df[feature_cols], df[list(PREDICTION_COLUMNS)], args.bins), args.output)
+    print(f"Reference profile for {len(feature_cols)} features + predictions written to {args.output}")
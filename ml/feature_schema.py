@@ -0,0 +1,68 @@
+import numpy as np
+
+# Declared dtypes for the model feature matrix, shared by preprocessing.py, train.py and the
+# backend so the same compact layout is used from processed_data.csv to the served matrix.
+#
+# Genre one-hots (every column not listed here) are uint8, calendar fields are small
+# integers and continuous features are float32, which is also the precision XGBoost uses
+# internally, so predictions are unchanged while the matrices are several times smaller.
+# A new non-indicator feature has to be declared here: casting an undeclared column that
+# holds anything but 0/1 raises instead of wrapping modulo 256.
+
+DTYPES = {
+    'log_budget': np.float32,
+    'log_star_power': np.float32,
+    'score': np.float32,
+    'buzz_score': np.float32,
+    'release_year': np.int16,
+    'release_month': np.uint8,
+    'release_quarter': np.uint8,
+}
+
+# Genre one-hots and any other indicator column
+DEFAULT_DTYPE = np.uint8
+
+def column_dtype(name):
+    return np.dtype(DTYPES.get(name, DEFAULT_DTYPE))
+
+def feature_dtypes(columns):
+    return {c: column_dtype(c) for c in columns}
+
+def check_indicator(name, values):
+    # Undeclared columns get the indicator dtype; refuse anything that isn't 0/1
+    if name not in DTYPES and values.dtype != DEFAULT_DTYPE and values.dtype != bool:
+        if not np.isin(values, (0, 1)).all():
+            raise ValueError(f"Feature '{name}' has values other than 0/1 but no dtype in ml/feature_schema.py DTYPES")
+
+def cast_column(name, values):
+    values = np.asarray(values)
+    check_indicator(name, values)
+    return values.astype(column_dtype(name), copy=False)
+
+def apply_schema(X):
+    # Casts only the columns that don't already have their declared dtype (no copy otherwise)
+    wrong = {c: dt for c, dt in feature_dtypes(X.columns).items() if X[c].dtype != dt}
+    for c in wrong:
+        check_indicator(c, X[c].to_numpy())
+    return X.astype(wrong) if wrong else X
+
+def frame_from_columns(columns, n, values):
+    # Model matrix in schema dtypes; values: column name -> array of length n, missing columns are 0
+    import pandas as pd
+    return pd.DataFrame({c: cast_column(c, values[c]) if c in values
+                         else np.zeros(n, dtype=column_dtype(c)) for c in columns})
+
+def read_processed(path, feature_cols=None):
+    # processed_data.csv with the feature columns in their schema dtypes (targets and titles
+    # keep pandas' defaults). Declared columns are parsed straight into their dtype; the rest
+    # go through apply_schema's 0/1 check.
+    import pandas as pd
+    header = pd.read_csv(path, nrows=0).columns
+    if feature_cols is None:
+        feature_cols = [c for c in header if c not in ('opening_weekend', 'revenue', 'names')]
+    feature_cols = [c for c in feature_cols if c in header]
+    df = pd.read_csv(path, dtype=feature_dtypes([c for c in feature_cols if c in DTYPES]))
+    wrong = [c for c in feature_cols if df[c].dtype != column_dtype(c)]
+    if wrong:
+        df[wrong] = apply_schema(df[wrong])
+    return df
@@ -4,6 +4,12 @@ import os
 import joblib
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import CountVectorizer
+from search_interest import get_store
+from ticket_sales import MODES, DEFAULT_REF_YEAR, MoneyNormalizer, load_ticket_sales
+from drift import PROFILE_PATH, build_reference_profile, save_profile
+from feature_schema import apply_schema
+import argparse
+import json
 
 def load_data(filepath):
     try:
@@ -98,7 +104,45 @@ def simulate_data(df):
     
     return df
 
-def engineer_features(df):
+def normalize_money(df, normalizer):
+    # Put budget, revenue and the simulated opening weekend in ref-year units before the
+    # log features and person_power are computed from them (one factor lookup per row)
+    factors = normalizer.table.factors(df['date_x'].dt.year.to_numpy(), normalizer.mode, normalizer.ref_year)
+    for col in ['budget_x', 'revenue', 'opening_weekend']:
+        df[col] = df[col].to_numpy(dtype=float) * factors
+    return df
+
+def crew_names(crew_str):
+    # "Name, Role, Name, Role, ..." -> names
+    if pd.isna(crew_str):
+        return []
+    parts = [x.strip() for x in crew_str.split(',')]
+    return parts[0::2]
+
+def person_stats_by_year(df):
+    # {release_year: {name: [revenue_sum, movie_count]}}. Kept per year so an incremental run only
+    # recomputes the recent years, and person_power is just sum / count over all years.
+    rows = pd.DataFrame({
+        'year': df['release_year'],
+        'name': df['crew'].apply(crew_names),
+        'revenue': df['revenue'],
+    }).explode('name').dropna(subset=['name'])
+    grouped = rows.groupby(['year', 'name'])['revenue'].agg(['sum', 'count'])
+    stats = {}
+    for (year, name), (total, count) in zip(grouped.index, grouped.to_numpy()):
+        stats.setdefault(int(year), {})[name] = [float(total), int(count)]
+    return stats
+
+def person_power_from_stats(person_stats):
+    totals = {}
+    for by_name in person_stats.values():
+        for name, (total, count) in by_name.items():
+            t = totals.setdefault(name, [0.0, 0])
+            t[0] += total
+            t[1] += count
+    return {name: total / count for name, (total, count) in totals.items()}
+
+def engineer_features(df, person_stats=None, since_year=None):
     df['release_year'] = df['date_x'].dt.year
     df['release_month'] = df['date_x'].dt.month
     df['release_quarter'] = df['date_x'].dt.quarter
@@ -108,25 +152,17 @@ def engineer_features(df):
     # Handle Genre - Pre-clean
     df['genre'] = df['genre'].astype(str).str.replace('\xa0', ' ').fillna('Unknown')
     
-    # Star Power
-    person_revenues = {}
-    for idx, row in df.iterrows():
-        if pd.isna(row['crew']):
-            continue
-        parts = [x.strip() for x in row['crew'].split(',')]
-        names = parts[0::2]
-        for name in names:
-            if name not in person_revenues:
-                person_revenues[name] = []
-            person_revenues[name].append(row['revenue'])
-            
-    person_power = {k: np.mean(v) for k, v in person_revenues.items() if len(v) >= 1}
+    # Star Power: mean revenue of each person's movies, from per-year (sum, count) stats
+    if person_stats is None:
+        person_stats = person_stats_by_year(df)
+    else:
+        # Incremental: keep the stored years before since_year and recompute the rest from this data
+        person_stats = {year: v for year, v in person_stats.items() if year < since_year}
+        person_stats.update(person_stats_by_year(df[df['release_year'] >= since_year]))
+    person_power = person_power_from_stats(person_stats)
     
     def calculate_movie_power(crew_str):
-        if pd.isna(crew_str):
-            return 0
-        parts = [x.strip() for x in crew_str.split(',')]
-        names = parts[0::2]
+        names = crew_names(crew_str)
         if not names:
             return 0
         powers = [person_power.get(n, 0) for n in names]
@@ -134,13 +170,38 @@ def engineer_features(df):
     
     df['star_power'] = df['crew'].apply(calculate_movie_power)
     df['log_star_power'] = np.log1p(df['star_power'])
+    
+    # Search interest from the Google Trends exports (0 for titles nobody searched for)
+    store = get_store(os.getenv('SEARCH_INTEREST_DIR', '.'))
+    df['buzz_score'] = [store.match(str(t))['buzz_score'] for t in df['names']]
+
+    return df, person_power, person_stats
 
-    return df, person_power
+PERSON_STATS_PATH = 'ml/artifacts/person_stats.pkl'
 
-def main():
+def main(normalize='none', ref_year=DEFAULT_REF_YEAR, incremental=False, since_year=None):
     if not os.path.exists('data/movies.csv'):
         print("Error: data/movies.csv not found.")
         return
+    
+    person_stats = None
+    if incremental:
+        # Reuses the fitted genre vocabulary and normalization so the feature columns (and
+        # therefore the existing boosters) stay valid for train.py --incremental
+        if not os.path.exists(PERSON_STATS_PATH):
+            print(f"Error: {PERSON_STATS_PATH} not found. Run a full preprocessing first.")
+            return
+        person_stats = joblib.load(PERSON_STATS_PATH)
+        if since_year is None:
+            # Redo the latest stored year (grosses of recent releases are still moving) and anything newer
+            since_year = max(person_stats)
+        print(f"Incremental run: recomputing person stats from {since_year} onwards")
+        normalization_path = 'ml/artifacts/normalization.json'
+        normalize = 'none'
+        if os.path.exists(normalization_path):
+            with open(normalization_path) as f:
+                config = json.load(f)
+            normalize, ref_year = config['mode'], config.get('ref_year', DEFAULT_REF_YEAR)
 
     print("Loading data...")
     df = load_data('data/movies.csv')
@@ -155,8 +216,14 @@ def main():
     print("Simulating missing targets...")
     df = simulate_data(df)
     
+    normalizer = None
+    if normalize != 'none':
+        print(f"Normalizing money columns ({normalize}, {ref_year} reference)...")
+        normalizer = MoneyNormalizer(load_ticket_sales(), normalize, ref_year)
+        df = normalize_money(df, normalizer)
+    
     print("Engineering features...")
-    df, person_power_dict = engineer_features(df)
+    df, person_power_dict, person_stats = engineer_features(df, person_stats, since_year)
     
     # Genre Encoding
     print(f"Encoding genres for {len(df)} movies...")
@@ -171,20 +238,26 @@ def main():
     df['genre_clean'] = df['genre'].apply(process_genre_string)
     
     # Use default tokenizer (splits by whitespace)
-    vectorizer = CountVectorizer(min_df=1)
+    if incremental:
+        vectorizer = joblib.load('ml/artifacts/genre_vectorizer.pkl')
+    else:
+        vectorizer = CountVectorizer(min_df=1)
     
     try:
-        genre_matrix = vectorizer.fit_transform(df['genre_clean'])
+        genre_matrix = vectorizer.transform(df['genre_clean']) if incremental else vectorizer.fit_transform(df['genre_clean'])
         print(f"Genre vocabulary size: {len(vectorizer.vocabulary_)}")
     except Exception as e:
         print(f"Genre Vectorization Failed: {e}")
         return
 
-    genre_df = pd.DataFrame(genre_matrix.toarray(), columns=vectorizer.get_feature_names_out())
+    # One-hots straight to uint8 instead of densifying the sparse matrix as int64
+    genre_df = pd.DataFrame(genre_matrix.astype(np.uint8).toarray(), columns=vectorizer.get_feature_names_out())
     genre_df.index = df.index
     
-    features_numeric = df[['log_budget', 'release_year', 'release_month', 'release_quarter', 'log_star_power', 'score']]
-    X = pd.concat([features_numeric, genre_df], axis=1)
+    features_numeric = df[['log_budget', 'release_year', 'release_month', 'release_quarter', 'log_star_power', 'score', 'buzz_score']]
+    # Compact dtypes shared with train.py and the backend (ml/feature_schema.py)
+    X = apply_schema(pd.concat([features_numeric, genre_df], axis=1))
+    print(f"Feature matrix: {X.shape[0]} x {X.shape[1]}, {X.memory_usage(index=False).sum() / 1e6:.1f} MB")
     
     y = df[['opening_weekend', 'revenue']]
     
@@ -193,11 +266,32 @@ def main():
     
     joblib.dump(vectorizer, 'ml/artifacts/genre_vectorizer.pkl')
     joblib.dump(person_power_dict, 'ml/artifacts/person_power.pkl')
+    joblib.dump(person_stats, PERSON_STATS_PATH)
+    
+    # The backend applies the inverse transform to predictions when this file exists
+    normalization_path = 'ml/artifacts/normalization.json'
+    if normalizer is not None:
+        with open(normalization_path, 'w') as f:
+            json.dump(normalizer.to_config(), f, indent=2)
+    elif os.path.exists(normalization_path):
+        os.remove(normalization_path)
     
     processed_data = pd.concat([X, y, df[['names']]], axis=1)
     processed_data.to_csv('ml/artifacts/processed_data.csv', index=False)
     
+    # Training distribution the backend's drift monitor compares served traffic against
+    save_profile(build_reference_profile(X, y), PROFILE_PATH)
+    
     print(f"Preprocessing complete. {len(df)} rows processed.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Preprocess movies.csv into training features")
+    parser.add_argument('--normalize', choices=('none',) + MODES, default='none',
+                        help="Normalize revenue/budget/person power by year using AnnualTicketSales.csv")
+    parser.add_argument('--ref-year', type=int, default=DEFAULT_REF_YEAR)
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep the fitted genre vocabulary / normalization and only recompute recent person stats")
+    parser.add_argument('--since-year', type=int, default=None,
+                        help="With --incremental: first release year to recompute (default: latest stored year)")
+    args = parser.parse_args()
+    main(args.normalize, args.ref_year, args.incremental, args.since_year)
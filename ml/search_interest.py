@@ -0,0 +1,206 @@
+import csv
+import difflib
+import glob
+import itertools
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+# Search-interest feature store built from Google Trends "related queries" exports
+# (searched_with_top-queries_IN_*.csv / searched_with_rising-queries_IN_*.csv).
+#
+# Every query row goes into one compact table (numpy columns + an inverted index from
+# normalized tokens to row ids). New or changed export files are parsed on refresh()
+# without re-reading the ones already loaded. Used by preprocessing.py (buzz features
+# for training) and by the backend (MediaService / ContextEngine).
+
+DEFAULT_PATTERN = 'searched_with_*-queries_*.csv'
+
+# Tokens that say nothing about which movie a query refers to
+STOPWORDS = {'the', 'a', 'an', 'of', 'and', 'part', 'movie', 'film', 'full', 'hindi', 'in', 'chapter'}
+
+# Marketing intent tokens, tracked separately from title tokens
+TRAILER_TOKENS = {'trailer', 'teaser'}
+
+NUMBER_WORDS = {
+    'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5',
+    'ii': '2', 'iii': '3', 'iv': '4', 'v': '5',
+}
+
+# "Breakout" in a rising export means growth above 5000%
+BREAKOUT_GROWTH = 50.0
+
+# Typo fallback for title tokens missing from the index: only long tokens, only near-identical
+# spellings. Shorter words are too often other words one letter off ("omen" / "men").
+TYPO_MIN_LENGTH = 6
+TYPO_CUTOFF = 0.9
+
+FILE_RE = re.compile(r'searched_with_(top|rising)-queries_([A-Z]+)_(\d{8}-\d{4})_(\d{8}-\d{4})\.csv$')
+
+def normalize_tokens(text):
+    words = re.findall(r'[a-z0-9]+', str(text).lower())
+    return [NUMBER_WORDS.get(w, w) for w in words if w not in STOPWORDS]
+
+def parse_growth(value):
+    # "300%" -> 3.0, "-7%" -> -0.07, "Breakout" -> BREAKOUT_GROWTH
+    value = (value or '').strip().replace(',', '')
+    if value.lower() == 'breakout':
+        return BREAKOUT_GROWTH
+    try:
+        return float(value.rstrip('%')) / 100.0
+    except ValueError:
+        return 0.0
+
+class SearchInterestStore:
+    def __init__(self, data_dir='.', pattern=DEFAULT_PATTERN, refresh_interval=60.0):
+        self.data_dir = data_dir
+        self.pattern = pattern
+        self.refresh_interval = refresh_interval
+        self._last_refresh = None
+        # refresh() runs from match() on request threads; it and the reads in match() take the
+        # lock so nobody sees the index ahead of the arrays (or a half-retired file)
+        self.lock = threading.Lock()
+        self._file_ids = itertools.count() # never reused, so retiring a file can't hit another's rows
+
+        self.files = {}          # path -> (mtime, file id)
+        self.queries = []        # raw query text per row
+        self.interest = np.zeros(0, dtype=np.float32)
+        self.growth = np.zeros(0, dtype=np.float32)
+        self.rising = np.zeros(0, dtype=bool)
+        self.trailer = np.zeros(0, dtype=bool)
+        self.live = np.zeros(0, dtype=bool)      # False for rows of a file that was re-exported
+        self.file_ids = np.zeros(0, dtype=np.int32)
+        self.n_tokens = np.zeros(0, dtype=np.int16)
+        self.index = {}          # token -> list of row ids
+
+    def refresh(self, force=False):
+        # Parse only export files that are new or changed since the last refresh
+        with self.lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+
+            added = 0
+            for path in sorted(glob.glob(os.path.join(self.data_dir, self.pattern))):
+                mtime = os.path.getmtime(path)
+                known = self.files.get(path)
+                if known and known[0] == mtime:
+                    continue
+                if known:
+                    # Re-exported file: retire its old rows, the new ones are appended below
+                    self.live[self.file_ids == known[1]] = False
+                added += self._load_file(path, mtime)
+            return added
+
+    def _load_file(self, path, mtime):
+        match = FILE_RE.search(os.path.basename(path))
+        is_rising = bool(match and match.group(1) == 'rising')
+        file_id = next(self._file_ids)
+        self.files[path] = (mtime, file_id)
+
+        interest, growth, trailer, n_tokens = [], [], [], []
+        start = len(self.queries)
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                query = (row.get('query') or '').strip()
+                if not query:
+                    continue
+                tokens = normalize_tokens(query)
+                row_id = start + len(interest)
+                self.queries.append(query)
+                n_tokens.append(len(set(tokens) - TRAILER_TOKENS))
+                for token in set(tokens):
+                    self.index.setdefault(token, []).append(row_id)
+                try:
+                    interest.append(float(row.get('search interest') or 0))
+                except ValueError:
+                    interest.append(0.0)
+                growth.append(parse_growth(row.get('increase percent')))
+                trailer.append(any(t in TRAILER_TOKENS for t in tokens))
+
+        n = len(interest)
+        self.interest = np.concatenate([self.interest, np.array(interest, dtype=np.float32)])
+        self.growth = np.concatenate([self.growth, np.array(growth, dtype=np.float32)])
+        self.rising = np.concatenate([self.rising, np.full(n, is_rising)])
+        self.trailer = np.concatenate([self.trailer, np.array(trailer, dtype=bool)])
+        self.live = np.concatenate([self.live, np.ones(n, dtype=bool)])
+        self.file_ids = np.concatenate([self.file_ids, np.full(n, file_id, dtype=np.int32)])
+        self.n_tokens = np.concatenate([self.n_tokens, np.array(n_tokens, dtype=np.int16)])
+        return n
+
+    def _resolve_tokens(self, tokens):
+        # Exact token hits from the index, falling back to the closest vocabulary token for typos
+        resolved = []
+        for token in tokens:
+            if token in self.index:
+                resolved.append(token)
+            elif len(token) >= TYPO_MIN_LENGTH:
+                close = difflib.get_close_matches(token, self.index.keys(), n=1, cutoff=TYPO_CUTOFF)
+                # A prefix is a different word, not a typo ("marvels" / "marvel", "christ" / "chris")
+                if close and not (close[0].startswith(token) or token.startswith(close[0])):
+                    resolved.append(close[0])
+        return resolved
+
+    def match(self, title, min_similarity=0.5):
+        # Buzz features for a movie title (all zeros when nothing matches)
+        self.refresh()
+        with self.lock:
+            return self._match(title, min_similarity)
+
+    def _match(self, title, min_similarity):
+        features = {'buzz_score': 0.0, 'rising_score': 0.0, 'trailer_interest': 0.0, 'breakout': False, 'matched_queries': 0}
+
+        all_tokens = {t for t in normalize_tokens(title) if t not in TRAILER_TOKENS}
+        title_tokens = set(self._resolve_tokens(all_tokens))
+        if not title_tokens:
+            return features
+
+        # Count shared tokens per candidate row via the inverted index
+        candidates = {}
+        for token in title_tokens:
+            for row_id in self.index[token]:
+                candidates[row_id] = candidates.get(row_id, 0) + 1
+
+        # Jaccard similarity between the title and each query (trailer/teaser words excluded),
+        # so "avengers doomsday" scores lower for "The Avengers" than plain "avengers" does. Title
+        # words with no index hit still count in the union: "The Three Musketeers" shares only
+        # "3" with "iron man 3"
+        rows = np.fromiter(candidates.keys(), dtype=np.int64)
+        shared = np.fromiter(candidates.values(), dtype=np.float32)
+        similarity = shared / (len(all_tokens) + self.n_tokens[rows] - shared)
+        keep = (similarity >= min_similarity) & self.live[rows]
+        rows, similarity = rows[keep], similarity[keep]
+        if len(rows) == 0:
+            return features
+
+        weighted = self.interest[rows] * similarity
+        rising = self.rising[rows]
+        top = ~rising
+        features['matched_queries'] = int(len(rows))
+        if top.any():
+            features['buzz_score'] = float(weighted[top].max())
+        if rising.any():
+            features['rising_score'] = float(weighted[rising].max())
+            features['breakout'] = bool((self.growth[rows][rising] >= BREAKOUT_GROWTH).any())
+        trailer = self.trailer[rows]
+        if trailer.any():
+            features['trailer_interest'] = float(weighted[trailer].max())
+        return features
+
+    def match_many(self, titles, min_similarity=0.5):
+        return [self.match(t, min_similarity) for t in titles]
+
+_stores = {}
+
+def get_store(data_dir='.'):
+    # One shared store per directory (MediaService and the feature encoder use the same table)
+    key = os.path.abspath(data_dir)
+    if key not in _stores:
+        store = SearchInterestStore(data_dir)
+        store.refresh(force=True)
+        _stores[key] = store
+    return _stores[key]
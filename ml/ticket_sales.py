@@ -0,0 +1,104 @@
+import csv
+
+import numpy as np
+
+# Year-indexed money normalization from AnnualTicketSales.csv.
+#
+# The table is parsed once into flat arrays indexed by (year - first_year), so normalizing a
+# whole column is one clip + one gather + one multiply. Used by preprocessing.py to put revenue,
+# budget and person power from different years on the same footing, and by the backend to
+# convert predictions back to the release year's dollars.
+
+TICKET_SALES_PATH = 'AnnualTicketSales.csv'
+
+# ticket_price: deflate by average ticket price (2000 dollars -> ref-year dollars)
+# market: scale by total annual box office (share of that year's market)
+MODES = ('ticket_price', 'market')
+
+# Last pre-pandemic year; 2020/2021 totals are not a sensible reference market
+DEFAULT_REF_YEAR = 2019
+
+# Pandemic years: their totals reflect closed theaters, not the market a film opened into.
+# They take the last normal year's values, and so do years past the end of the table (which
+# would otherwise inherit 2021's, dividing every 2025+ market-mode prediction by ~2.9).
+DISRUPTED_YEARS = (2020, 2021)
+
+def parse_amount(value):
+    # "$11,253,443,955", "1,22,85,41,629" (Indian digit grouping), "$9.16" -> float
+    cleaned = str(value).replace('$', '').replace(',', '').strip()
+    return float(cleaned) if cleaned else np.nan
+
+class TicketSalesTable:
+    def __init__(self, years, tickets, box_office, ticket_price):
+        order = np.argsort(years)
+        years = np.asarray(years, dtype=np.int64)[order]
+        self.first_year = int(years[0])
+        self.last_year = int(years[-1])
+
+        # Dense arrays over [first_year, last_year]; gaps and disrupted years take the previous
+        # year's value
+        span = self.last_year - self.first_year + 1
+        self.tickets = np.full(span, np.nan)
+        self.box_office = np.full(span, np.nan)
+        self.ticket_price = np.full(span, np.nan)
+        normal = ~np.isin(years, DISRUPTED_YEARS) | (years == self.first_year)
+        offsets = years[normal] - self.first_year
+        self.tickets[offsets] = np.asarray(tickets, dtype=float)[order][normal]
+        self.box_office[offsets] = np.asarray(box_office, dtype=float)[order][normal]
+        self.ticket_price[offsets] = np.asarray(ticket_price, dtype=float)[order][normal]
+        for arr in (self.tickets, self.box_office, self.ticket_price):
+            for i in range(1, span):
+                if np.isnan(arr[i]):
+                    arr[i] = arr[i - 1]
+
+    def _offsets(self, years):
+        # Years outside the table use the nearest year we have (past the end, that is the last
+        # normal year)
+        years = np.asarray(years, dtype=np.int64)
+        return np.clip(years, self.first_year, self.last_year) - self.first_year
+
+    def factors(self, years, mode='ticket_price', ref_year=DEFAULT_REF_YEAR):
+        # Multiplier taking money from `years` into ref-year units
+        if mode not in MODES:
+            raise ValueError(f"Unknown normalization mode '{mode}', expected one of {MODES}")
+        series = self.ticket_price if mode == 'ticket_price' else self.box_office
+        ref = series[self._offsets([ref_year])[0]]
+        return ref / series[self._offsets(years)]
+
+def load_ticket_sales(path=TICKET_SALES_PATH):
+    years, tickets, box_office, price = [], [], [], []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            year = (row.get('YEAR') or '').strip()
+            if not year:
+                continue
+            years.append(int(year))
+            tickets.append(parse_amount(row['TICKETS SOLD']))
+            box_office.append(parse_amount(row['TOTAL BOX OFFICE']))
+            price.append(parse_amount(row['AVERAGE TICKET PRICE']))
+    return TicketSalesTable(years, tickets, box_office, price)
+
+class MoneyNormalizer:
+    # Forward (training) and inverse (serving) transform for one mode / reference year
+    def __init__(self, table, mode='ticket_price', ref_year=DEFAULT_REF_YEAR):
+        self.table = table
+        self.mode = mode
+        self.ref_year = ref_year
+        # Validate the mode up front
+        table.factors([ref_year], mode, ref_year)
+
+    def normalize(self, values, years):
+        return np.asarray(values, dtype=float) * self.table.factors(years, self.mode, self.ref_year)
+
+    def denormalize(self, values, years):
+        factors = self.table.factors(years, self.mode, self.ref_year)
+        values = np.asarray(values, dtype=float)
+        # Works for a column of values or a (rows x k) matrix of CIs/quantiles
+        return values / (factors[:, None] if values.ndim == 2 else factors)
+
+    def to_config(self):
+        return {'mode': self.mode, 'ref_year': self.ref_year}
+
+    @classmethod
+    def from_config(cls, config, path=TICKET_SALES_PATH):
+        return cls(load_ticket_sales(path), config['mode'], config.get('ref_year', DEFAULT_REF_YEAR))
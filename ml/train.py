@@ -3,15 +3,108 @@ import numpy as np
 import xgboost as xgb
 import joblib
 import json
-import shap
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sklearn.multioutput import MultiOutputRegressor
+try:
+    from tuning import cross_validate, evaluate, refit_and_evaluate
+    from analogs import INDEX_PATH, build_from_processed
+    from ticket_sales import MoneyNormalizer
+    from feature_schema import read_processed
+except ImportError:
+    from ml.tuning import cross_validate, evaluate, refit_and_evaluate
+    from ml.analogs import INDEX_PATH, build_from_processed
+    from ml.ticket_sales import MoneyNormalizer
+    from ml.feature_schema import read_processed
+import argparse
+import os
+import subprocess
+import sys
+import time
 
-def train_models():
+# Quantiles emitted by the optional interval models (one booster per target, all alphas per pass)
+QUANTILE_ALPHAS = [0.1, 0.5, 0.9]
+
+def train_quantile_model(base_model, X, y, name):
+    # Reuse the tuned hyperparameters of the point model and swap in XGBoost's
+    # multi-quantile objective, so every quantile comes out of a single tree pass.
+    print(f"Training {name} quantile model (alphas={QUANTILE_ALPHAS})...")
+    params = base_model.get_params()
+    params.update(objective='reg:quantileerror', quantile_alpha=np.array(QUANTILE_ALPHAS))
+    model = xgb.XGBRegressor(**params)
+    model.fit(X, y)
+    return model
+
+def quantile_metrics(y_true, preds):
+    # Interval coverage between the outer quantiles and mean pinball loss per alpha
+    y_true = np.asarray(y_true)
+    preds = np.sort(np.asarray(preds).reshape(len(y_true), -1), axis=1)
+    lower, upper = preds[:, 0], preds[:, -1]
+    result = {'coverage': float(np.mean((y_true >= lower) & (y_true <= upper)))}
+    for i, alpha in enumerate(QUANTILE_ALPHAS):
+        diff = y_true - preds[:, i]
+        result[f'pinball_p{int(round(alpha * 100))}'] = float(np.mean(np.maximum(alpha * diff, (alpha - 1) * diff)))
+    return result
+
+def release_period(X):
+    # Months since year 0 (processed data has release year and month, not full dates)
+    return X['release_year'].to_numpy(dtype=int) * 12 + X['release_month'].to_numpy(dtype=int) - 1
+
+def period_label(period):
+    return f"{int(period) // 12}-{int(period) % 12 + 1:02d}"
+
+def continue_training(model, X, y, rounds):
+    # Warm start: keep every existing tree and boost `rounds` more on X/y only
+    params = model.get_params()
+    params['n_estimators'] = rounds
+    updated = xgb.XGBRegressor(**params)
+    updated.fit(X, y, xgb_model=model.get_booster())
+    return updated
+
+def incremental_rows(period, trained_through, holdout_months):
+    # -> (unseen, update, holdout) masks. Only releases after trained_through are new to the
+    # current boosters (the full run fit a random split over every year, so older months are
+    # in-sample); the latest holdout_months of those are the holdout, the rest is boosted on.
+    year, month = (int(part) for part in trained_through.split('-'))
+    unseen = period > year * 12 + month - 1
+    holdout = unseen & (period >= period.max() - holdout_months + 1) if holdout_months > 0 else np.zeros(len(period), dtype=bool)
+    return unseen, unseen & ~holdout, holdout
+
+def holdout_gate(model, X_update, y_update, X_holdout, y_holdout, rounds, force=False):
+    # -> (accepted, report). A candidate boosted on the update rows only is compared with the
+    # current model on the holdout. With no rows on either side there is nothing to compare,
+    # so the update is rejected unless forced.
+    if len(X_update) == 0 or len(X_holdout) == 0:
+        return force, {'evaluated': False, 'accepted': force}
+    baseline = evaluate(model, X_holdout, y_holdout)
+    candidate = evaluate(continue_training(model, X_update, y_update, rounds), X_holdout, y_holdout)
+    accepted = force or candidate['RMSE'] <= baseline['RMSE']
+    return accepted, {'evaluated': True, 'baseline': baseline, 'candidate': candidate, 'accepted': accepted}
+
+def save_analog_index(df, feature_cols):
+    # Comparable-title index over the same training rows (grosses back in release-year dollars)
+    normalizer = None
+    if os.path.exists('ml/artifacts/normalization.json'):
+        with open('ml/artifacts/normalization.json', 'r') as f:
+            normalizer = MoneyNormalizer.from_config(json.load(f))
+    build_from_processed(df, feature_cols, normalizer).save(INDEX_PATH)
+
+def rebuild_catalog():
+    # The catalog store (backend/catalog.py) holds rows encoded for these artifacts; the backend
+    # ignores it once its fingerprint no longer matches, so rebuild it next to the analog index.
+    # Run as its own process: the backend package only imports from the repo root.
+    print("Rebuilding catalog feature store...")
+    result = subprocess.run([sys.executable, '-m', 'backend.catalog'])
+    if result.returncode != 0:
+        print("Warning: catalog rebuild failed; /predict/catalog is unavailable until python -m backend.catalog succeeds")
+
+def train_models(quantiles=False, n_iter=10, folds=3, workers=None, threads=None):
+    # Wall-clock seconds per phase, printed at the end and saved with the metrics
+    timings = {}
+    phase_start = time.perf_counter()
     print("Loading processed data...")
     try:
-        df = pd.read_csv('ml/artifacts/processed_data.csv')
+        # Feature columns come back in their compact schema dtypes (ml/feature_schema.py)
+        df = read_processed('ml/artifacts/processed_data.csv')
     except FileNotFoundError:
         print("Error: processed_data.csv not found. Run preprocessing.py first.")
         return
@@ -28,10 +121,9 @@ def train_models():
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
     print(f"Training models on {len(X_train)} samples...")
+    timings['load'] = time.perf_counter() - phase_start
     
-    # Hyperparameter Tuning using RandomizedSearchCV
-    from sklearn.model_selection import RandomizedSearchCV
-    
+    # Hyperparameter search: every candidate x fold x target on a process pool (ml/tuning.py)
     param_dist = {
         'n_estimators': [100, 300, 500, 800],
         'learning_rate': [0.01, 0.05, 0.1],
@@ -43,76 +135,178 @@ def train_models():
         'reg_lambda': [1, 1.5, 2]
     }
     
-    def tune_and_train(X, y, name):
-        print(f"Tuning {name} model...")
-        base_model = xgb.XGBRegressor(random_state=42, n_jobs=-1)
-        search = RandomizedSearchCV(
-            base_model, 
-            param_distributions=param_dist, 
-            n_iter=10, # limit iterations for speed
-            scoring='neg_root_mean_squared_error', 
-            cv=3, 
-            verbose=1,
-            random_state=42,
-            n_jobs=-1
-        )
-        search.fit(X, y)
-        print(f"Best params for {name}: {search.best_params_}")
-        return search.best_estimator_
-
-    # Model 1: Opening Weekend
-    model_opening = tune_and_train(X_train, y_train['opening_weekend'], "Opening Weekend")
-    
-    # Model 2: Total Revenue
-    model_revenue = tune_and_train(X_train, y_train['revenue'], "Total Revenue")
-    
-    # Evaluate
-    print("Evaluating models...")
-    preds_opening_test = model_opening.predict(X_test)
-    preds_revenue_test = model_revenue.predict(X_test)
-    
-    metrics = {}
-    
-    # Opening Weekend Metrics
-    rmse_ow = np.sqrt(mean_squared_error(y_test['opening_weekend'], preds_opening_test))
-    mae_ow = mean_absolute_error(y_test['opening_weekend'], preds_opening_test)
-    r2_ow = r2_score(y_test['opening_weekend'], preds_opening_test)
-    
-    # Revenue Metrics
-    rmse_rev = np.sqrt(mean_squared_error(y_test['revenue'], preds_revenue_test))
-    mae_rev = mean_absolute_error(y_test['revenue'], preds_revenue_test)
-    r2_rev = r2_score(y_test['revenue'], preds_revenue_test)
-    
-    metrics['opening_weekend'] = {'RMSE': rmse_ow, 'MAE': mae_ow, 'R2': r2_ow}
-    metrics['revenue'] = {'RMSE': rmse_rev, 'MAE': mae_rev, 'R2': r2_rev}
+    print("Tuning models...")
+    best_params, cv_scores, cv_timings = cross_validate(X_train, y_train[targets], param_dist, n_iter=n_iter,
+                                                        n_folds=folds, workers=workers, threads=threads)
+    timings.update(cv_timings)
+    for target, params in zip(targets, best_params):
+        print(f"Best params for {target}: {params}")
     
-    print(json.dumps(metrics, indent=2))
+    # Final fit + test-set evaluation, both targets in parallel
+    print("Fitting final models and evaluating...")
+    phase_start = time.perf_counter()
+    (model_opening, model_revenue), test_metrics = refit_and_evaluate(best_params, X_train, y_train[targets], X_test, y_test[targets], workers, threads)
+    timings['refit_evaluate'] = time.perf_counter() - phase_start
     
-    # Initialize SHAP Explainers (TreeExplainer is fast for XGBoost)
-    # We use a background dataset (kmeans) to keep the explainer size manageable if data is large, 
-    # but here test set is small enough or we can just use the model directly.
-    # For TreeExplainer with XGBoost, we don't strictly need background data but it helps for feature perturbation.
-    print("Initializing SHAP explainers...")
-    explainer_opening = shap.TreeExplainer(model_opening)
-    explainer_revenue = shap.TreeExplainer(model_revenue)
+    metrics = dict(zip(targets, test_metrics))
+    # Where the next --incremental run picks up from
+    metrics['training'] = {'mode': 'full', 'trained_through': period_label(release_period(X).max())}
+    
+    if quantiles:
+        phase_start = time.perf_counter()
+        model_opening_q = train_quantile_model(model_opening, X_train, y_train['opening_weekend'], "Opening Weekend")
+        model_revenue_q = train_quantile_model(model_revenue, X_train, y_train['revenue'], "Total Revenue")
+        metrics['quantiles'] = {
+            'alphas': QUANTILE_ALPHAS,
+            'opening_weekend': quantile_metrics(y_test['opening_weekend'], model_opening_q.predict(X_test)),
+            'revenue': quantile_metrics(y_test['revenue'], model_revenue_q.predict(X_test)),
+        }
+        timings['quantiles'] = time.perf_counter() - phase_start
+    
+    print(json.dumps(metrics, indent=2))
     
     # Save Artifacts
     print("Saving models and metrics...")
+    phase_start = time.perf_counter()
     joblib.dump(model_opening, 'ml/artifacts/model_opening.pkl')
     joblib.dump(model_revenue, 'ml/artifacts/model_revenue.pkl')
+    if quantiles:
+        joblib.dump(model_opening_q, 'ml/artifacts/model_opening_quantiles.pkl')
+        joblib.dump(model_revenue_q, 'ml/artifacts/model_revenue_quantiles.pkl')
+    else:
+        # Don't let the backend serve intervals from a previous, now stale, quantile run
+        for stale in ['ml/artifacts/model_opening_quantiles.pkl', 'ml/artifacts/model_revenue_quantiles.pkl']:
+            if os.path.exists(stale):
+                os.remove(stale)
     # Save explainers - we can't easily pickle SHAP explainers sometimes due to versioning, 
     # but saving the model is enough to recreate the TreeExplainer. 
     # We will recreate it in the backend to avoid large file sizes.
-    
-    # Save metrics JSON
-    with open('ml/artifacts/metrics.json', 'w') as f:
-        json.dump(metrics, f, indent=2)
         
     # Save column names for inference alignment
     with open('ml/artifacts/model_columns.json', 'w') as f:
         json.dump(list(X.columns), f)
+    save_analog_index(df, list(X.columns))
+    timings['save'] = time.perf_counter() - phase_start
+    
+    # Save metrics JSON
+    metrics['training']['timings'] = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+    with open('ml/artifacts/metrics.json', 'w') as f:
+        json.dump(metrics, f, indent=2)
+    # After metrics.json: the catalog fingerprint includes trained_through
+    rebuild_catalog()
 
+    print("Timing breakdown (cv_dmatrix_build / cv_fit_predict are summed over workers):")
+    for phase, value in timings.items():
+        # cv_dmatrix_builds is a count, everything else seconds
+        print(f"  {phase:<18} {value:8d}" if isinstance(value, int) else f"  {phase:<18} {value:8.2f}s")
     print("Training complete.")
 
+# Artifact name of each target's model
+MODEL_NAMES = {'opening_weekend': 'opening', 'revenue': 'revenue'}
+
+def train_incremental(rounds=50, holdout_months=6, force=False):
+    # Routine updates: no hyperparameter search. The current boosters keep their trees and
+    # boost `rounds` more on the releases added since they were trained, gated on a time-based
+    # holdout taken from those same releases.
+    started = time.perf_counter()
+    print("Loading processed data...")
+    try:
+        df = read_processed('ml/artifacts/processed_data.csv')
+    except FileNotFoundError:
+        print("Error: processed_data.csv not found. Run preprocessing.py first.")
+        return
+    
+    targets = ['opening_weekend', 'revenue']
+    X = df.drop(columns=targets + ['names'])
+    y = df[targets]
+    
+    with open('ml/artifacts/model_columns.json', 'r') as f:
+        if list(X.columns) != json.load(f):
+            print("Error: feature columns differ from the trained models. Run preprocessing.py --incremental, or a full training.")
+            return
+    with open('ml/artifacts/metrics.json', 'r') as f:
+        metrics = json.load(f)
+    
+    trained_through = metrics.get('training', {}).get('trained_through')
+    if not trained_through:
+        print("Error: metrics.json doesn't say which releases the models were trained on. Run a full training first.")
+        return
+    period = release_period(X)
+    new, update, holdout = incremental_rows(period, trained_through, holdout_months)
+    print(f"Incremental update after {trained_through}: {new.sum()} new rows, {holdout.sum()} of them held out")
+    if not new.any():
+        print("Nothing to update.")
+        return
+    if not (update.any() and holdout.any()) and not force:
+        # e.g. every new row falls inside the holdout: deploying would be unevaluated
+        print("Nothing to evaluate the update on (no new rows outside the holdout, or an empty holdout). "
+              "Use a smaller --holdout-months, wait for more releases, or pass --force.")
+        return
+    
+    report = {}
+    deployed = []
+    for target in targets:
+        name = MODEL_NAMES[target]
+        model = joblib.load(f'ml/artifacts/model_{name}.pkl')
+        
+        accepted, report[target] = holdout_gate(model, X[update], y[target][update], X[holdout], y[target][holdout], rounds, force)
+        if report[target]['evaluated']:
+            print(f"{target}: holdout RMSE {report[target]['baseline']['RMSE']:,.0f} -> "
+                  f"{report[target]['candidate']['RMSE']:,.0f} ({'accepted' if accepted else 'rejected'})")
+        else:
+            print(f"{target}: deployed without holdout evaluation (--force)")
+        
+        if not accepted:
+            continue
+        # The evaluated candidate never saw the holdout; the deployed booster learns those months too
+        joblib.dump(continue_training(model, X[new], y[target][new], rounds), f'ml/artifacts/model_{name}.pkl')
+        q_path = f'ml/artifacts/model_{name}_quantiles.pkl'
+        if os.path.exists(q_path):
+            joblib.dump(continue_training(joblib.load(q_path), X[new], y[target][new], rounds), q_path)
+        deployed.append(target)
+    
+    # The holdout comparison is kept on its own: metrics[target] stays the full run's test-set
+    # evaluation, which the RMSE-band intervals are built from
+    metrics['incremental'] = dict(report, holdout_rows=int(holdout.sum()),
+                                  holdout_from=period_label(period[holdout].min()) if holdout.any() else None)
+    if deployed:
+        save_analog_index(df, list(X.columns))
+        metrics['training'] = {
+            'mode': 'incremental',
+            # The deployed boosters have now seen every row, holdout included
+            'trained_through': period_label(period.max()),
+            'updated_from': period_label(period[new].min()),
+            'rows_updated': int(new.sum()),
+            'rounds_added': rounds,
+            'targets_updated': deployed,
+            'seconds': round(time.perf_counter() - started, 2),
+        }
+    else:
+        print("No model was updated.")
+    with open('ml/artifacts/metrics.json', 'w') as f:
+        json.dump(metrics, f, indent=2)
+    if deployed:
+        rebuild_catalog()
+    
+    print(f"Incremental training complete in {time.perf_counter() - started:.2f}s.")
+
 if __name__ == "__main__":
-    train_models()
+    parser = argparse.ArgumentParser(description="Train box office models")
+    parser.add_argument('--quantiles', action='store_true',
+                        help="Also train p10/p50/p90 quantile models for prediction intervals")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Continue boosting the current models on recent releases instead of a full tuning run")
+    parser.add_argument('--rounds', type=int, default=50, help="With --incremental: boosting rounds to add")
+    parser.add_argument('--holdout-months', type=int, default=6,
+                        help="With --incremental: latest months held out to accept/reject the update")
+    parser.add_argument('--force', action='store_true', help="With --incremental: save even if the holdout got worse")
+    parser.add_argument('--n-iter', type=int, default=10, help="Hyperparameter candidates to try")
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--threads-per-job', type=int, default=None,
+                        help="XGBoost threads per fit (default: CPUs / workers)")
+    args = parser.parse_args()
+    if args.incremental:
+        train_incremental(args.rounds, args.holdout_months, args.force)
+    else:
+        train_models(args.quantiles, args.n_iter, args.folds, args.workers, args.threads_per_job)
@@ -0,0 +1,135 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xgboost as xgb
+from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from sklearn.model_selection import KFold, ParameterSampler
+
+# Cross-validated hyperparameter search for the XGBoost models (used by train.py).
+#
+# Replaces RandomizedSearchCV over pandas frames, where XGBoost re-converted and re-quantized
+# the data for every candidate and fold. Here each worker process receives the training matrix
+# once and builds a fold's QuantileDMatrix the first time it needs it, reusing it for every
+# candidate and both targets (only the label changes between jobs). Jobs are
+# (candidate, fold, target) triples, each with an explicit XGBoost thread budget so
+# workers x threads never oversubscribes the machine. They are dispatched in contiguous
+# same-fold chunks (fold_chunks), so a worker stays on one fold per chunk and the pool builds
+# about max(workers, folds) matrices instead of workers x folds.
+
+def thread_budget(workers=None, threads=None, n_jobs=None):
+    # -> (worker processes, XGBoost threads per job)
+    cpu = os.cpu_count() or 1
+    workers = workers or max(1, min(cpu, n_jobs or cpu))
+    threads = threads or max(1, cpu // workers)
+    return workers, threads
+
+def sample_candidates(param_dist, n_iter, seed=42):
+    # Same draws RandomizedSearchCV(random_state=seed) made, so tuning results stay comparable
+    return list(ParameterSampler(param_dist, n_iter, random_state=seed))
+
+def booster_params(params, nthread, seed=42):
+    # XGBRegressor-style params -> xgb.train params (n_estimators becomes num_boost_round)
+    booster = {k: v for k, v in params.items() if k != 'n_estimators'}
+    booster.update(objective='reg:squarederror', tree_method='hist', seed=seed, nthread=nthread)
+    return booster
+
+def evaluate(model, X, y):
+    preds = model.predict(X)
+    return {
+        'RMSE': float(np.sqrt(mean_squared_error(y, preds))),
+        'MAE': float(mean_absolute_error(y, preds)),
+        'R2': float(r2_score(y, preds)),
+    }
+
+# Per-process state, set once by the pool initializer
+_worker = {}
+
+def _init_worker(X, Y, folds, nthread, seed):
+    _worker.update(X=X, Y=Y, folds=folds, nthread=nthread, seed=seed, dmatrices={})
+
+def _fold_matrices(fold):
+    # Built on first use in this process, then shared by every candidate / target on this fold
+    if fold not in _worker['dmatrices']:
+        train_idx, valid_idx = _worker['folds'][fold]
+        dtrain = xgb.QuantileDMatrix(_worker['X'][train_idx], nthread=_worker['nthread'])
+        dvalid = xgb.DMatrix(_worker['X'][valid_idx], nthread=_worker['nthread'])
+        _worker['dmatrices'][fold] = (dtrain, dvalid)
+    return _worker['dmatrices'][fold]
+
+def fold_chunks(jobs, n_folds, workers):
+    # Contiguous same-fold job lists: each fold is split into just enough pieces to keep every
+    # worker busy (one piece per fold once there are at least as many folds as workers)
+    pieces = -(-workers // n_folds)
+    chunks = []
+    for fold in range(n_folds):
+        fold_jobs = [job for job in jobs if job[2] == fold]
+        size = -(-len(fold_jobs) // pieces) or 1
+        chunks += [fold_jobs[i:i + size] for i in range(0, len(fold_jobs), size)]
+    return chunks
+
+def _cv_chunk(jobs):
+    return [_cv_job(job) for job in jobs]
+
+def _cv_job(job):
+    candidate, params, fold, target = job
+    started = time.perf_counter()
+    cached = fold in _worker['dmatrices']
+    dtrain, dvalid = _fold_matrices(fold)
+    built = time.perf_counter()
+
+    train_idx, valid_idx = _worker['folds'][fold]
+    # Jobs run one at a time per process, so relabelling the cached matrix is safe
+    dtrain.set_label(_worker['Y'][train_idx, target])
+    booster = xgb.train(booster_params(params, _worker['nthread'], _worker['seed']), dtrain,
+                        num_boost_round=params['n_estimators'])
+    preds = booster.predict(dvalid)
+    rmse = float(np.sqrt(np.mean((_worker['Y'][valid_idx, target] - preds) ** 2)))
+    return candidate, fold, target, rmse, not cached, built - started, time.perf_counter() - built
+
+def cross_validate(X, Y, param_dist, n_iter=10, n_folds=3, workers=None, threads=None, seed=42):
+    # X: training features, Y: (rows x targets) labels.
+    # -> (best params per target, (candidates x folds x targets) RMSE array, timings)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    Y = np.asarray(Y, dtype=float)
+    n_targets = Y.shape[1]
+    candidates = sample_candidates(param_dist, n_iter, seed)
+    folds = list(KFold(n_splits=n_folds).split(X))
+    jobs = [(c, params, f, t) for f in range(n_folds) for c, params in enumerate(candidates) for t in range(n_targets)]
+    workers, threads = thread_budget(workers, threads, len(jobs))
+    print(f"Fitting {n_folds} folds for each of {len(candidates)} candidates x {n_targets} targets, "
+          f"totalling {len(jobs)} fits ({workers} workers x {threads} threads)")
+
+    scores = np.full((len(candidates), n_folds, n_targets), np.nan)
+    timings = {'cv_dmatrix_build': 0.0, 'cv_dmatrix_builds': 0, 'cv_fit_predict': 0.0}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X, Y, folds, threads, seed)) as pool:
+        for results in pool.map(_cv_chunk, fold_chunks(jobs, n_folds, workers)):
+            for c, f, t, rmse, built, build_seconds, fit_seconds in results:
+                scores[c, f, t] = rmse
+                timings['cv_dmatrix_builds'] += built
+                timings['cv_dmatrix_build'] += build_seconds
+                timings['cv_fit_predict'] += fit_seconds
+    timings['cv_wall'] = time.perf_counter() - started
+
+    best = [candidates[int(np.argmin(scores[:, :, t].mean(axis=1)))] for t in range(n_targets)]
+    return best, scores, timings
+
+def _refit_job(job):
+    params, X_train, y_train, X_test, y_test, nthread, seed = job
+    # sklearn wrapper so the saved model keeps feature names, get_params() and SHAP support
+    model = xgb.XGBRegressor(**params, random_state=seed, n_jobs=nthread)
+    model.fit(X_train, y_train)
+    return model, evaluate(model, X_test, y_test)
+
+def refit_and_evaluate(best, X_train, Y_train, X_test, Y_test, workers=None, threads=None, seed=42):
+    # Final fit of each target's best params on the whole training split plus its test metrics,
+    # one target per worker. Y_*: DataFrames with one column per target, in `best` order.
+    workers, threads = thread_budget(workers, threads, len(best))
+    jobs = [(params, X_train, Y_train.iloc[:, t], X_test, Y_test.iloc[:, t], threads, seed)
+            for t, params in enumerate(best)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_refit_job, jobs))
+    return [model for model, _ in results], [metrics for _, metrics in results]